@@ -0,0 +1,116 @@
+# deps/db.py
+"""
+Pools de connexions Postgres partagés par le process (psycopg_pool).
+
+Les pools sont ouverts au démarrage de l'application (lifespan de main.py) et fermés
+à l'arrêt. Hors application (scripts), `get_pool()` ouvre le pool sync à la demande.
+"""
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+
+from core.settings import env_bool, env_float, env_int
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+DATABASE_URL = os.getenv("DATABASE_URL")
+PG_POOL_MIN = env_int("PG_POOL_MIN", 1)
+PG_POOL_MAX = env_int("PG_POOL_MAX", 10)
+PG_POOL_TIMEOUT = env_float("PG_POOL_TIMEOUT", 5.0)  # attente max d'une connexion libre (s)
+PG_POOL_MAX_IDLE = env_float("PG_POOL_MAX_IDLE", 300.0)  # fermeture des connexions inactives (s)
+PG_POOL_MAX_LIFETIME = env_float("PG_POOL_MAX_LIFETIME", 1800.0)
+PG_POOL_CHECK = env_bool("PG_POOL_CHECK", True)  # ping avant de prêter une connexion
+
+_POOL: Optional[ConnectionPool] = None
+_ASYNC_POOL: Optional[AsyncConnectionPool] = None
+_LOCK = threading.Lock()
+
+
+def _pool_kwargs() -> Dict[str, Any]:
+    return {
+        "min_size": PG_POOL_MIN,
+        "max_size": max(PG_POOL_MIN, PG_POOL_MAX),
+        "timeout": PG_POOL_TIMEOUT,
+        "max_idle": PG_POOL_MAX_IDLE,
+        "max_lifetime": PG_POOL_MAX_LIFETIME,
+        # prepare_threshold=None: compatible avec les poolers en mode transaction (Supabase/pgbouncer)
+        "kwargs": {"prepare_threshold": None},
+        "open": False,
+    }
+
+
+def open_pool() -> Optional[ConnectionPool]:
+    """Ouvre le pool sync (idempotent). Retourne None si DATABASE_URL est absent."""
+    global _POOL
+    if not DATABASE_URL:
+        return None
+    with _LOCK:
+        if _POOL is None:
+            pool = ConnectionPool(
+                DATABASE_URL,
+                name="innova-sync",
+                check=ConnectionPool.check_connection if PG_POOL_CHECK else None,
+                **_pool_kwargs(),
+            )
+            # Ne bloque pas le démarrage si la base est momentanément injoignable
+            pool.open(wait=False)
+            _POOL = pool
+    return _POOL
+
+
+def get_pool() -> ConnectionPool:
+    pool = _POOL or open_pool()
+    if pool is None:
+        raise RuntimeError("DATABASE_URL manquant")
+    return pool
+
+
+async def open_async_pool() -> Optional[AsyncConnectionPool]:
+    """Ouvre le pool async (à appeler depuis la boucle d'événements de l'application)."""
+    global _ASYNC_POOL
+    if not DATABASE_URL:
+        return None
+    if _ASYNC_POOL is None:
+        pool = AsyncConnectionPool(
+            DATABASE_URL,
+            name="innova-async",
+            check=AsyncConnectionPool.check_connection if PG_POOL_CHECK else None,
+            **_pool_kwargs(),
+        )
+        await pool.open(wait=False)
+        _ASYNC_POOL = pool
+    return _ASYNC_POOL
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    pool = _ASYNC_POOL or await open_async_pool()
+    if pool is None:
+        raise RuntimeError("DATABASE_URL manquant")
+    return pool
+
+
+def close_pool() -> None:
+    global _POOL
+    with _LOCK:
+        if _POOL is not None:
+            _POOL.close()
+            _POOL = None
+
+
+async def close_async_pool() -> None:
+    global _ASYNC_POOL
+    if _ASYNC_POOL is not None:
+        await _ASYNC_POOL.close()
+        _ASYNC_POOL = None
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Statistiques des pools (taille, connexions disponibles, attentes, erreurs)."""
+    return {
+        "configured": bool(DATABASE_URL),
+        "sync": _POOL.get_stats() if _POOL is not None else None,
+        "async": _ASYNC_POOL.get_stats() if _ASYNC_POOL is not None else None,
+    }
@@ -1,11 +1,27 @@
 # Backend/lib/supa.py
 from __future__ import annotations
 
+import hashlib
 import os
+import time
 from functools import lru_cache
-from typing import Dict, Optional, TypedDict
+from typing import Any, Dict, Optional, Tuple, TypedDict, Union
 
-from postgrest import SyncPostgrestClient
+import httpx
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from postgrest.utils import AsyncClient, SyncClient
+
+from core.settings import env_bool, env_float, env_int
+
+# Transport HTTP partagé (keep-alive) vers PostgREST
+SUPABASE_HTTP_TIMEOUT = env_float("SUPABASE_HTTP_TIMEOUT", 10.0)
+SUPABASE_HTTP_MAX_CONNECTIONS = env_int("SUPABASE_HTTP_MAX_CONNECTIONS", 50)
+SUPABASE_HTTP_MAX_KEEPALIVE = env_int("SUPABASE_HTTP_MAX_KEEPALIVE", 20)
+SUPABASE_HTTP_KEEPALIVE_EXPIRY = env_float("SUPABASE_HTTP_KEEPALIVE_EXPIRY", 30.0)
+SUPABASE_HTTP2 = env_bool("SUPABASE_HTTP2", True)
+# Utilisateur d'un JWT (vérifié par Supabase Auth) gardé en mémoire pendant ce délai
+SUPABASE_USER_CACHE_S = env_float("SUPABASE_USER_CACHE_S", 60.0)
+_USER_CACHE_MAX = 1024
 
 
 class _SupabaseConfig(TypedDict):
@@ -47,12 +63,100 @@ def _default_headers() -> Dict[str, str]:
     }
 
 
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (extra httpx[http2])
+    except ImportError:
+        return False
+    return True
+
+
+def _transport_options() -> Dict[str, Any]:
+    return {
+        "base_url": _config()["rest_url"],
+        "headers": _default_headers(),
+        "timeout": httpx.Timeout(SUPABASE_HTTP_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=SUPABASE_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=SUPABASE_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=SUPABASE_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        "http2": SUPABASE_HTTP2 and _http2_available(),
+    }
+
+
+@lru_cache()
+def _shared_session() -> SyncClient:
+    """Client httpx unique (pool keep-alive, HTTP/2 si disponible) partagé par tous les clients PostgREST."""
+
+    return SyncClient(**_transport_options())
+
+
+@lru_cache()
+def _shared_async_session() -> AsyncClient:
+    """Équivalent async de _shared_session (créé au premier appel, dans la boucle de l'application)."""
+
+    return AsyncClient(**_transport_options())
+
+
+class _SessionView:
+    """
+    Vue sur la session partagée: en-têtes propres au client (Authorization, schéma),
+    connexions communes. Seul `request()` est utilisé par les request builders PostgREST.
+    """
+
+    def __init__(self, shared: Union[SyncClient, AsyncClient], headers: Dict[str, str]):
+        self._shared = shared
+        self.headers = httpx.Headers(headers)
+        self.auth: Optional[httpx.Auth] = None
+
+    def _merge(self, headers: Any, kwargs: Dict[str, Any]) -> httpx.Headers:
+        merged = httpx.Headers(self.headers)
+        if headers:
+            merged.update(headers)
+        if self.auth is not None:
+            kwargs.setdefault("auth", self.auth)
+        return merged
+
+    def request(self, method: str, url: Union[str, httpx.URL], *, headers: Any = None, **kwargs: Any) -> httpx.Response:
+        merged = self._merge(headers, kwargs)
+        return self._shared.request(method, url, headers=merged, **kwargs)
+
+    def aclose(self) -> None:
+        # La session partagée reste ouverte: elle est fermée par close_sessions()
+        return None
+
+
+class _AsyncSessionView(_SessionView):
+    """Équivalent async de _SessionView, au-dessus du client httpx.AsyncClient partagé."""
+
+    async def request(self, method: str, url: Union[str, httpx.URL], *, headers: Any = None, **kwargs: Any) -> httpx.Response:  # type: ignore[override]
+        merged = self._merge(headers, kwargs)
+        return await self._shared.request(method, url, headers=merged, **kwargs)
+
+    async def aclose(self) -> None:  # type: ignore[override]
+        return None
+
+
+class _SharedPostgrestClient(SyncPostgrestClient):
+    """SyncPostgrestClient qui emprunte la session partagée au lieu de créer un client httpx."""
+
+    def create_session(self, base_url: str, headers: Dict[str, str], timeout: Any) -> SyncClient:
+        return _SessionView(_shared_session(), headers)  # type: ignore[return-value]
+
+
+class _SharedAsyncPostgrestClient(AsyncPostgrestClient):
+    """AsyncPostgrestClient qui emprunte la session async partagée."""
+
+    def create_session(self, base_url: str, headers: Dict[str, str], timeout: Any) -> AsyncClient:
+        return _AsyncSessionView(_shared_async_session(), headers)  # type: ignore[return-value]
+
+
 def _client_with_headers(headers: Dict[str, str]) -> SyncPostgrestClient:
-    """Instancie un client PostgREST avec les en-têtes fournis."""
+    """Instancie un client PostgREST (léger) avec les en-têtes fournis."""
 
     cfg = _config()
-    # postgrest==0.15.1 -> pas d'arguments verify/proxy/timeout
-    return SyncPostgrestClient(
+    return _SharedPostgrestClient(
         cfg["rest_url"],
         schema="public",
         headers=headers,
@@ -84,3 +188,76 @@ def supa_for_jwt(jwt: Optional[str]) -> SyncPostgrestClient:
         }
         return _client_with_headers(headers)
     return get_sb_anon()
+
+
+def _auth_headers(jwt: Optional[str]) -> Dict[str, str]:
+    return {
+        **_default_headers(),
+        "Authorization": f"Bearer {jwt or _config()['anon_key']}",
+    }
+
+
+@lru_cache()
+def get_sb_anon_async() -> AsyncPostgrestClient:
+    """Client Supabase anonyme, variante async."""
+
+    return _SharedAsyncPostgrestClient(_config()["rest_url"], schema="public", headers=_auth_headers(None))
+
+
+def supa_for_jwt_async(jwt: Optional[str]) -> AsyncPostgrestClient:
+    """Variante async de supa_for_jwt (mêmes règles JWT / anonyme)."""
+
+    if jwt:
+        return _SharedAsyncPostgrestClient(_config()["rest_url"], schema="public", headers=_auth_headers(jwt))
+    return get_sb_anon_async()
+
+
+_USERS: Dict[str, Tuple[float, str]] = {}  # sha256(jwt) -> (expiration, id utilisateur)
+
+
+def _auth_user_url() -> str:
+    rest_url = _config()["rest_url"]
+    base = rest_url[: -len("/rest/v1")] if rest_url.endswith("/rest/v1") else (os.getenv("SUPABASE_URL") or "").rstrip("/")
+    return f"{base}/auth/v1/user"
+
+
+async def user_id_for_jwt_async(jwt: str) -> Optional[str]:
+    """
+    Identifiant de l'utilisateur authentifié par le JWT (GET /auth/v1/user: Supabase vérifie
+    signature et expiration). None si le jeton est refusé (anonyme, expiré, invalide).
+    """
+
+    key = hashlib.sha256(jwt.encode("utf-8")).hexdigest()
+    now = time.monotonic()
+    cached = _USERS.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    resp = await _shared_async_session().get(_auth_user_url(), headers={"Authorization": f"Bearer {jwt}"})
+    if resp.status_code in (401, 403):
+        return None
+    resp.raise_for_status()
+    user_id = (resp.json() or {}).get("id")
+    if not user_id:
+        return None
+    if len(_USERS) >= _USER_CACHE_MAX:
+        _USERS.pop(next(iter(_USERS)))  # plus ancienne entrée
+    _USERS[key] = (now + SUPABASE_USER_CACHE_S, user_id)
+    return user_id
+
+
+def close_sessions() -> None:
+    """Ferme le transport HTTP partagé sync (arrêt de l'application)."""
+
+    if _shared_session.cache_info().currsize:
+        _shared_session().close()
+        _shared_session.cache_clear()
+        get_sb_anon.cache_clear()
+
+
+async def aclose_sessions() -> None:
+    """Ferme le transport HTTP partagé async."""
+
+    if _shared_async_session.cache_info().currsize:
+        await _shared_async_session().aclose()
+        _shared_async_session.cache_clear()
+        get_sb_anon_async.cache_clear()
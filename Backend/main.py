@@ -2,21 +2,46 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordBearer
 
 # Routers existants
 from routers import domain, project, contributor, technology
 # ➕ Chat-LAYA
 from routers import chatlaya
+from deps import db
+from lib import supa
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    # Pools Postgres (answers_cache): ouverts une fois, partagés par toutes les requêtes
+    db.open_pool()
+    await db.open_async_pool()
+    # Workers de la file d'ingestion (jobs non terminés repris au démarrage)
+    # + préchargement du modèle d'embedding si RAG_WARMUP=1 (cf. /readyz)
+    await chatlaya.startup()
+    try:
+        yield
+    finally:
+        await chatlaya.shutdown()
+        await db.close_async_pool()
+        db.close_pool()
+        supa.close_sessions()
+        await supa.aclose_sessions()
+
+
 app = FastAPI(
     title="INNOVA+ API",
     description="Backend de la plateforme INNOVA+",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # -------- CORS ----------
@@ -46,6 +71,14 @@ def health():
 def healthz():
     return {"status": "ok"}
 
+@app.get("/readyz")
+def readyz():
+    """Prêt à servir Chat-LAYA (modèle d'embedding chargé); 503 sinon. État de Qdrant dans "rag"."""
+    status = chatlaya.readiness()
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content={"status": "starting", "rag": status})
+    return {"status": "ready", "rag": status}
+
 # -------- Routers existants --------
 app.include_router(project.router, prefix="/projects", tags=["projects"])
 app.include_router(domain.router, prefix="/domains", tags=["domains"])
@@ -54,8 +87,12 @@ app.include_router(technology.router, prefix="/technologies", tags=["technologie
 
 # -------- Chat-LAYA --------
 #   POST /chatlaya/ask
+#   POST /chatlaya/ask/stream (SSE)
+#   POST /chatlaya/chat (conversation multi-tours, session serveur)
 #   GET  /chatlaya/search
-#   POST /chatlaya/ingest
+#   POST /chatlaya/ingest (job en arrière-plan, 202)
+#   GET  /chatlaya/ingest/{job_id}
+#   GET  /chatlaya/metrics
 app.include_router(chatlaya.router, prefix="/chatlaya", tags=["chat-laya"])
 
 # -------- Test Qdrant --------
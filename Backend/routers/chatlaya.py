@@ -1,19 +1,34 @@
 from __future__ import annotations
 
+import asyncio
+import json
 import os
-import re
-from typing import List, Optional
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple, Union
 
-from fastapi import APIRouter, File, HTTPException, Query, UploadFile
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, field_validator
 
-from services.intent import detect_intent
-from services.router_ai import choose_and_complete
+from core.settings import env_bool
+from deps import db
+from deps.auth import get_bearer_token
+from lib.supa import user_id_for_jwt_async
+from schemas.chat_schema import ChatRequest, ChatResponse
+from services.intent import IntentResult, detect_intent, retrieval_policy
+from services.router_ai import PARAMS_BY_INTENT, choose_and_complete_async, choose_and_stream_async, cohere_stats
 
 try:  # pragma: no cover - dépendances optionnelles
-    from services import rag_service
+    from services import answer_cache, chat_sessions, context_builder, ingest_jobs, rag_service, reranker, semantic_cache
 except Exception as exc:  # pragma: no cover - pas de RAG configuré
     rag_service = None  # type: ignore[assignment]
+    chat_sessions = None  # type: ignore[assignment]
+    ingest_jobs = None  # type: ignore[assignment]
+    reranker = None  # type: ignore[assignment]
+    context_builder = None  # type: ignore[assignment]
+    answer_cache = None  # type: ignore[assignment]
+    semantic_cache = None  # type: ignore[assignment]
     _rag_import_error: Optional[Exception] = exc
 else:  # pragma: no cover - dépendances présentes
     _rag_import_error = None
@@ -27,15 +42,30 @@ _DEFAULT_PROMPT = (
     "Si le contexte ne contient pas l'information demandée, indique-le clairement."
 )
 MAX_TOP_K = 12
+# Valeurs admises définies par rag_service; sans RAG, pas de validation (les routes répondent 503)
+RETRIEVAL_MODES: Tuple[str, ...] = rag_service.RETRIEVAL_MODES if rag_service is not None else ()
+FILTER_FIELDS: Tuple[str, ...] = rag_service.FILTER_FIELDS if rag_service is not None else ()
+# Restreint la recherche au domaine détecté (IntentResult.domain_hint) quand la requête n'a pas de filtres
+CHATLAYA_AUTO_SCOPE = env_bool("CHATLAYA_AUTO_SCOPE", True)
 
 
 class AskBody(BaseModel):
     question: str
     temperature: float | None = None
     max_tokens: int | None = None
+    # Défaut: politique de l'intention détectée (services/intent.RETRIEVAL_BY_INTENT)
     top_k: int | None = None
+    min_score: float | None = None
     # Gardé pour compat, mais seul "cohere" est accepté
     provider: str | None = None
+    # Récupération: "vector" (défaut RAG_RETRIEVAL_MODE), "hybrid" (vecteur + BM25, fusion RRF) ou "lexical"
+    retrieval_mode: str | None = None
+    rrf_k: int | None = None
+    # Rerank des passages (si RERANK_BACKEND est configuré); False le désactive pour la requête
+    rerank: bool | None = None
+    # Filtres {"source" | "domain" | "type": valeur ou liste}; sans filtre, le domaine détecté est appliqué
+    filters: Dict[str, Union[str, List[str]]] | None = None
+    auto_scope: bool | None = None
 
     @field_validator("question")
     @classmethod
@@ -53,84 +83,521 @@ class AskBody(BaseModel):
             raise ValueError("top_k doit être positif")
         return value
 
+    @field_validator("min_score")
+    @classmethod
+    def validate_min_score(cls, value: Optional[float]) -> Optional[float]:
+        if value is not None and not -1.0 <= value <= 1.0:
+            raise ValueError("min_score (similarité cosinus) doit être entre -1 et 1")
+        return value
 
-@router.post("/ask")
-def ask(body: AskBody):
+    @field_validator("retrieval_mode")
+    @classmethod
+    def validate_retrieval_mode(cls, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        mode = value.strip().lower()
+        if RETRIEVAL_MODES and mode not in RETRIEVAL_MODES:
+            raise ValueError(f"retrieval_mode doit valoir {', '.join(RETRIEVAL_MODES)}")
+        return mode
+
+    @field_validator("rrf_k")
+    @classmethod
+    def validate_rrf_k(cls, value: Optional[int]) -> Optional[int]:
+        if value is not None and value < 1:
+            raise ValueError("rrf_k doit être >= 1")
+        return value
+
+    @field_validator("filters")
+    @classmethod
+    def validate_filters(cls, value: Optional[dict]) -> Optional[dict]:
+        if not value:
+            return None
+        unknown = sorted(set(value) - set(FILTER_FIELDS)) if FILTER_FIELDS else []
+        if unknown:
+            raise ValueError(f"filtres inconnus: {', '.join(unknown)} (attendu: {', '.join(FILTER_FIELDS)})")
+        return value
+
+
+@dataclass
+class _AskContext:
+    """État d'une question après cache, récupération documentaire et construction du prompt."""
+
+    question: str
+    top_k: int
+    model_name: str
+    t0: float
+    retrieval_mode: str = "vector"
+    rrf_k: Optional[int] = None
+    rerank: bool = False
+    rerank_info: Optional[dict] = None
+    tokens: Optional[dict] = None  # contexte/prompt comptés à l'assemblage
+    filters: Optional[dict] = None
+    scope: Optional[dict] = None  # filtres appliqués: {"filters", "auto", "fallback"?}
+    policy: Optional[dict] = None  # politique de récupération (intent.retrieval_policy) + "dropped"
+    cache_key: Optional[str] = None
+    signature: Optional[str] = None
+    query_vec: Optional[List[float]] = None
+    cached: Optional[dict] = None  # réponse complète si servie par un cache
+    sources: List[dict] = field(default_factory=list)
+    rag_error: Optional[str] = None
+    intent: Optional[IntentResult] = None
+    prompt: str = ""
+    retrieval_ms: int = 0
+
+
+async def _prepare(body: AskBody) -> _AskContext:
+    """Caches (exact puis sémantique), puis recherche + intention + prompt si aucun cache ne répond."""
     provider = (body.provider or "cohere").lower()
     if provider != "cohere":
         raise HTTPException(status_code=400, detail=f"Seul 'cohere' est supporté (reçu: {body.provider!r})")
 
     question = body.question.strip()
-    top_k = body.top_k if body.top_k is not None else 4
-    top_k = max(0, min(int(top_k), MAX_TOP_K))
+    # Intention (règles locales, immédiate) avant tout: elle fixe la politique de récupération
+    # (recherche ou non, top_k, seuil de score) et son domaine peut restreindre la recherche
+    intent = detect_intent(question)
+    ctx = _AskContext(
+        question=question,
+        top_k=0,
+        model_name=os.getenv("COHERE_MODEL", "command-r"),
+        t0=time.time(),
+        retrieval_mode=body.retrieval_mode or (rag_service.RAG_RETRIEVAL_MODE if rag_service is not None else "vector"),
+        rrf_k=body.rrf_k,
+        rerank=reranker is not None and reranker.enabled(body.rerank),
+        intent=intent,
+    )
+    _apply_policy(ctx, body.top_k, body.min_score)
+    _scope(ctx, body.filters, body.auto_scope)
+
+    if answer_cache is not None:
+        ctx.signature = answer_cache.params_signature(
+            top_k=ctx.top_k,
+            temperature=body.temperature,
+            max_tokens=body.max_tokens,
+            model=ctx.model_name,
+            retrieval=f"{ctx.retrieval_mode}:{ctx.rrf_k or ''}:{'rerank' if ctx.rerank else ''}:{ctx.policy['min_score']:g}"
+            + (f":{json.dumps(ctx.filters, sort_keys=True)}" if ctx.filters else ""),
+            generation=await answer_cache.generation_async(),
+        )
+        ctx.cache_key = answer_cache.cache_key(question, ctx.signature)
+        cached = await answer_cache.lookup_async(question, ctx.cache_key)
+        if cached is not None:
+            ctx.cached = _cached_response(cached, ctx.model_name, ctx.t0, tier=cached["tier"])
+            ctx.cached["policy"] = ctx.policy
+            return ctx
+
+    # Embedding calculé une fois (micro-batché avec les requêtes concurrentes), partagé par le cache sémantique et la recherche;
+    # sans recherche (politique de l'intention), ni embedding ni cache sémantique
+    use_semantic = semantic_cache is not None and semantic_cache.SEMANTIC_CACHE_ENABLED
+    if rag_service is not None and ctx.top_k > 0:
+        try:
+            ctx.query_vec = await rag_service.embed_query_async(question)
+        except Exception:  # pragma: no cover - dépendances externes
+            ctx.query_vec = None
+
+    if use_semantic and ctx.query_vec is not None and ctx.signature is not None:
+        similar = await semantic_cache.lookup_async(question, ctx.query_vec, ctx.signature)
+        if similar is not None:
+            ctx.cached = _cached_response(similar, ctx.model_name, ctx.t0, tier="semantic")
+            ctx.cached["similarity"] = similar["similarity"]
+            ctx.cached["matched_question"] = similar["matched_question"]
+            ctx.cached["policy"] = ctx.policy
+            return ctx
+
+    t_retrieval = time.time()
+    ctx.sources, ctx.rag_error = await _retrieve(ctx)
+    ctx.retrieval_ms = int((time.time() - t_retrieval) * 1000)
+
+    ctx.prompt, ctx.sources, ctx.tokens = _build_prompt(question, ctx.sources[: ctx.top_k], ctx.model_name)
+    return ctx
+
+
+def _apply_policy(ctx: _AskContext, top_k: Optional[int], min_score: Optional[float]) -> None:
+    """Politique de récupération de l'intention (top_k / min_score de la requête prioritaires)."""
+    ctx.policy = retrieval_policy(ctx.intent, top_k, min_score)
+    ctx.top_k = ctx.policy["top_k"] = min(ctx.policy["top_k"], MAX_TOP_K)
+    ctx.policy["dropped"] = 0
+
+
+def _scope(ctx: _AskContext, filters: Optional[dict], auto_scope: Optional[bool]) -> None:
+    """Filtres de la requête, sinon domaine détecté (CHATLAYA_AUTO_SCOPE, désactivable par auto_scope=False)."""
+    if filters:
+        ctx.filters = dict(filters)
+        ctx.scope = {"filters": ctx.filters, "auto": False}
+        return
+    auto = CHATLAYA_AUTO_SCOPE if auto_scope is None else auto_scope
+    domain = ctx.intent.domain_hint if ctx.intent is not None else None
+    if auto and domain:
+        ctx.filters = {"domain": domain}
+        ctx.scope = {"filters": ctx.filters, "auto": True}
+
+
+async def _remember(ctx: _AskContext, answer_text: str) -> None:
+    # On ne met pas en cache une réponse produite sans le contexte documentaire attendu
+    if ctx.rag_error or ctx.cache_key is None or answer_cache is None:
+        return
+    await answer_cache.store_async(ctx.question, ctx.cache_key, answer_text, ctx.sources)
+    if ctx.query_vec is not None and semantic_cache is not None and ctx.signature is not None:
+        semantic_cache.remember(ctx.question, ctx.query_vec, ctx.cache_key, ctx.signature)
 
-    sources: List[dict] = []
-    rag_error: Optional[str] = None
-    if top_k > 0:
-        if rag_service is None:
-            if _rag_import_error:
-                rag_error = f"Service RAG indisponible: {_rag_import_error}"
-            else:
-                rag_error = "Service RAG non configuré"
-        else:
-            try:
-                sources = rag_service.search(question, limit=top_k)
-            except Exception as exc:  # pragma: no cover - dépendances externes
-                rag_error = str(exc)
-                sources = []
 
-    context_parts = []
-    for hit in sources[:top_k]:
-        payload = hit.get("payload") or {}
-        snippet = str(payload.get("text") or "").strip()
-        if not snippet:
-            continue
-        meta = payload.get("title") or payload.get("source")
-        if meta:
-            context_parts.append(f"Source: {meta}\n{snippet}")
-        else:
-            context_parts.append(snippet)
-    context = "\n\n".join(context_parts).strip()
+@router.post("/ask")
+async def ask(body: AskBody):
+    ctx = await _prepare(body)
+    if ctx.cached is not None:
+        return ctx.cached
+
+    completion = await choose_and_complete_async(
+        ctx.intent,
+        ctx.prompt,
+        override_temperature=body.temperature,
+        override_max_tokens=body.max_tokens,
+        force_provider="cohere",
+        force_model=ctx.model_name,
+    )
+
+    provider_name = completion.get("provider") or "cohere"
+    answer_text = (completion.get("text") or "").strip() or "(réponse vide)"
+
+    if provider_name in {"error", "none"}:
+        raise HTTPException(status_code=502, detail=answer_text)
+
+    response = {
+        "answer": answer_text,
+        "provider": provider_name,
+        "model": completion.get("model") or ctx.model_name,
+        "latency_ms": completion.get("latency_ms"),
+        "tokens": _tokens(ctx, completion.get("tokens")),
+        "sources": ctx.sources,
+        "cache": "miss",
+    }
+    if ctx.scope is not None:
+        response["scope"] = ctx.scope
+    response["policy"] = ctx.policy
+    if ctx.rerank_info is not None:
+        response["rerank"] = ctx.rerank_info
+    if ctx.rag_error:
+        response["rag_error"] = ctx.rag_error
+    await _remember(ctx, answer_text)
+    return response
+
+
+@router.post("/ask/stream")
+async def ask_stream(body: AskBody):
+    """
+    Réponse en Server-Sent Events:
+      event: sources  → {"sources", "cache", "policy", "scope"?, "rag_error"?}
+      event: delta    → {"text"} (répété)
+      event: metrics  → {"ttft_ms", "latency_ms", "retrieval_ms", "tokens", ...}
+      event: error    → {"detail"} (fin du flux)
+    """
+    ctx = await _prepare(body)
+    return StreamingResponse(
+        _stream_events(ctx, body),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _stream_events(ctx: _AskContext, body: AskBody) -> AsyncIterator[str]:
+    if ctx.cached is not None:
+        cached = ctx.cached
+        yield _sse("sources", {"sources": cached["sources"], "cache": cached["cache"], "policy": ctx.policy})
+        yield _sse("delta", {"text": cached["answer"]})
+        latency_ms = int((time.time() - ctx.t0) * 1000)
+        yield _sse("metrics", {
+            "provider": cached["provider"],
+            "model": cached["model"],
+            "cache": cached["cache"],
+            "ttft_ms": latency_ms,
+            "latency_ms": latency_ms,
+            "retrieval_ms": 0,
+            "tokens": None,
+        })
+        return
+
+    sources_frame: dict = {"sources": ctx.sources, "cache": "miss", "policy": ctx.policy}
+    if ctx.scope is not None:
+        sources_frame["scope"] = ctx.scope
+    if ctx.rag_error:
+        sources_frame["rag_error"] = ctx.rag_error
+    yield _sse("sources", sources_frame)
+
+    parts: List[str] = []
+    ttft_ms: Optional[int] = None
+    async for event in choose_and_stream_async(
+        ctx.intent,
+        ctx.prompt,
+        override_temperature=body.temperature,
+        override_max_tokens=body.max_tokens,
+        force_provider="cohere",
+        force_model=ctx.model_name,
+    ):
+        if event["type"] == "delta":
+            if ttft_ms is None:
+                ttft_ms = int((time.time() - ctx.t0) * 1000)
+            parts.append(event["text"])
+            yield _sse("delta", {"text": event["text"]})
+        elif event["type"] == "error":
+            yield _sse("error", {"detail": event["text"]})
+            return
+        elif event["type"] == "end":
+            yield _sse("metrics", {
+                "provider": event["provider"],
+                "model": event["model"],
+                "cache": "miss",
+                "ttft_ms": ttft_ms,
+                "latency_ms": int((time.time() - ctx.t0) * 1000),
+                "llm_ttft_ms": event["ttft_ms"],
+                "llm_latency_ms": event["latency_ms"],
+                "retrieval_ms": ctx.retrieval_ms,
+                "rerank": ctx.rerank_info,
+                "tokens": _tokens(ctx, event["tokens"]),
+                "finish_reason": event["finish_reason"],
+            })
+
+    answer_text = "".join(parts).strip()
+    if answer_text:
+        await _remember(ctx, answer_text)
+
+
+async def _retrieve(ctx: _AskContext) -> Tuple[List[dict], Optional[str]]:
+    """Recherche documentaire (mode de la requête); retourne (sources, rag_error)."""
+    if ctx.top_k <= 0:
+        return [], None
+    if rag_service is None:
+        if _rag_import_error:
+            return [], f"Service RAG indisponible: {_rag_import_error}"
+        return [], "Service RAG non configuré"
+    try:
+        search = dict(
+            # Rerank: sur-échantillonnage, le modèle de pertinence choisit les top_k
+            limit=reranker.candidates(ctx.top_k) if ctx.rerank else ctx.top_k,
+            vector=ctx.query_vec,
+            mode=ctx.retrieval_mode,
+            rrf_k=ctx.rrf_k,
+        )
+        hits = await rag_service.search_async(ctx.question, filters=ctx.filters, **search)
+        if not hits and ctx.scope is not None and ctx.scope["auto"]:
+            # Domaine détecté mais aucun document étiqueté: recherche sur tout le corpus
+            hits = await rag_service.search_async(ctx.question, **search)
+            ctx.scope["fallback"] = True
+        if ctx.policy is not None:
+            hits, ctx.policy["dropped"] = _cutoff(hits, ctx.policy["min_score"])
+        if ctx.rerank:
+            hits, ctx.rerank_info = await reranker.rerank(ctx.question, hits, ctx.top_k, ctx.t0)
+        return hits, None
+    except Exception as exc:  # pragma: no cover - dépendances externes
+        return [], str(exc)
+
+
+def _cutoff(hits: List[dict], min_score: float) -> Tuple[List[dict], int]:
+    """
+    Écarte les passages dont la similarité cosinus est sous `min_score`. Les hits trouvés par
+    BM25 seul (mode hybride ou lexical) n'ont pas de similarité: ils sont gardés.
+    """
+    kept = []
+    for hit in hits:
+        similarity = hit.get("vector_score", None if "ranks" in hit else hit.get("score"))
+        if similarity is None or similarity >= min_score:
+            kept.append(hit)
+    return kept, len(hits) - len(kept)
+
+
+def _build_prompt(
+    question: str, sources: List[dict], model_name: str, history: str = ""
+) -> Tuple[str, List[dict], Optional[dict]]:
+    """
+    Prompt final. Le contexte est assemblé sous budget de tokens (doublons retirés, morceaux
+    adjacents fusionnés); `history` est l'historique compacté d'une conversation (/chat).
+    Retourne (prompt, sources retenues, décompte de tokens).
+    """
+    tokens: Optional[dict] = None
+    counter = None
+    if context_builder is not None:
+        counter = context_builder.token_counter(model_name)
+        built = context_builder.build(sources, counter)
+        context, sources, tokens = built.text, built.hits, built.report
+    else:
+        context_parts = []
+        for hit in sources:
+            payload = hit.get("payload") or {}
+            snippet = str(payload.get("text") or "").strip()
+            if not snippet:
+                continue
+            meta = payload.get("title") or payload.get("source")
+            if meta:
+                context_parts.append(f"Source: {meta}\n{snippet}")
+            else:
+                context_parts.append(snippet)
+        context = "\n\n".join(context_parts).strip()
 
     system_prompt = os.getenv("CHATLAYA_PROMPT", _DEFAULT_PROMPT)
     prompt_sections = [system_prompt]
+    if history:
+        prompt_sections.append("Historique de la conversation:\n" + history)
     if context:
         prompt_sections.append("Contexte documentaire:\n" + context)
     prompt_sections.append(f"Question:\n{question}")
     prompt_sections.append("Réponse détaillée:")
     prompt = "\n\n".join(prompt_sections)
+    if tokens is not None and counter is not None:
+        tokens["prompt"] = counter.count(prompt)
+    return prompt, sources, tokens
+
+
+def _tokens(ctx: _AskContext, usage: Optional[dict]) -> Optional[dict]:
+    """Décompte du contexte/prompt (assemblage) complété par l'usage facturé du LLM s'il est connu."""
+    if ctx.tokens is None and not usage:
+        return None
+    return {**(ctx.tokens or {}), **(usage or {})}
+
+
+def _cached_response(entry: dict, model_name: str, t0: float, tier: str) -> dict:
+    return {
+        "answer": entry["answer"],
+        "provider": "cohere",
+        "model": model_name,
+        "latency_ms": int((time.time() - t0) * 1000),
+        "tokens": None,
+        "sources": entry["sources"],
+        "cache": tier,
+    }
 
-    intent = detect_intent(question)
-    completion = choose_and_complete(
-        intent,
-        prompt,
+
+async def _session_owner(token: Optional[str]) -> Optional[str]:
+    """Utilisateur Supabase du jeton Bearer; None (session anonyme) sans jeton, jeton refusé ou Auth injoignable."""
+    if not token:
+        return None
+    try:
+        return await user_id_for_jwt_async(token)
+    except Exception:  # pragma: no cover - Supabase non configuré / injoignable
+        return None
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat(body: ChatRequest, token: Optional[str] = Depends(get_bearer_token)):
+    """
+    Conversation multi-tours avec historique gardé côté serveur (cf. services/chat_sessions.py).
+    Avec un jeton Bearer valide, la session est liée à l'utilisateur: seul lui peut la reprendre.
+    La recherche utilise une requête autonome (relance complétée par le tour précédent), le prompt
+    un historique compacté sous budget de tokens. Pas de cache de réponses: la réponse dépend
+    de l'historique.
+    """
+    if chat_sessions is None:
+        raise HTTPException(status_code=503, detail="Service de conversation non disponible")
+    if not (body.get_last_user_message() or "").strip():
+        raise HTTPException(status_code=400, detail="Aucun message utilisateur")
+
+    owner = await _session_owner(token)
+    session, _ = chat_sessions.open_session(body.session_id, [m.model_dump() for m in body.messages], owner)
+    question = chat_sessions.question(session) or ""
+    model_name = os.getenv("COHERE_MODEL", "command-r")
+    query = await _condense(session, question, model_name)
+    ctx = _AskContext(
+        question=query,
+        top_k=0,
+        model_name=model_name,
+        t0=time.time(),
+        retrieval_mode=rag_service.RAG_RETRIEVAL_MODE if rag_service is not None else "vector",
+        rerank=reranker is not None and reranker.enabled(None),
+        intent=_chat_intent(query, body.intent),
+    )
+    _apply_policy(ctx, body.top_k, None)
+    _scope(ctx, None, None)
+    if rag_service is not None and ctx.top_k > 0:
+        try:
+            ctx.query_vec = await rag_service.embed_query_async(query)
+        except Exception:  # pragma: no cover - dépendances externes
+            ctx.query_vec = None
+    ctx.sources, ctx.rag_error = await _retrieve(ctx)
+
+    history, history_report = chat_sessions.compact(session, context_builder.token_counter(model_name))
+    ctx.prompt, ctx.sources, ctx.tokens = _build_prompt(question, ctx.sources[: ctx.top_k], model_name, history)
+    if ctx.tokens is not None:
+        ctx.tokens["history"] = history_report["tokens"]
+
+    completion = await choose_and_complete_async(
+        ctx.intent,
+        ctx.prompt,
         override_temperature=body.temperature,
         override_max_tokens=body.max_tokens,
         force_provider="cohere",
-        force_model=os.getenv("COHERE_MODEL", "command-r"),
+        force_model=model_name,
     )
-
     provider_name = completion.get("provider") or "cohere"
     answer_text = (completion.get("text") or "").strip() or "(réponse vide)"
-
     if provider_name in {"error", "none"}:
+        chat_sessions.cancel_turn(session)  # le client peut renvoyer la même question
         raise HTTPException(status_code=502, detail=answer_text)
+    chat_sessions.record_answer(session, answer_text, query)
 
-    response = {
-        "answer": answer_text,
-        "provider": provider_name,
-        "model": completion.get("model") or os.getenv("COHERE_MODEL", "command-r"),
-        "latency_ms": completion.get("latency_ms"),
-        "tokens": completion.get("tokens"),
-        "sources": sources,
-    }
-    if rag_error:
-        response["rag_error"] = rag_error
-    return response
+    citations: List[str] = []
+    for hit in ctx.sources:
+        payload = hit.get("payload") or {}
+        name = payload.get("title") or payload.get("source")
+        if name and name not in citations:
+            citations.append(name)
+    return ChatResponse(
+        answer=answer_text,
+        citations=citations,
+        session_id=session.id,
+        query=query,
+        provider=provider_name,
+        model=completion.get("model") or model_name,
+        latency_ms=completion.get("latency_ms"),
+        sources=ctx.sources,
+        tokens=_tokens(ctx, completion.get("tokens")),
+        history=history_report,
+        scope=ctx.scope,
+        policy=ctx.policy,
+        rag_error=ctx.rag_error,
+    )
+
+
+async def _condense(session: chat_sessions.ChatSession, question: str, model_name: str) -> str:
+    """Requête de recherche autonome: règles locales, reformulée par le LLM si CHAT_CONDENSE=llm."""
+    query, method = chat_sessions.condense(session, question)
+    if method != "rules" or chat_sessions.CHAT_CONDENSE != "llm":
+        return query
+    completion = await choose_and_complete_async(
+        IntentResult("qa", 1, None),
+        chat_sessions.condense_prompt(session, question),
+        override_temperature=0.0,
+        override_max_tokens=64,
+        force_provider="cohere",
+        force_model=model_name,
+    )
+    rewritten = chat_sessions.bound_query(completion.get("text") or "")
+    if completion.get("provider") in {"error", "none"} or not rewritten:
+        return query
+    return rewritten
+
+
+def _chat_intent(question: str, forced: Optional[str]) -> IntentResult:
+    """Intention détectée sur la requête autonome; `forced` (ChatRequest.intent) la remplace (paramètres du LLM, politique)."""
+    detected = detect_intent(question)
+    if forced and forced in PARAMS_BY_INTENT:
+        return IntentResult(forced, detected.complexity, detected.domain_hint)
+    return detected
 
 
 @router.get("/search")
-def search(query: str = Query(..., min_length=1), limit: int = Query(8, ge=1, le=MAX_TOP_K)):
+async def search(
+    query: str = Query(..., min_length=1),
+    limit: int = Query(8, ge=1, le=MAX_TOP_K),
+    mode: Optional[str] = Query(None, description="vector | hybrid | lexical"),
+    rrf_k: Optional[int] = Query(None, ge=1),
+    rerank: bool = Query(False, description="reclasser les résultats (si RERANK_BACKEND est configuré)"),
+    hnsw_ef: Optional[int] = Query(None, ge=4, le=4096, description="précision HNSW (défaut: profil QDRANT_PROFILE)"),
+    exact: bool = Query(False, description="recherche vectorielle exhaustive (référence de rappel)"),
+    source: Optional[List[str]] = Query(None, description="restreindre à ces sources (fichiers)"),
+    domain: Optional[List[str]] = Query(None, description="restreindre à ces domaines (ex: finance_public)"),
+    doc_type: Optional[List[str]] = Query(None, alias="type", description="restreindre à ces types de document"),
+):
     q = query.strip()
     if not q:
         raise HTTPException(status_code=400, detail="Paramètre 'query' obligatoire")
@@ -138,79 +605,153 @@ def search(query: str = Query(..., min_length=1), limit: int = Query(8, ge=1, le
     if rag_service is None:
         raise HTTPException(status_code=503, detail="Service RAG non disponible")
 
+    started_at = time.time()
+    use_rerank = rerank and reranker is not None and reranker.enabled(True)
+    filters = {k: v for k, v in (("source", source), ("domain", domain), ("type", doc_type)) if v}
     try:
-        hits = rag_service.search(q, limit=limit)
+        hits = await rag_service.search_async(
+            q,
+            limit=reranker.candidates(limit) if use_rerank else limit,
+            mode=mode,
+            rrf_k=rrf_k,
+            hnsw_ef=hnsw_ef,
+            exact=exact,
+            filters=filters,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     except Exception as exc:  # pragma: no cover - dépendances externes
         raise HTTPException(status_code=502, detail=f"Recherche indisponible: {exc}")
 
-    return {"query": q, "hits": hits}
+    result = {"query": q, "mode": rag_service.retrieval_mode(mode), "filters": filters or None, "hits": hits}
+    if use_rerank:
+        result["hits"], result["rerank"] = await reranker.rerank(q, hits, limit, started_at)
+    return result
+
+
+@router.get("/metrics")
+def metrics():
+    """Compteurs des caches et services Chat-LAYA (monitoring)."""
+    return {
+        "answer_cache": answer_cache.stats() if answer_cache is not None else None,
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None,
+        "embeddings": rag_service.embed_stats() if rag_service is not None else None,
+        "lexical_index": rag_service.lexical_stats() if rag_service is not None else None,
+        "rerank": reranker.stats() if reranker is not None else None,
+        "chat_sessions": chat_sessions.stats() if chat_sessions is not None else None,
+        "postgres_pool": db.pool_stats(),
+        "llm": cohere_stats(),
+    }
 
 
-@router.post("/ingest")
-async def ingest(files: List[UploadFile] = File(..., alias="file")):
-    if rag_service is None:
+@router.post("/ingest", status_code=202)
+async def ingest(
+    files: List[UploadFile] = File(..., alias="file"),
+    domain: Optional[str] = Form(None, description="domaine des documents (ex: finance_public), filtrable"),
+    doc_type: Optional[str] = Form(None, alias="type", description="type de document (défaut: doc), filtrable"),
+):
+    """
+    Dépose les fichiers sur disque et les met en file d'ingestion.
+    `domain` / `type` étiquettent tous les morceaux des fichiers (filtres de /search et /ask).
+    Retourne aussitôt le job; l'avancement se lit sur GET /chatlaya/ingest/{job_id}.
+    """
+    if rag_service is None or ingest_jobs is None:
         raise HTTPException(status_code=503, detail="Service RAG non disponible")
 
     if not files:
         raise HTTPException(status_code=400, detail="Aucun fichier reçu")
 
-    total_chunks = 0
-    errors: List[dict[str, str]] = []
-
-    for upload in files:
-        try:
-            raw = await upload.read()
-            if not raw:
-                continue
+    job_id, job_dir = ingest_jobs.new_job_dir()
+    saved: List[dict[str, str]] = []
+    try:
+        for i, upload in enumerate(files):
+            path = job_dir / f"{i:04d}"
+            try:
+                # écritures disque dans un thread: la boucle continue de servir les autres requêtes
+                fh = await asyncio.to_thread(open, path, "wb")
+                try:
+                    while True:
+                        block = await upload.read(_READ_BLOCK)
+                        if not block:
+                            break
+                        await asyncio.to_thread(fh.write, block)
+                finally:
+                    await asyncio.to_thread(fh.close)
+            finally:
+                await upload.close()
+            entry = {"filename": upload.filename or "document", "path": str(path)}
+            entry.update({k: v.strip() for k, v in (("domain", domain), ("type", doc_type)) if v and v.strip()})
+            saved.append(entry)
+        job = await ingest_jobs.submit(job_id, saved)
+    except ingest_jobs.QueueFull as exc:
+        raise HTTPException(status_code=429, detail=str(exc))
+    except RuntimeError as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+
+    return {"status": job["status"], "job_id": job_id, "files": job["files"]}
+
+
+@router.get("/ingest/{job_id}")
+def ingest_status(job_id: str):
+    """Avancement d'un job: morceaux traités, indexés/ignorés, débit (morceaux/s) et erreurs."""
+    if ingest_jobs is None:
+        raise HTTPException(status_code=503, detail="Service RAG non disponible")
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job d'ingestion introuvable")
+    return job
 
-            text = _decode_bytes(raw)
-            if text is None:
-                errors.append({
-                    "filename": upload.filename or "(sans nom)",
-                    "error": "Encodage de fichier non supporté",
-                })
-                continue
 
-            chunks = _chunk_text(text)
-            if not chunks:
-                continue
+_READ_BLOCK = 64 * 1024
 
-            try:
-                total_chunks += rag_service.upsert_chunks(chunks, source=upload.filename or "document")
-            except Exception as exc:  # pragma: no cover - dépendances externes
-                errors.append({
-                    "filename": upload.filename or "(sans nom)",
-                    "error": str(exc),
-                })
-        finally:
-            await upload.close()
 
-    return {"status": "ok", "chunks": total_chunks, "errors": errors}
+_WARMUP_TASK: Optional["asyncio.Task[dict]"] = None
 
 
-def _decode_bytes(raw: bytes) -> Optional[str]:
-    for encoding in ("utf-8", "utf-16", "latin-1"):
+async def startup() -> None:
+    """
+    Vérifie la collection Qdrant (échec immédiat si EMB_DIM ne correspond pas), crée le schéma
+    Postgres du cache de réponses, démarre les workers d'ingestion (appelé par le lifespan de l'application) et, si
+    RAG_WARMUP est actif, le préchargement du modèle en tâche de fond: l'application
+    accepte aussitôt les connexions, /readyz indique quand le RAG est prêt.
+    """
+    global _WARMUP_TASK
+    if rag_service is not None:
+        try:
+            await rag_service.verify_collection_async()
+        except rag_service.CollectionSchemaError:
+            raise  # EMB_DIM incompatible avec la collection: on refuse de démarrer
+        except Exception:  # pragma: no cover - Qdrant injoignable: revérifié à la première requête
+            pass
+    if answer_cache is not None:
+        await asyncio.to_thread(answer_cache.init_schema)
+    if ingest_jobs is not None:
+        await ingest_jobs.start()
+    if rag_service is not None and rag_service.RAG_WARMUP and _WARMUP_TASK is None:
+        _WARMUP_TASK = asyncio.create_task(rag_service.warmup_async(), name="rag-warmup")
+        if context_builder is not None:
+            context_builder.token_counter(os.getenv("COHERE_MODEL", "command-r")).preload()
+
+
+async def shutdown() -> None:
+    global _WARMUP_TASK
+    if _WARMUP_TASK is not None:
+        _WARMUP_TASK.cancel()
+        await asyncio.gather(_WARMUP_TASK, return_exceptions=True)
+        _WARMUP_TASK = None
+    if ingest_jobs is not None:
+        await ingest_jobs.stop()
+    if rag_service is not None:
+        await rag_service.close_batcher_async()
         try:
-            return raw.decode(encoding)
-        except UnicodeDecodeError:
-            continue
-    return None
-
-
-def _chunk_text(text: str, chunk_size: int = 800, overlap: int = 100) -> List[str]:
-    clean = re.sub(r"\s+", " ", text).strip()
-    if not clean:
-        return []
-
-    chunks: List[str] = []
-    start = 0
-    length = len(clean)
-    while start < length:
-        end = min(length, start + chunk_size)
-        chunk = clean[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
-        if end >= length:
-            break
-        start = max(end - overlap, start + 1)
-    return chunks
+            rag_service.embed_cache.persist()
+        except Exception:  # pragma: no cover - disque en lecture seule, etc.
+            pass
+
+
+def readiness() -> dict:
+    """État de préparation du RAG pour /readyz."""
+    if rag_service is None:
+        detail = f"Service RAG indisponible: {_rag_import_error}" if _rag_import_error else "Service RAG non configuré"
+        return {"ready": False, "error": detail}
+    return rag_service.readiness()
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import List, Optional, Dict, Any
 from uuid import UUID
 from deps.auth import get_bearer_token
-from lib.supa import supa_for_jwt
+from lib.supa import supa_for_jwt_async
 from schemas.contributor import Contributor, ContributorCreate, ContributorUpdate
 
 router = APIRouter(tags=["contributors"])
@@ -33,53 +33,53 @@ def _raise_if_error(res, not_found_msg: Optional[str] = None):
         raise HTTPException(status_code=404, detail=not_found_msg)
 
 @router.get("/", response_model=List[Contributor], response_model_exclude_none=True)
-def list_contributors(project_id: Optional[UUID] = None, token: str | None = Depends(get_bearer_token)):
-    sb = supa_for_jwt(token)
+async def list_contributors(project_id: Optional[UUID] = None, token: str | None = Depends(get_bearer_token)):
+    sb = supa_for_jwt_async(token)
     q = sb.from_("contributors").select(COLUMNS)
     if project_id:
         q = q.eq("project_id", str(project_id))
-    res = q.execute()
+    res = await q.execute()
     _raise_if_error(res)
     rows = res.data or []
     return [_row_to_contributor(r) for r in rows]
 
 @router.get("/project/{project_id}", response_model=List[Contributor], response_model_exclude_none=True)
-def list_contributors_by_project(project_id: UUID, token: str | None = Depends(get_bearer_token)):
-    sb = supa_for_jwt(token)
-    res = sb.from_("contributors").select(COLUMNS).eq("project_id", str(project_id)).execute()
+async def list_contributors_by_project(project_id: UUID, token: str | None = Depends(get_bearer_token)):
+    sb = supa_for_jwt_async(token)
+    res = await sb.from_("contributors").select(COLUMNS).eq("project_id", str(project_id)).execute()
     _raise_if_error(res)
     rows = res.data or []
     return [_row_to_contributor(r) for r in rows]
 
 @router.post("/", status_code=201, response_model=Contributor, response_model_exclude_none=True)
-def create_contributor(payload: ContributorCreate, token: str | None = Depends(get_bearer_token)):
+async def create_contributor(payload: ContributorCreate, token: str | None = Depends(get_bearer_token)):
     if not token:
         raise HTTPException(status_code=401, detail="Authentication required")
-    sb = supa_for_jwt(token)
+    sb = supa_for_jwt_async(token)
     data = payload.model_dump(exclude_none=True)
     if "project_id" in data and data["project_id"] is not None:
         data["project_id"] = str(data["project_id"])
     if "user_id" in data and data["user_id"] is not None:
         data["user_id"] = str(data["user_id"])
-    res = sb.from_("contributors").insert(data).select(COLUMNS).single().execute()
+    res = await sb.from_("contributors").insert(data).execute()
     _raise_if_error(res, "Erreur lors de la création du contributor.")
-    return _row_to_contributor(res.data)
+    return _row_to_contributor(res.data[0])
 
 @router.put("/{contributor_id}", response_model=Contributor, response_model_exclude_none=True)
-def update_contributor(contributor_id: UUID, payload: ContributorUpdate, token: str | None = Depends(get_bearer_token)):
+async def update_contributor(contributor_id: UUID, payload: ContributorUpdate, token: str | None = Depends(get_bearer_token)):
     if not token:
         raise HTTPException(status_code=401, detail="Authentication required")
-    sb = supa_for_jwt(token)
+    sb = supa_for_jwt_async(token)
     data = payload.model_dump(exclude_unset=True, exclude_none=True)
-    res = sb.from_("contributors").update(data).eq("id", str(contributor_id)).select(COLUMNS).single().execute()
+    res = await sb.from_("contributors").update(data).eq("id", str(contributor_id)).execute()
     _raise_if_error(res, "Contributor introuvable.")
-    return _row_to_contributor(res.data)
+    return _row_to_contributor(res.data[0])
 
 @router.delete("/{contributor_id}", response_model=Contributor, response_model_exclude_none=True)
-def delete_contributor(contributor_id: UUID, token: str | None = Depends(get_bearer_token)):
+async def delete_contributor(contributor_id: UUID, token: str | None = Depends(get_bearer_token)):
     if not token:
         raise HTTPException(status_code=401, detail="Authentication required")
-    sb = supa_for_jwt(token)
-    res = sb.from_("contributors").delete().eq("id", str(contributor_id)).select(COLUMNS).single().execute()
+    sb = supa_for_jwt_async(token)
+    res = await sb.from_("contributors").delete().eq("id", str(contributor_id)).execute()
     _raise_if_error(res, "Contributor introuvable.")
-    return _row_to_contributor(res.data)
+    return _row_to_contributor(res.data[0])
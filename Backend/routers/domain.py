@@ -3,7 +3,7 @@ from typing import List, Optional
 from uuid import UUID
 
 from schemas.domain import Domain, DomainCreate, DomainUpdate
-from lib.supa import supa_for_jwt, get_sb_anon
+from lib.supa import supa_for_jwt_async, get_sb_anon_async
 from deps.auth import get_bearer_token
 
 router = APIRouter(tags=["domains"])
@@ -20,55 +20,55 @@ def _raise(res, not_found: Optional[str] = None):
         raise HTTPException(status_code=404, detail=not_found)
 
 @router.get("/", response_model=List[Domain])
-def read_domains():
-    res = get_sb_anon().from_("domains").select(COLUMNS).execute()
+async def read_domains():
+    res = await get_sb_anon_async().from_("domains").select(COLUMNS).execute()
     _raise(res)
     return res.data or []
 
 @router.get("/{domain_id}", response_model=Domain)
-def read_domain(domain_id: UUID):
-    res = get_sb_anon().from_("domains").select(COLUMNS).eq("id", str(domain_id)).single().execute()
+async def read_domain(domain_id: UUID):
+    res = await get_sb_anon_async().from_("domains").select(COLUMNS).eq("id", str(domain_id)).single().execute()
     _raise(res, "Domain not found")
     return res.data
 
 @router.post("/", response_model=Domain)
-def create_new_domain(
+async def create_new_domain(
     payload: DomainCreate,
     token: str | None = Depends(get_bearer_token),
 ):
     if not token:
         raise HTTPException(status_code=401, detail="Authentication required")
-    sb = supa_for_jwt(token)
-    res = sb.from_("domains").insert(payload.model_dump(exclude_none=True)).select(COLUMNS).single().execute()
+    sb = supa_for_jwt_async(token)
+    res = await sb.from_("domains").insert(payload.model_dump(exclude_none=True)).execute()
     _raise(res, "Create failed")
-    return res.data
+    return res.data[0]
 
 @router.put("/{domain_id}", response_model=Domain)
-def update_existing_domain(
+async def update_existing_domain(
     domain_id: UUID,
     updates: DomainUpdate,
     token: str | None = Depends(get_bearer_token),
 ):
     if not token:
         raise HTTPException(status_code=401, detail="Authentication required")
-    sb = supa_for_jwt(token)
-    res = (
+    sb = supa_for_jwt_async(token)
+    res = await (
         sb.from_("domains")
         .update(updates.model_dump(exclude_unset=True, exclude_none=True))
         .eq("id", str(domain_id))
-        .select(COLUMNS).single().execute()
+        .execute()
     )
     _raise(res, "Domain not found")
-    return res.data
+    return res.data[0]
 
 @router.delete("/{domain_id}", response_model=Domain)
-def delete_existing_domain(
+async def delete_existing_domain(
     domain_id: UUID,
     token: str | None = Depends(get_bearer_token),
 ):
     if not token:
         raise HTTPException(status_code=401, detail="Authentication required")
-    sb = supa_for_jwt(token)
-    res = sb.from_("domains").delete().eq("id", str(domain_id)).select(COLUMNS).single().execute()
+    sb = supa_for_jwt_async(token)
+    res = await sb.from_("domains").delete().eq("id", str(domain_id)).execute()
     _raise(res, "Domain not found")
-    return res.data
+    return res.data[0]
@@ -2,7 +2,7 @@ from fastapi import APIRouter, HTTPException, Depends
 from typing import List, Optional, Dict, Any
 from uuid import UUID
 from deps.auth import get_bearer_token
-from lib.supa import supa_for_jwt
+from lib.supa import supa_for_jwt_async
 from schemas.technology import Technology, TechnologyCreate, TechnologyUpdate
 
 router = APIRouter(tags=["technologies"])
@@ -30,61 +30,61 @@ def _raise_api_if_error(res, default_status: int = 400, not_found_msg: Optional[
         raise HTTPException(status_code=404, detail=not_found_msg)
 
 @router.get("/", response_model=List[Technology], response_model_exclude_none=True)
-def list_technologies(project_id: Optional[UUID] = None, token: str | None = Depends(get_bearer_token)):
-    sb = supa_for_jwt(token)  # anon si token None
+async def list_technologies(project_id: Optional[UUID] = None, token: str | None = Depends(get_bearer_token)):
+    sb = supa_for_jwt_async(token)  # anon si token None
     q = sb.from_("technologies").select(COLUMNS)
     if project_id:
         q = q.eq("project_id", str(project_id))
-    res = q.execute()
+    res = await q.execute()
     _raise_api_if_error(res)
     rows = res.data or []
     return [_row_to_technology(r) for r in rows]
 
 @router.get("/project/{project_id}", response_model=List[Technology], response_model_exclude_none=True)
-def list_technologies_by_project(project_id: UUID, token: str | None = Depends(get_bearer_token)):
-    sb = supa_for_jwt(token)
-    res = sb.from_("technologies").select(COLUMNS).eq("project_id", str(project_id)).execute()
+async def list_technologies_by_project(project_id: UUID, token: str | None = Depends(get_bearer_token)):
+    sb = supa_for_jwt_async(token)
+    res = await sb.from_("technologies").select(COLUMNS).eq("project_id", str(project_id)).execute()
     _raise_api_if_error(res)
     rows = res.data or []
     return [_row_to_technology(r) for r in rows]
 
 @router.post("/", status_code=201, response_model=Technology, response_model_exclude_none=True)
-def create_technology(payload: TechnologyCreate, token: str | None = Depends(get_bearer_token)):
+async def create_technology(payload: TechnologyCreate, token: str | None = Depends(get_bearer_token)):
     if not token:
         raise HTTPException(status_code=401, detail="Authentication required")
-    sb = supa_for_jwt(token)
+    sb = supa_for_jwt_async(token)
     data = payload.model_dump(exclude_none=True)
     if "project_id" in data and data["project_id"] is not None:
         data["project_id"] = str(data["project_id"])
-    res = sb.from_("technologies").insert(data).select(COLUMNS).single().execute()
+    res = await sb.from_("technologies").insert(data).execute()
     _raise_api_if_error(res, default_status=403, not_found_msg="Erreur lors de la création de la technologie.")
-    return _row_to_technology(res.data)
+    return _row_to_technology(res.data[0])
 
 @router.put("/{tech_id}", response_model=Technology, response_model_exclude_none=True)
-def update_technology(tech_id: UUID, payload: TechnologyUpdate, token: str | None = Depends(get_bearer_token)):
+async def update_technology(tech_id: UUID, payload: TechnologyUpdate, token: str | None = Depends(get_bearer_token)):
     if not token:
         raise HTTPException(status_code=401, detail="Authentication required")
-    sb = supa_for_jwt(token)
+    sb = supa_for_jwt_async(token)
     data = payload.model_dump(exclude_unset=True, exclude_none=True)
-    res = (
+    res = await (
         sb.from_("technologies")
         .update(data)
         .eq("id", str(tech_id))
-        .select(COLUMNS).single().execute()
+        .execute()
     )
     _raise_api_if_error(res, default_status=403, not_found_msg="Technologie introuvable.")
-    return _row_to_technology(res.data)
+    return _row_to_technology(res.data[0])
 
 @router.delete("/{tech_id}", response_model=Technology, response_model_exclude_none=True)
-def delete_technology(tech_id: UUID, token: str | None = Depends(get_bearer_token)):
+async def delete_technology(tech_id: UUID, token: str | None = Depends(get_bearer_token)):
     if not token:
         raise HTTPException(status_code=401, detail="Authentication required")
-    sb = supa_for_jwt(token)
-    res = (
+    sb = supa_for_jwt_async(token)
+    res = await (
         sb.from_("technologies")
         .delete()
         .eq("id", str(tech_id))
-        .select(COLUMNS).single().execute()
+        .execute()
     )
     _raise_api_if_error(res, default_status=403, not_found_msg="Technologie introuvable.")
-    return _row_to_technology(res.data)
+    return _row_to_technology(res.data[0])
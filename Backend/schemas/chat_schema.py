@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 class ChatMessage(BaseModel):
     role: str  # "user", "assistant", "system"
@@ -7,8 +7,13 @@ class ChatMessage(BaseModel):
 
 class ChatRequest(BaseModel):
     messages: List[ChatMessage]
-    top_k: int = 4
+    top_k: Optional[int] = None  # défaut: politique de l'intention détectée
     intent: Optional[str] = None
+    # Session serveur: avec un id connu, seuls les nouveaux messages sont à envoyer;
+    # un id inconnu ou expiré ouvre une nouvelle session (nouvel id dans la réponse)
+    session_id: Optional[str] = None
+    temperature: Optional[float] = None
+    max_tokens: Optional[int] = None
 
     def get_last_user_message(self) -> Optional[str]:
         for m in reversed(self.messages):
@@ -22,6 +27,17 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     answer: str
     citations: List[str] = Field(default_factory=list)
+    session_id: Optional[str] = None
+    query: Optional[str] = None  # requête de recherche autonome (relance complétée)
+    provider: Optional[str] = None
+    model: Optional[str] = None
+    latency_ms: Optional[int] = None
+    sources: List[Dict[str, Any]] = Field(default_factory=list)
+    tokens: Optional[Dict[str, Any]] = None
+    history: Optional[Dict[str, Any]] = None  # compactage de l'historique (tokens, messages résumés)
+    scope: Optional[Dict[str, Any]] = None
+    policy: Optional[Dict[str, Any]] = None  # politique de récupération appliquée (intention, top_k, seuil)
+    rag_error: Optional[str] = None
 
 class FeedbackPayload(BaseModel):
     message_id: Optional[int] = None
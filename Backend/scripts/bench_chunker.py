@@ -0,0 +1,147 @@
+# scripts/bench_chunker.py
+"""
+Benchmark du découpage des documents à l'ingestion: débit (Mo/s), nombre et taille des
+morceaux, mémoire de pointe et part des morceaux qui se terminent en fin de phrase.
+
+Compare le découpage structurel (services.chunker.Chunker: titres, paragraphes, phrases,
+taille en tokens) à l'ancien découpage en fenêtres fixes de 800 caractères (blancs compressés),
+sur un texte juridique synthétique de plusieurs Mo ou sur un fichier fourni, lu par blocs de
+READ_BLOCK comme à l'ingestion.
+
+    python -m scripts.bench_chunker
+    python -m scripts.bench_chunker --mb 2 8 32
+    python -m scripts.bench_chunker --file storage/uploads/code_general_des_impots.txt
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import statistics
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List
+
+from services import chunker
+
+_WORDS = (
+    "taxe valeur ajoutée état membre union directive règlement assiette taux exonération "
+    "contribuable déclaration administration fiscale recouvrement douane importation commission "
+    "marché commun harmonisation législation opération imposable livraison biens prestation services"
+).split()
+
+
+def log(msg: str) -> None:
+    print(time.strftime("[%H:%M:%S]"), msg, flush=True)
+
+
+def _synthetic(size_mb: float, seed: int = 7) -> str:
+    """Texte de type code juridique: TITRE / CHAPITRE / Article, paragraphes de 1 à 6 phrases."""
+    rng = random.Random(seed)
+    parts: List[str] = []
+    titre = chapitre = article = 0
+    target = size_mb * 1024 * 1024
+    size = 0
+    while size < target:
+        start = len(parts)
+        if article % 40 == 0:
+            titre += 1
+            parts.append(f"TITRE {titre}\nDISPOSITIONS RELATIVES À LA {rng.choice(_WORDS).upper()}\n")
+        if article % 8 == 0:
+            chapitre += 1
+            parts.append(f"Chapitre {chapitre} : {rng.choice(_WORDS).capitalize()}\n")
+        article += 1
+        parts.append(f"Article {article} : {' '.join(rng.choices(_WORDS, k=3)).capitalize()}\n")
+        for _ in range(rng.randint(1, 4)):
+            sentences = [
+                " ".join(rng.choices(_WORDS, k=rng.randint(6, 30))).capitalize() + rng.choice([".", ".", ";", "."])
+                for _ in range(rng.randint(1, 6))
+            ]
+            parts.append(" ".join(sentences) + "\n\n")
+        size += sum(len(p.encode("utf-8")) for p in parts[start:])
+    return "".join(parts)
+
+
+def _blocks(text: str) -> Iterator[str]:
+    for i in range(0, len(text), chunker.READ_BLOCK):
+        yield text[i:i + chunker.READ_BLOCK]
+
+
+def _fixed_windows(blocks: Iterator[str], chunk_size: int = 800, overlap: int = 100) -> List[str]:
+    """Ancien découpage: blancs compressés puis fenêtres fixes de caractères."""
+    out: List[str] = []
+    buffer = ""
+    for block in blocks:
+        clean = re.sub(r"\s+", " ", block)
+        if not buffer or buffer.endswith(" "):
+            clean = clean.lstrip()
+        buffer += clean
+        while len(buffer) > chunk_size:
+            piece = buffer[:chunk_size].strip()
+            if piece:
+                out.append(piece)
+            buffer = buffer[chunk_size - overlap:]
+    if buffer.strip():
+        out.append(buffer.strip())
+    return out
+
+
+def _structured(blocks: Iterator[str]) -> List[str]:
+    c = chunker.Chunker()
+    out: List[str] = []
+    for block in blocks:
+        out.extend(ch.text for ch in c.feed(block))
+    out.extend(ch.text for ch in c.finish())
+    return out
+
+
+def _measure(name: str, split: Callable[[Iterator[str]], List[str]], text: str) -> Dict[str, object]:
+    tracemalloc.start()
+    t = time.perf_counter()
+    chunks = split(_blocks(text))
+    elapsed = time.perf_counter() - t
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    count = chunker.estimate_tokens
+    tokens = [count(c) for c in chunks[:2000]]
+    sentence_end = sum(1 for c in chunks if c.rstrip().endswith((".", ";", "!", "?", ":"))) / max(1, len(chunks))
+    return {
+        "name": name,
+        "mb_s": len(text.encode("utf-8")) / 1024 / 1024 / elapsed,
+        "chunks": len(chunks),
+        "tok_p50": statistics.median(tokens) if tokens else 0,
+        "tok_max": max(tokens) if tokens else 0,
+        "sentence_end": sentence_end,
+        "peak_mb": peak / 1024 / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, nargs="+", default=[2, 8], help="tailles du texte synthétique (Mo)")
+    parser.add_argument("--file", help="fichier texte à découper au lieu du texte synthétique")
+    args = parser.parse_args()
+
+    inputs = []
+    if args.file:
+        encoding = chunker.detect_encoding(args.file) or "utf-8"
+        inputs.append((args.file, "".join(chunker.iter_text(args.file, encoding))))
+    else:
+        inputs.extend((f"synthétique {mb:g} Mo", _synthetic(mb)) for mb in args.mb)
+
+    chunker.token_counter()
+    log(f"CHUNK_MAX_TOKENS={chunker.CHUNK_MAX_TOKENS} CHUNK_OVERLAP_TOKENS={chunker.CHUNK_OVERLAP_TOKENS} "
+        f"(tokens: {chunker.token_counter_source()})")
+    for label, text in inputs:
+        log(f"--- {label}: {len(text):,} caractères")
+        log(f"{'découpage':<12}{'Mo/s':>8}{'morceaux':>10}{'tok p50':>9}{'tok max':>9}{'fin phrase':>12}{'pic Mo':>9}")
+        for name, split in (("fixe-800", _fixed_windows), ("structurel", _structured)):
+            r = _measure(name, split, text)
+            log(
+                f"{r['name']:<12}{r['mb_s']:>8.1f}{r['chunks']:>10}{r['tok_p50']:>9.0f}{r['tok_max']:>9}"
+                f"{r['sentence_end']:>12.1%}{r['peak_mb']:>9.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# scripts/bench_crud_concurrency.py
+"""
+Benchmark de concurrence des routes CRUD: handler sync (threadpool, 40 threads)
+vs handler async (AsyncPostgrestClient sur la session partagée).
+
+Mode simulé (défaut): PostgREST est remplacé par un transport httpx qui répond après
+--latency-ms, ce qui isole l'effet du modèle d'exécution. Mode réel: --url pointe vers
+une instance déployée de l'API et la route --path est bombardée telle quelle.
+
+    python -m scripts.bench_crud_concurrency --requests 400 --concurrency 200
+    python -m scripts.bench_crud_concurrency --url https://api.example.com --path /domains/
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+def log(msg: str) -> None:
+    print(time.strftime("[%H:%M:%S]"), msg, flush=True)
+
+
+async def _fire(client: httpx.AsyncClient, path: str, total: int, concurrency: int) -> List[float]:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one() -> None:
+        async with sem:
+            t0 = time.perf_counter()
+            r = await client.get(path)
+            r.raise_for_status()
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+def _report(label: str, latencies: List[float], elapsed: float) -> None:
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    log(
+        f"{label:<6} {len(ordered)} req en {elapsed:.2f}s → {len(ordered) / elapsed:7.1f} req/s | "
+        f"p50={statistics.median(ordered):.0f}ms p95={p95:.0f}ms max={ordered[-1]:.0f}ms"
+    )
+
+
+def _simulated_app(latency_s: float):
+    """App minimale exposant la même lecture en sync et en async, PostgREST simulé."""
+    os.environ.setdefault("SUPABASE_URL", "https://bench.local")
+    os.environ.setdefault("SUPABASE_ANON_KEY", "bench")
+
+    from fastapi import FastAPI
+    from postgrest.utils import AsyncClient, SyncClient
+
+    from lib import supa
+
+    rows = [{"id": "00000000-0000-0000-0000-000000000000", "name": "bench", "slug": "bench"}]
+
+    def sync_handler(request: httpx.Request) -> httpx.Response:
+        time.sleep(latency_s)
+        return httpx.Response(200, json=rows)
+
+    async def async_handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency_s)
+        return httpx.Response(200, json=rows)
+
+    options = {**supa._transport_options(), "http2": False}
+    sync_session = SyncClient(**options, transport=httpx.MockTransport(sync_handler))
+    async_session = AsyncClient(**options, transport=httpx.MockTransport(async_handler))
+    supa._shared_session = lambda: sync_session  # type: ignore[assignment]
+    supa._shared_async_session = lambda: async_session  # type: ignore[assignment]
+
+    app = FastAPI()
+
+    @app.get("/sync")
+    def read_sync():
+        return supa.get_sb_anon().from_("domains").select("id, name, slug").execute().data
+
+    @app.get("/async")
+    async def read_async():
+        res = await supa.get_sb_anon_async().from_("domains").select("id, name, slug").execute()
+        return res.data
+
+    return app
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60.0) as client:
+            t0 = time.perf_counter()
+            lat = await _fire(client, args.path, args.requests, args.concurrency)
+            _report(args.path, lat, time.perf_counter() - t0)
+        return
+
+    app = _simulated_app(args.latency_ms / 1000)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120.0) as client:
+        log(
+            f"PostgREST simulé: {args.latency_ms}ms/requête, {args.requests} requêtes, "
+            f"concurrence {args.concurrency} (threadpool Starlette: 40)"
+        )
+        for path in ("/sync", "/async"):
+            t0 = time.perf_counter()
+            lat = await _fire(client, path, args.requests, args.concurrency)
+            _report(path.strip("/"), lat, time.perf_counter() - t0)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="URL de l'API déployée (sinon mode simulé)")
+    parser.add_argument("--path", default="/domains/", help="route à appeler en mode réel")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="latence PostgREST simulée")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
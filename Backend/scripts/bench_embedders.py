@@ -0,0 +1,158 @@
+# scripts/bench_embedders.py
+"""
+Benchmark des backends d'embedding (services/embedders.py): sentence-transformers (PyTorch),
+ONNX Runtime fp32 et ONNX Runtime int8.
+
+Chaque backend tourne dans un sous-processus séparé pour mesurer proprement la mémoire
+(RSS après chargement et pic). Mesures: temps de chargement, latence d'une requête
+(p50/p95), débit d'encodage de morceaux de ~800 caractères, et écart des vecteurs
+normalisés par rapport à la référence sentence-transformers (cosinus min/moyen, écart max).
+
+    python -m scripts.bench_embedders
+    python -m scripts.bench_embedders --backends onnx onnx-int8 --chunks 512
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+BACKENDS = ("sentence-transformers", "onnx", "onnx-int8")
+_WORDS = (
+    "innovation projet plateforme données modèle citoyen énergie santé éducation agriculture "
+    "financement startup contributeur technologie recherche formation marché impact Afrique "
+    "numérique communauté développement solaire eau mobile paiement logistique climat"
+).split()
+
+
+def log(msg: str) -> None:
+    print(time.strftime("[%H:%M:%S]"), msg, flush=True)
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _texts(n: int, size: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        words: List[str] = []
+        while sum(len(w) + 1 for w in words) < size:
+            words.append(rng.choice(_WORDS))
+        out.append(" ".join(words).capitalize() + ".")
+    return out
+
+
+def worker(backend: str, args: argparse.Namespace, out_path: str) -> None:
+    """Mesures d'un backend (exécuté dans un sous-processus)."""
+    rss_start = _rss_mb()
+    t0 = time.perf_counter()
+    from services import embedders
+
+    model = embedders.load(args.model, backend=backend)
+    load_s = time.perf_counter() - t0
+    rss_loaded = _rss_mb()
+
+    queries = _texts(args.queries, 60, seed=1)
+    chunks = _texts(args.chunks, 800, seed=2)
+    model.encode(queries[:4])  # warm-up
+
+    latencies = []
+    for q in queries:
+        t = time.perf_counter()
+        model.encode([q])
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    t = time.perf_counter()
+    vecs = model.encode(chunks)
+    throughput = len(chunks) / (time.perf_counter() - t)
+
+    np.save(out_path, np.asarray(vecs, dtype=np.float32))
+    ordered = sorted(latencies)
+    print(json.dumps({
+        "backend": backend,
+        "load_s": round(load_s, 2),
+        "p50_ms": round(statistics.median(ordered), 2),
+        "p95_ms": round(ordered[max(0, int(len(ordered) * 0.95) - 1)], 2),
+        "chunks_per_s": round(throughput, 1),
+        "rss_model_mb": round(rss_loaded - rss_start, 1),
+        "rss_peak_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }))
+
+
+def _agreement(reference: np.ndarray, other: np.ndarray) -> Dict[str, float]:
+    cos = np.sum(reference * other, axis=1)
+    return {
+        "cos_min": round(float(cos.min()), 5),
+        "cos_mean": round(float(cos.mean()), 5),
+        "max_abs_diff": round(float(np.abs(reference - other).max()), 5),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--model", default=os.getenv("EMB_MODEL", "sentence-transformers/all-MiniLM-L6-v2"))
+    parser.add_argument("--queries", type=int, default=200, help="requêtes courtes (latence)")
+    parser.add_argument("--chunks", type=int, default=256, help="morceaux de ~800 caractères (débit)")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args, args.out)
+        return
+
+    backend_dir = Path(__file__).resolve().parent.parent
+    results: List[Dict] = []
+    vectors: Dict[str, np.ndarray] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends:
+            out = os.path.join(tmp, f"{backend}.npy")
+            log(f"▶ {backend}…")
+            proc = subprocess.run(
+                [sys.executable, "-m", "scripts.bench_embedders", "--worker", backend, "--out", out,
+                 "--model", args.model, "--queries", str(args.queries), "--chunks", str(args.chunks)],
+                cwd=backend_dir, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                log(f"❌ {backend} indisponible: {proc.stderr.strip().splitlines()[-1:]}")
+                continue
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            vectors[backend] = np.load(out)
+
+    reference = vectors.get("sentence-transformers")
+    log(f"{'backend':<22}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}{'chunks/s':>10}{'RSS Mo':>9}{'pic Mo':>9}{'cos min':>9}")
+    for r in results:
+        cos = _agreement(reference, vectors[r["backend"]])["cos_min"] if reference is not None else float("nan")
+        log(
+            f"{r['backend']:<22}{r['load_s']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['chunks_per_s']:>10}"
+            f"{r['rss_model_mb']:>9}{r['rss_peak_mb']:>9}{cos:>9}"
+        )
+    if reference is not None:
+        for backend, vecs in vectors.items():
+            if backend != "sentence-transformers":
+                log(f"écart {backend} vs sentence-transformers: {_agreement(reference, vecs)}")
+
+
+if __name__ == "__main__":
+    main()
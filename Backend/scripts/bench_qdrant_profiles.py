@@ -0,0 +1,127 @@
+# scripts/bench_qdrant_profiles.py
+"""
+Benchmark latence / rappel des profils de collection Qdrant (services/qdrant_profile.py).
+
+Pour chaque profil, une collection temporaire `bench_<profil>` est créée sur le serveur
+QDRANT_URL, remplie de vecteurs synthétiques (mélange de gaussiennes normalisé, dimension
+EMB_DIM, proche de la géométrie des embeddings de phrases), puis interrogée pour chaque valeur
+de hnsw_ef. Le rappel@k est mesuré contre les vrais plus proches voisins (produit scalaire
+NumPy en float32): l'écart inclut l'approximation HNSW et la quantification int8. La ligne
+"exact" donne la latence d'un parcours complet (exact=True) et son rappel.
+
+Le mode local du client (`--url :memory:`) ignore HNSW et quantification: il ne sert qu'à
+vérifier le script.
+
+    python -m scripts.bench_qdrant_profiles
+    python -m scripts.bench_qdrant_profiles --points 100000 --ef 16 32 64 128 256 --grpc
+    python -m scripts.bench_qdrant_profiles --profiles default balanced --keep
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+from typing import Dict, List
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+from services import qdrant_profile
+
+
+def log(msg: str) -> None:
+    print(time.strftime("[%H:%M:%S]"), msg, flush=True)
+
+
+def _vectors(n: int, dim: int, seed: int, clusters: int = 64) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vecs = centers[rng.integers(0, clusters, size=n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vecs / np.linalg.norm(vecs, axis=1, keepdims=True)
+
+
+def _wait_indexed(client: QdrantClient, name: str, timeout_s: float = 600.0) -> float:
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout_s:
+        info = client.get_collection(name)
+        if info.status == models.CollectionStatus.GREEN:
+            return time.perf_counter() - t0
+        time.sleep(0.5)
+    raise TimeoutError(f"{name}: indexation non terminée après {timeout_s:.0f}s")
+
+
+def _run(client: QdrantClient, name: str, profile: qdrant_profile.CollectionProfile, queries: np.ndarray,
+         k: int, hnsw_ef: int | None, exact: bool) -> Dict[str, object]:
+    params = profile.search_params(hnsw_ef, exact)
+    ids: List[List[str]] = []
+    latencies: List[float] = []
+    for q in queries:
+        t = time.perf_counter()
+        res = client.search(collection_name=name, query_vector=q.tolist(), limit=k, search_params=params)
+        latencies.append((time.perf_counter() - t) * 1000)
+        ids.append([str(p.id) for p in res])
+    ordered = sorted(latencies)
+    return {
+        "ids": ids,
+        "p50": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL", "http://localhost:6333"))
+    parser.add_argument("--profiles", nargs="+", default=list(qdrant_profile.PROFILES), choices=list(qdrant_profile.PROFILES))
+    parser.add_argument("--points", type=int, default=50_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=int(os.getenv("EMBED_DIM", os.getenv("EMB_DIM", "384"))))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128, 256])
+    parser.add_argument("--grpc", action="store_true", help="transport gRPC (port QDRANT_GRPC_PORT)")
+    parser.add_argument("--keep", action="store_true", help="ne pas supprimer les collections de test")
+    args = parser.parse_args()
+
+    if args.url == ":memory:":
+        client = QdrantClient(location=":memory:")
+    else:
+        client = QdrantClient(
+            url=args.url, api_key=os.getenv("QDRANT_API_KEY"), prefer_grpc=args.grpc,
+            grpc_port=qdrant_profile.QDRANT_GRPC_PORT, timeout=120,
+        )
+    data = _vectors(args.points, args.dim, seed=1)
+    queries = _vectors(args.queries, args.dim, seed=2)
+    top = np.argsort(-(queries @ data.T), axis=1)[:, :args.k]
+    truth = [{str(i) for i in row} for row in top]
+    log(f"{args.points} points, {args.queries} requêtes, dim={args.dim}, k={args.k}, "
+        f"transport={'grpc' if args.grpc else 'http'}, serveur={args.url}")
+
+    for name in args.profiles:
+        profile = qdrant_profile.profile(name)
+        collection = f"bench_{name}"
+        if client.collection_exists(collection):
+            client.delete_collection(collection)
+        client.create_collection(collection_name=collection, **profile.create_kwargs(args.dim))
+
+        t0 = time.perf_counter()
+        for i in range(0, len(data), 1024):
+            batch = data[i:i + 1024]
+            client.upload_collection(collection, vectors=batch, ids=list(range(i, i + len(batch))), wait=True)
+        upload_s = time.perf_counter() - t0
+        index_s = _wait_indexed(client, collection)
+        log(f"--- profil {name}: upload {upload_s:.1f}s, indexation {index_s:.1f}s "
+            f"(m={profile.hnsw_m or 'défaut'}, ef_construct={profile.hnsw_ef_construct or 'défaut'}, "
+            f"quantification={profile.quantization or 'défaut'}, vecteurs sur disque={bool(profile.vectors_on_disk)})")
+
+        log(f"{'hnsw_ef':>8}{'p50 ms':>9}{'p95 ms':>9}{'rappel@' + str(args.k):>11}")
+        for ef in [None, *args.ef]:
+            r = _run(client, collection, profile, queries, args.k, ef, exact=ef is None)
+            recall = np.mean([len(set(found) & want) / args.k for found, want in zip(r["ids"], truth)])
+            log(f"{ef or 'exact':>8}{r['p50']:>9.2f}{r['p95']:>9.2f}{recall:>11.3f}")
+
+        if not args.keep:
+            client.delete_collection(collection)
+
+
+if __name__ == "__main__":
+    main()
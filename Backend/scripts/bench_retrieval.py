@@ -0,0 +1,107 @@
+# scripts/bench_retrieval.py
+"""
+Benchmark hors ligne de la récupération Chat-LAYA: recall@k et MRR des modes
+"vector", "hybrid" (vecteur + BM25, fusion RRF) et "lexical" sur un corpus de test.
+
+Le corpus (scripts/fixtures/retrieval_uemoa.json) est indexé via rag_service.upsert_chunks dans
+une collection Qdrant en mémoire (aucun serveur requis), puis chaque requête est jouée avec
+rag_service.search. `--embedder hash` remplace le modèle par un sac de trigrammes haché
+(vérification de la chaîne sans télécharger de modèle; les chiffres du mode vecteur n'ont
+alors pas de valeur).
+
+    python -m scripts.bench_retrieval
+    python -m scripts.bench_retrieval --rrf-k 20 --candidates 20
+    python -m scripts.bench_retrieval --embedder hash
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+FIXTURE = Path(__file__).resolve().parent / "fixtures" / "retrieval_uemoa.json"
+KS = (1, 3, 5, 10)
+
+
+def log(msg: str) -> None:
+    print(time.strftime("[%H:%M:%S]"), msg, flush=True)
+
+
+def _hash_embed(dim: int):
+    def embed(texts: List[str]) -> List[List[float]]:
+        out = np.zeros((len(texts), dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            padded = f"  {text.lower()}  "
+            for i in range(len(padded) - 2):
+                digest = hashlib.blake2b(padded[i:i + 3].encode("utf-8"), digest_size=4).digest()
+                out[row, int.from_bytes(digest, "little") % dim] += 1.0
+        out /= np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+        return out.tolist()
+
+    return embed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixture", default=str(FIXTURE))
+    parser.add_argument("--embedder", choices=("model", "hash"), default="model")
+    parser.add_argument("--modes", nargs="+", default=["vector", "hybrid", "lexical"])
+    parser.add_argument("--rrf-k", type=int, default=None, help="constante RRF (défaut RAG_RRF_K)")
+    parser.add_argument("--candidates", type=int, default=None, help="candidats par moteur (défaut RAG_HYBRID_CANDIDATES)")
+    args = parser.parse_args()
+
+    from qdrant_client import QdrantClient
+
+    from services import rag_service
+
+    rag_service._QDRANT_CLIENT = QdrantClient(location=":memory:")
+    if args.embedder == "hash":
+        rag_service.embed = _hash_embed(rag_service.EMB_DIM)
+    if args.candidates:
+        rag_service.RAG_HYBRID_CANDIDATES = args.candidates
+
+    fixture = json.loads(Path(args.fixture).read_text(encoding="utf-8"))
+    by_source: Dict[str, List[dict]] = defaultdict(list)
+    for doc in fixture["documents"]:
+        by_source[doc["source"]].append(doc)
+
+    t0 = time.perf_counter()
+    point_to_doc: Dict[str, str] = {}
+    for source, docs in by_source.items():
+        rag_service.upsert_chunks([d["text"] for d in docs], source=source)
+        for d in docs:
+            point_to_doc[rag_service.point_id(source, rag_service.chunk_hash(d["text"]))] = d["id"]
+    log(f"{len(fixture['documents'])} documents indexés en {time.perf_counter() - t0:.1f}s "
+        f"(embedder={args.embedder}), {len(fixture['queries'])} requêtes")
+
+    depth = max(KS)
+    log(f"{'mode':<9}" + "".join(f"{'R@' + str(k):>8}" for k in KS) + f"{'MRR':>8}{'ms/req':>9}")
+    for mode in args.modes:
+        recalls = {k: 0.0 for k in KS}
+        mrr = 0.0
+        elapsed = 0.0
+        for q in fixture["queries"]:
+            relevant = set(q["relevant"])
+            t = time.perf_counter()
+            hits = rag_service.search(q["query"], limit=depth, mode=mode, rrf_k=args.rrf_k)
+            elapsed += time.perf_counter() - t
+            ranked = [point_to_doc.get(h["id"]) for h in hits]
+            for k in KS:
+                recalls[k] += len(relevant & set(ranked[:k])) / len(relevant)
+            first = next((i for i, doc in enumerate(ranked, start=1) if doc in relevant), None)
+            mrr += 1 / first if first else 0.0
+        n = len(fixture["queries"])
+        log(
+            f"{mode:<9}" + "".join(f"{recalls[k] / n:>8.3f}" for k in KS)
+            + f"{mrr / n:>8.3f}{elapsed / n * 1000:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
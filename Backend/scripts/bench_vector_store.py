@@ -0,0 +1,158 @@
+# scripts/bench_vector_store.py
+"""
+Benchmark de latence de recherche: index local embarqué (services/vector_store.py, float32 et
+int8) contre le serveur Qdrant (QDRANT_URL, profil QDRANT_PROFILE), par taille de corpus.
+
+Pour chaque taille, les mêmes vecteurs synthétiques (cf. bench_qdrant_profiles) sont chargés
+dans chaque backend, puis interrogés un par un comme le fait /chatlaya/ask: sans filtre et avec
+un filtre "source" (une source sur --sources, index de payload). La latence Qdrant inclut
+l'aller-retour réseau et la (dé)sérialisation, celle de l'index local le parcours exhaustif.
+Le rappel@k est mesuré contre le produit scalaire exact NumPy. La dernière ligne indique jusqu'à
+quelle taille l'index local répond plus vite que Qdrant (p50 sans filtre).
+
+Sans serveur joignable, seuls les backends locaux sont mesurés.
+
+    python -m scripts.bench_vector_store
+    python -m scripts.bench_vector_store --sizes 1000 10000 100000 300000 --grpc
+    python -m scripts.bench_vector_store --backends local-float32 local-int8
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+from scripts.bench_qdrant_profiles import _vectors, _wait_indexed
+from services import qdrant_profile
+from services.vector_store import LocalVectorStore
+
+BACKENDS = ("local-float32", "local-int8", "qdrant")
+_COLLECTION = "bench_vector_store"
+
+
+def log(msg: str) -> None:
+    print(time.strftime("[%H:%M:%S]"), msg, flush=True)
+
+
+def _qdrant(url: str, grpc: bool) -> Optional[QdrantClient]:
+    client = QdrantClient(
+        url=url, api_key=os.getenv("QDRANT_API_KEY"), prefer_grpc=grpc,
+        grpc_port=qdrant_profile.QDRANT_GRPC_PORT, timeout=120,
+    )
+    try:
+        client.get_collections()
+    except Exception as exc:
+        log(f"Qdrant injoignable ({url}): {exc.__class__.__name__}; backends locaux seulement")
+        return None
+    return client
+
+
+def _load(client: Any, data: np.ndarray, payloads: List[Dict[str, str]], remote: bool) -> float:
+    profile = qdrant_profile.profile()
+    if client.collection_exists(_COLLECTION):
+        client.delete_collection(_COLLECTION)
+    client.create_collection(collection_name=_COLLECTION, **profile.create_kwargs(data.shape[1]))
+    client.create_payload_index(_COLLECTION, field_name="source", field_schema=models.PayloadSchemaType.KEYWORD)
+    t0 = time.perf_counter()
+    for i in range(0, len(data), 1024):
+        client.upload_collection(
+            _COLLECTION, vectors=data[i:i + 1024], payload=payloads[i:i + 1024],
+            ids=list(range(i, i + len(data[i:i + 1024]))), wait=True,
+        )
+    if remote:
+        _wait_indexed(client, _COLLECTION)
+    return time.perf_counter() - t0
+
+
+def _run(client: Any, queries: np.ndarray, k: int, source: Optional[str]) -> Dict[str, Any]:
+    params = qdrant_profile.profile().search_params()
+    flt = None
+    if source is not None:
+        flt = models.Filter(must=[models.FieldCondition(key="source", match=models.MatchValue(value=source))])
+    ids: List[List[str]] = []
+    latencies: List[float] = []
+    for q in queries:
+        t = time.perf_counter()
+        res = client.search(
+            collection_name=_COLLECTION, query_vector=q.tolist(), limit=k, search_params=params, query_filter=flt,
+        )
+        latencies.append((time.perf_counter() - t) * 1000)
+        ids.append([str(p.id) for p in res])
+    ordered = sorted(latencies)
+    return {
+        "ids": ids,
+        "p50": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+    }
+
+
+def _disk_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file()) / 1024 / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL", "http://localhost:6333"))
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=int(os.getenv("EMBED_DIM", os.getenv("EMB_DIM", "384"))))
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--sources", type=int, default=20, help="sources distinctes (sélectivité du filtre)")
+    parser.add_argument("--grpc", action="store_true", help="transport gRPC vers Qdrant")
+    args = parser.parse_args()
+
+    remote = _qdrant(args.url, args.grpc) if "qdrant" in args.backends else None
+    log(f"{args.queries} requêtes, dim={args.dim}, k={args.k}, filtre: 1 source sur {args.sources}, "
+        f"profil Qdrant={qdrant_profile.profile().name}")
+
+    faster_until: Optional[int] = None
+    for size in args.sizes:
+        data = _vectors(size, args.dim, seed=1)
+        queries = _vectors(args.queries, args.dim, seed=2)
+        payloads = [{"source": f"doc{i % args.sources}"} for i in range(size)]
+        top = np.argsort(-(queries @ data.T), axis=1)[:, :args.k]
+        truth = [{str(i) for i in row} for row in top]
+
+        log(f"--- {size} points")
+        log(f"{'backend':<15}{'charge s':>9}{'p50 ms':>9}{'p95 ms':>9}{'filtré p50':>12}{'rappel@' + str(args.k):>10}{'disque Mo':>11}")
+        p50: Dict[str, float] = {}
+        for name in args.backends:
+            with tempfile.TemporaryDirectory() as tmp:
+                if name == "qdrant":
+                    if remote is None:
+                        continue
+                    client: Any = remote
+                else:
+                    client = LocalVectorStore(Path(tmp), dtype=name.split("-", 1)[1])
+                load_s = _load(client, data, payloads, remote=name == "qdrant")
+                _run(client, queries[:10], args.k, None)  # chauffe (cache disque, connexions)
+                r = _run(client, queries, args.k, None)
+                filtered = _run(client, queries, args.k, "doc0")
+                recall = np.mean([len(set(found) & want) / args.k for found, want in zip(r["ids"], truth)])
+                disk = f"{_disk_mb(Path(tmp)):>11.1f}" if name != "qdrant" else f"{'-':>11}"
+                log(f"{name:<15}{load_s:>9.1f}{r['p50']:>9.2f}{r['p95']:>9.2f}{filtered['p50']:>12.2f}{recall:>10.3f}{disk}")
+                p50[name] = r["p50"]
+                if name == "qdrant":
+                    client.delete_collection(_COLLECTION)
+                else:
+                    client.close()
+        if "qdrant" in p50 and min(v for n, v in p50.items() if n != "qdrant") < p50["qdrant"]:
+            faster_until = size
+
+    if remote is not None:
+        if faster_until is None:
+            log("index local plus lent que Qdrant dès la plus petite taille mesurée")
+        else:
+            log(f"index local plus rapide que Qdrant (p50) jusqu'à {faster_until} points au moins")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,25 @@
 # scripts/init_qdrant.py
+"""
+Crée (ou aligne sur QDRANT_PROFILE) la collection Chat-LAYA et y charge quelques points de démo.
+Depuis Backend/, les deux invocations fonctionnent:
+
+    python scripts/init_qdrant.py
+    python -m scripts.init_qdrant
+"""
 from __future__ import annotations
-import os, time, uuid
+import os, sys, time, uuid
+from pathlib import Path
 from typing import Iterable, List
 from qdrant_client import QdrantClient, models
 
+# Lancé comme fichier (python scripts/init_qdrant.py), sys.path contient scripts/ et non Backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from services import qdrant_profile  # noqa: E402
+
 QDRANT_URL = os.getenv("QDRANT_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 COLLECTION = "chatlaya_docs"          # adapte si besoin
 VECTOR_SIZE = 384                     # adapte à ton modèle d’embedding
-DISTANCE = models.Distance.COSINE
 
 def log(msg: str) -> None:
     print(time.strftime("[%H:%M:%S]"), msg, flush=True)
@@ -25,16 +36,20 @@ def seed_points(n: int = 5) -> Iterable[models.PointStruct]:
         )
 
 def ensure_collection(client: QdrantClient) -> None:
+    # Profil QDRANT_PROFILE (HNSW, quantification int8, payload sur disque), cf. services/qdrant_profile.py
+    profile = qdrant_profile.profile()
     try:
-        client.get_collection(COLLECTION)
+        info = client.get_collection(COLLECTION)
         log("✅ Collection déjà existante")
     except Exception:
-        log("⚠️ Collection absente → création…")
-        client.recreate_collection(
-            collection_name=COLLECTION,
-            vectors_config=models.VectorParams(size=VECTOR_SIZE, distance=DISTANCE),
-        )
+        log(f"⚠️ Collection absente → création (profil {profile.name})…")
+        client.create_collection(collection_name=COLLECTION, **profile.create_kwargs(VECTOR_SIZE))
         log("✅ Collection créée")
+        return
+    changes = profile.migration(info)
+    if changes and qdrant_profile.QDRANT_MIGRATE:
+        client.update_collection(collection_name=COLLECTION, **changes)
+        log(f"✅ Collection alignée sur le profil {profile.name}: {', '.join(sorted(changes))}")
 
 def upsert_in_batches(client: QdrantClient, points: List[models.PointStruct], batch_size: int = 128) -> None:
     total = len(points)
@@ -52,7 +67,8 @@ def main() -> None:
     client = QdrantClient(
         url=QDRANT_URL,
         api_key=QDRANT_API_KEY,
-        prefer_grpc=False,  # plus robuste sur Windows
+        prefer_grpc=qdrant_profile.QDRANT_PREFER_GRPC,  # défaut False: plus robuste sur Windows
+        grpc_port=qdrant_profile.QDRANT_GRPC_PORT,
         timeout=30.0,       # augmente si réseau lent (ex: 60.0)
         https=True,
     )
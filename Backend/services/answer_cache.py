@@ -0,0 +1,348 @@
+# services/answer_cache.py
+"""
+Cache de réponses Chat-LAYA à deux niveaux:
+  1. LRU en mémoire (borné, avec TTL), propre au process;
+  2. table Postgres `answers_cache` (partagée entre instances), si DATABASE_URL est défini.
+
+La clé combine la question normalisée, les paramètres qui influencent la réponse
+(top_k, température, max_tokens, modèle) et la génération du corpus. Un changement du corpus
+incrémente la génération (table Postgres `corpus_generation`, relue au plus toutes les
+ANSWER_CACHE_GENERATION_TTL_S par chaque instance): les réponses antérieures, y compris dans
+le LRU des autres instances, ne sont plus jamais servies. Sans Postgres, la génération est
+propre au process. Les lignes Postgres des générations précédentes sont purgées par lots
+(ANSWER_CACHE_PURGE_BATCH) dans un thread de fond; le schéma (table `corpus_generation`,
+colonne `answers_cache.generation`) est créé au démarrage (init_schema).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from core.settings import env_bool, env_float, env_int
+from services import rag_service
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+ANSWER_CACHE_ENABLED = env_bool("ANSWER_CACHE_ENABLED", True)
+ANSWER_CACHE_MAX_ITEMS = env_int("ANSWER_CACHE_MAX_ITEMS", 512)
+ANSWER_CACHE_TTL_S = env_float("ANSWER_CACHE_TTL_S", 3600.0)
+ANSWER_CACHE_PG = env_bool("ANSWER_CACHE_PG", True)
+ANSWER_CACHE_GENERATION_TTL_S = max(0.0, env_float("ANSWER_CACHE_GENERATION_TTL_S", 5.0))
+ANSWER_CACHE_PURGE_BATCH = max(1, env_int("ANSWER_CACHE_PURGE_BATCH", 1000))  # lignes supprimées par requête
+
+
+class TTLCache:
+    """LRU borné dont les entrées expirent après `ttl_s` secondes (thread-safe)."""
+
+    def __init__(self, max_items: int, ttl_s: float):
+        self.max_items = max(1, max_items)
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if self.ttl_s > 0 and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_s, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_MEMORY = TTLCache(ANSWER_CACHE_MAX_ITEMS, ANSWER_CACHE_TTL_S)
+_STATS_LOCK = threading.Lock()
+_STATS: Dict[str, int] = {
+    "hits_memory": 0,
+    "hits_postgres": 0,
+    "misses": 0,
+    "stores": 0,
+    "invalidations": 0,
+    "postgres_errors": 0,
+}
+_GENERATION: Dict[str, float] = {"value": 0, "checked_at": float("-inf")}  # génération du corpus lue en dernier
+
+
+def _count(name: str) -> None:
+    with _STATS_LOCK:
+        _STATS[name] += 1
+
+
+def _pg_enabled() -> bool:
+    return ANSWER_CACHE_PG and bool(rag_service.DATABASE_URL)
+
+
+def _generation_fresh() -> bool:
+    return not _pg_enabled() or time.monotonic() - _GENERATION["checked_at"] < ANSWER_CACHE_GENERATION_TTL_S
+
+
+def _set_generation(value: int) -> None:
+    with _STATS_LOCK:
+        if value != _GENERATION["value"]:
+            _MEMORY.clear()  # entrées d'une génération précédente: inaccessibles, inutile de les garder
+        _GENERATION.update(value=value, checked_at=time.monotonic())
+
+
+def generation() -> int:
+    """Génération du corpus à intégrer à la signature (relue dans Postgres si périmée)."""
+    if not _generation_fresh():
+        try:
+            _set_generation(rag_service.corpus_generation())
+        except Exception:
+            _count("postgres_errors")
+    return int(_GENERATION["value"])
+
+
+async def generation_async() -> int:
+    """Variante async de generation."""
+    if not _generation_fresh():
+        try:
+            _set_generation(await rag_service.corpus_generation_async())
+        except Exception:
+            _count("postgres_errors")
+    return int(_GENERATION["value"])
+
+
+def params_signature(
+    *,
+    top_k: int,
+    temperature: Optional[float],
+    max_tokens: Optional[int],
+    model: str,
+    retrieval: str = "vector",
+    generation: int = 0,
+) -> str:
+    """
+    Paramètres de génération/récupération qui doivent être identiques pour réutiliser une réponse,
+    et génération du corpus (cf. generation()): partagée avec le cache sémantique, elle écarte
+    aussi ses voisins antérieurs au dernier changement du corpus.
+    """
+    return "|".join([str(top_k), repr(temperature), repr(max_tokens), model, retrieval, f"g{generation}"])
+
+
+def cache_key(question: str, signature: str) -> str:
+    raw = rag_service.normalize_q(question) + "|" + signature
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def lookup(question: str, key: str) -> Optional[Dict[str, Any]]:
+    """
+    Cherche une réponse en mémoire puis dans Postgres.
+    Retourne {"answer", "sources", "tier"} ou None.
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return None
+
+    hit = _MEMORY.get(key)
+    if hit is not None:
+        _count("hits_memory")
+        return {**hit, "tier": "memory"}
+
+    if _pg_enabled():
+        try:
+            row = rag_service.cache_get(question, key=key)
+        except Exception:
+            _count("postgres_errors")
+            row = None
+        if row:
+            answer, sources = row
+            entry = {"answer": answer, "sources": sources or []}
+            _MEMORY.put(key, entry)
+            _count("hits_postgres")
+            return {**entry, "tier": "postgres"}
+
+    _count("misses")
+    return None
+
+
+def fetch(question: str, key: str) -> Optional[Dict[str, Any]]:
+    """Lecture directe par clé (sans mise à jour des compteurs), utilisée par le cache sémantique."""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    hit = _MEMORY.get(key)
+    if hit is not None:
+        return hit
+    if _pg_enabled():
+        try:
+            row = rag_service.cache_get(question, key=key)
+        except Exception:
+            _count("postgres_errors")
+            return None
+        if row:
+            entry = {"answer": row[0], "sources": row[1] or []}
+            _MEMORY.put(key, entry)
+            return entry
+    return None
+
+
+async def lookup_async(question: str, key: str) -> Optional[Dict[str, Any]]:
+    """Variante async de lookup (niveau Postgres via le pool async)."""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+
+    hit = _MEMORY.get(key)
+    if hit is not None:
+        _count("hits_memory")
+        return {**hit, "tier": "memory"}
+
+    entry = await _pg_fetch_async(question, key)
+    if entry is not None:
+        _count("hits_postgres")
+        return {**entry, "tier": "postgres"}
+
+    _count("misses")
+    return None
+
+
+async def fetch_async(question: str, key: str) -> Optional[Dict[str, Any]]:
+    """Variante async de fetch."""
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    hit = _MEMORY.get(key)
+    if hit is not None:
+        return hit
+    return await _pg_fetch_async(question, key)
+
+
+async def _pg_fetch_async(question: str, key: str) -> Optional[Dict[str, Any]]:
+    if not _pg_enabled():
+        return None
+    try:
+        row = await rag_service.cache_get_async(question, key=key)
+    except Exception:
+        _count("postgres_errors")
+        return None
+    if not row:
+        return None
+    entry = {"answer": row[0], "sources": row[1] or []}
+    _MEMORY.put(key, entry)
+    return entry
+
+
+def store(question: str, key: str, answer: str, sources: list) -> None:
+    """Enregistre la réponse dans les deux niveaux (les erreurs Postgres sont ignorées)."""
+    if not ANSWER_CACHE_ENABLED:
+        return
+
+    _MEMORY.put(key, {"answer": answer, "sources": sources})
+    _count("stores")
+
+    if _pg_enabled():
+        try:
+            rag_service.cache_put(question, answer, sources, key=key, generation=int(_GENERATION["value"]))
+        except Exception:
+            _count("postgres_errors")
+
+
+async def store_async(question: str, key: str, answer: str, sources: list) -> None:
+    """Variante async de store."""
+    if not ANSWER_CACHE_ENABLED:
+        return
+
+    _MEMORY.put(key, {"answer": answer, "sources": sources})
+    _count("stores")
+
+    if _pg_enabled():
+        try:
+            await rag_service.cache_put_async(question, answer, sources, key=key, generation=int(_GENERATION["value"]))
+        except Exception:
+            _count("postgres_errors")
+
+
+def init_schema() -> None:
+    """Démarrage de l'application: schéma Postgres de la génération du corpus (bloquant, idempotent)."""
+    if not _pg_enabled():
+        return
+    try:
+        rag_service.init_cache_schema()
+    except Exception:
+        _count("postgres_errors")
+
+
+def invalidate() -> None:
+    """
+    Passe à la génération suivante du corpus; à appeler quand le corpus documentaire change
+    (bloquant: depuis la boucle asyncio, via un thread). Les autres instances la lisent au plus
+    ANSWER_CACHE_GENERATION_TTL_S plus tard. Les lignes Postgres des générations précédentes,
+    devenues inaccessibles, sont purgées en arrière-plan.
+    """
+    _count("invalidations")
+    if not _pg_enabled():
+        _set_generation(int(_GENERATION["value"]) + 1)
+        return
+    try:
+        current = rag_service.bump_corpus_generation()
+    except Exception:
+        _count("postgres_errors")
+        _MEMORY.clear()
+        return
+    _set_generation(current)
+    _start_purge()
+
+
+_PURGE_LOCK = threading.Lock()
+_PURGE: Dict[str, Any] = {"thread": None, "pending": False}
+
+
+def _start_purge() -> None:
+    """Une seule purge à la fois; une invalidation pendant la purge la fait reprendre une fois de plus."""
+    with _PURGE_LOCK:
+        _PURGE["pending"] = True
+        thread = _PURGE["thread"]
+        if thread is not None and thread.is_alive():
+            return
+        thread = threading.Thread(target=_purge, name="answer-cache-purge", daemon=True)
+        _PURGE["thread"] = thread
+    thread.start()
+
+
+def _purge() -> None:
+    while True:
+        with _PURGE_LOCK:
+            if not _PURGE["pending"]:
+                _PURGE["thread"] = None
+                return
+            _PURGE["pending"] = False
+        before = int(_GENERATION["value"])
+        try:
+            while rag_service.cache_purge(before, ANSWER_CACHE_PURGE_BATCH) >= ANSWER_CACHE_PURGE_BATCH:
+                pass
+        except Exception:
+            _count("postgres_errors")  # lignes restantes: purgées à la prochaine invalidation
+
+
+def stats() -> Dict[str, Any]:
+    with _STATS_LOCK:
+        snapshot: Dict[str, Any] = dict(_STATS)
+    lookups = snapshot["hits_memory"] + snapshot["hits_postgres"] + snapshot["misses"]
+    snapshot["hit_rate"] = round((lookups - snapshot["misses"]) / lookups, 4) if lookups else 0.0
+    snapshot["memory_items"] = len(_MEMORY)
+    snapshot["memory_max_items"] = _MEMORY.max_items
+    snapshot["ttl_s"] = _MEMORY.ttl_s
+    snapshot["enabled"] = ANSWER_CACHE_ENABLED
+    snapshot["postgres"] = _pg_enabled()
+    snapshot["corpus_generation"] = int(_GENERATION["value"])
+    return snapshot
+
+
+# Toute ingestion dans la collection rend les réponses en cache potentiellement obsolètes
+rag_service.on_corpus_change(invalidate)
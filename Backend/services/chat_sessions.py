@@ -0,0 +1,256 @@
+# services/chat_sessions.py
+"""
+Sessions de conversation Chat-LAYA (/chatlaya/chat).
+
+L'historique est gardé côté serveur: LRU borné (CHAT_SESSIONS_MAX sessions, expiration après
+CHAT_SESSION_TTL_S d'inactivité), propre au processus. Avec un `session_id` connu, le client
+n'envoie que le nouveau message; sinon la session est créée à partir des messages reçus.
+Les identifiants sont toujours émis par le serveur (uuid4): un id inconnu ou expiré ouvre une
+nouvelle session sous un nouvel id. Une session ouverte par un utilisateur authentifié ne
+peut être reprise que par lui (une session anonyme, par quiconque connaît son id).
+
+L'historique sert à deux choses:
+  - la requête de recherche (condense): une relance elliptique ("et pour le Mali ?") est
+    complétée par la requête du tour précédent, bornée à CHAT_QUERY_MAX_WORDS mots; avec
+    CHAT_CONDENSE=llm, le modèle reformule la relance en question autonome;
+  - l'historique du prompt (compact): les derniers échanges sont repris tels quels tant qu'ils
+    tiennent dans CHAT_HISTORY_TOKEN_BUDGET, les plus anciens sont résumés (question + première
+    phrase de la réponse) dans un résumé borné à CHAT_SUMMARY_TOKEN_BUDGET. La taille du prompt
+    reste ainsi constante quand la conversation s'allonge.
+"""
+import os
+import re
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.settings import env_int
+from services.answer_cache import TTLCache
+from services.context_builder import TokenCounter
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+CHAT_SESSIONS_MAX = max(1, env_int("CHAT_SESSIONS_MAX", 1000))
+CHAT_SESSION_TTL_S = env_int("CHAT_SESSION_TTL_S", 2 * 3600)
+CHAT_SESSION_MAX_MESSAGES = max(2, env_int("CHAT_SESSION_MAX_MESSAGES", 40))  # au-delà: résumés
+CHAT_HISTORY_TOKEN_BUDGET = max(0, env_int("CHAT_HISTORY_TOKEN_BUDGET", 600))
+CHAT_SUMMARY_TOKEN_BUDGET = max(0, env_int("CHAT_SUMMARY_TOKEN_BUDGET", 200))
+CHAT_QUERY_MAX_WORDS = max(8, env_int("CHAT_QUERY_MAX_WORDS", 48))  # entrée de l'embedding bornée
+CHAT_CONDENSE = os.getenv("CHAT_CONDENSE", "rules").strip().lower()  # rules | llm
+
+_SUMMARY_WORDS = 24  # mots gardés par question / réponse résumée
+_FOLLOW_UP_WORDS = 6  # une question plus courte est traitée comme une relance
+_FOLLOW_UP_START = re.compile(
+    r"^(et|mais|alors|donc|aussi|puis|ensuite|sinon|pourquoi|comment ça|et si|idem|pareil)\b", re.IGNORECASE
+)
+_ANAPHORA = re.compile(
+    r"\b(cela|ça|ceci|celui|celle|ceux|celles|ce dernier|cette dernière|ces derniers|là-dessus|dessus|"
+    r"le même|la même|les mêmes|précédent|précédente|ci-dessus|mentionné|mentionnée|cette loi|ce texte|ce taux)\b",
+    re.IGNORECASE,
+)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+_ROLES = {"user": "Utilisateur", "assistant": "Assistant"}
+
+
+@dataclass
+class ChatSession:
+    id: str
+    messages: List[Dict[str, str]] = field(default_factory=list)  # récents, tels quels: {"role", "content"}
+    summary: List[str] = field(default_factory=list)  # échanges anciens résumés, du plus ancien au plus récent
+    summarized: int = 0  # messages repliés dans le résumé depuis le début
+    last_query: Optional[str] = None  # requête de recherche du tour précédent (déjà autonome)
+    owner: Optional[str] = None  # utilisateur authentifié qui a ouvert la session (None: anonyme)
+
+
+_SESSIONS = TTLCache(CHAT_SESSIONS_MAX, CHAT_SESSION_TTL_S)
+_LOCK = threading.Lock()
+_STATS: Dict[str, int] = {"created": 0, "resumed": 0, "expired": 0, "foreign": 0, "turns": 0, "condensed": 0}
+
+
+def _count(name: str) -> None:
+    with _LOCK:
+        _STATS[name] += 1
+
+
+def _clean(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Messages utilisateur / assistant non vides (les messages "system" du client sont ignorés)."""
+    return [
+        {"role": m["role"], "content": m["content"].strip()}
+        for m in messages
+        if m.get("role") in _ROLES and (m.get("content") or "").strip()
+    ]
+
+
+def open_session(
+    session_id: Optional[str], messages: List[Dict[str, str]], owner: Optional[str] = None
+) -> Tuple[ChatSession, str]:
+    """
+    Session reprise (les messages reçus sont les nouveaux) ou créée à partir des messages reçus
+    (historique fourni par le client), toujours sous un id émis par le serveur.
+    `owner`: utilisateur authentifié de la requête; seule une session de même propriétaire est reprise.
+    Retourne (session, "resumed" | "created" | "expired" | "foreign").
+    """
+    incoming = _clean(messages)
+    session = _SESSIONS.get(session_id) if session_id else None
+    if session is not None and session.owner == owner:
+        session.messages.extend(incoming)
+        state = "resumed"
+    else:
+        if session is not None:
+            state = "foreign"  # session d'un autre utilisateur: jamais reprise ni modifiée
+        else:
+            state = "expired" if session_id else "created"
+        session = ChatSession(id=uuid.uuid4().hex, messages=incoming, owner=owner)
+    _count(state)
+    _fold_overflow(session)
+    _SESSIONS.put(session.id, session)
+    return session, state
+
+
+def record_answer(session: ChatSession, answer: str, query: str) -> None:
+    session.messages.append({"role": "assistant", "content": answer.strip()})
+    session.last_query = query
+    _fold_overflow(session)
+    _SESSIONS.put(session.id, session)
+    _count("turns")
+
+
+def cancel_turn(session: ChatSession) -> None:
+    """Retire la question sans réponse (échec du LLM): elle peut être renvoyée telle quelle."""
+    while session.messages and session.messages[-1]["role"] == "user":
+        session.messages.pop()
+
+
+def question(session: ChatSession) -> Optional[str]:
+    """Dernier message utilisateur (la question du tour)."""
+    for message in reversed(session.messages):
+        if message["role"] == "user":
+            return message["content"]
+    return None
+
+
+# ---------------------------
+# Requête de recherche autonome
+# ---------------------------
+def _words(text: str, limit: int) -> List[str]:
+    return text.split()[:limit]
+
+
+def _previous_query(session: ChatSession) -> Optional[str]:
+    if session.last_query:
+        return session.last_query
+    users = [m["content"] for m in session.messages if m["role"] == "user"]
+    return users[-2] if len(users) >= 2 else None
+
+
+def is_follow_up(text: str) -> bool:
+    stripped = text.strip()
+    return (
+        len(stripped.split()) <= _FOLLOW_UP_WORDS
+        or bool(_FOLLOW_UP_START.match(stripped))
+        or bool(_ANAPHORA.search(stripped))
+    )
+
+
+def condense(session: ChatSession, text: str) -> Tuple[str, str]:
+    """
+    Requête autonome pour la recherche: (requête, méthode "as_is" | "rules").
+    Une relance est préfixée par le début de la requête précédente; la relance elle-même est
+    toujours gardée entière (dans la limite de CHAT_QUERY_MAX_WORDS).
+    """
+    previous = _previous_query(session)
+    words = _words(text, CHAT_QUERY_MAX_WORDS)
+    if previous is None or not is_follow_up(text):
+        return " ".join(words), "as_is"
+    head = _words(previous, CHAT_QUERY_MAX_WORDS - len(words))
+    _count("condensed")
+    return " ".join(head + words), "rules"
+
+
+def condense_prompt(session: ChatSession, text: str) -> str:
+    """Prompt de reformulation (CHAT_CONDENSE=llm)."""
+    recent = "\n".join(f"{_ROLES[m['role']]}: {' '.join(_words(m['content'], 60))}" for m in session.messages[-5:-1])
+    return (
+        "Reformule la dernière question de l'utilisateur en une question autonome et complète, "
+        "compréhensible sans l'historique. Réponds uniquement par la question reformulée.\n\n"
+        f"Historique:\n{recent}\n\nDernière question:\n{text}\n\nQuestion autonome:"
+    )
+
+
+def bound_query(text: str) -> str:
+    return " ".join(_words(text.strip().strip('"'), CHAT_QUERY_MAX_WORDS))
+
+
+# ---------------------------
+# Historique du prompt sous budget
+# ---------------------------
+def _summary_line(message: Dict[str, str]) -> str:
+    content = message["content"]
+    if message["role"] == "assistant":
+        content = _SENTENCE_END.split(content, maxsplit=1)[0]
+    words = content.split()
+    short = " ".join(words[:_SUMMARY_WORDS]) + (" …" if len(words) > _SUMMARY_WORDS else "")
+    return f"- {_ROLES[message['role']]}: {short}"
+
+
+def _fold(session: ChatSession, count: int) -> None:
+    """Replie les `count` plus anciens messages dans le résumé."""
+    for message in session.messages[:count]:
+        session.summary.append(_summary_line(message))
+    del session.messages[:count]
+    session.summarized += count
+
+
+def _fold_overflow(session: ChatSession) -> None:
+    extra = len(session.messages) - CHAT_SESSION_MAX_MESSAGES
+    if extra > 0:
+        _fold(session, extra)
+
+
+def _trim_summary(session: ChatSession, counter: TokenCounter) -> int:
+    """Oublie les plus anciennes lignes du résumé au-delà de CHAT_SUMMARY_TOKEN_BUDGET; retourne ses tokens."""
+    tokens = counter.count("\n".join(session.summary))
+    while session.summary and tokens > CHAT_SUMMARY_TOKEN_BUDGET:
+        session.summary.pop(0)
+        tokens = counter.count("\n".join(session.summary))
+    return tokens
+
+
+def compact(session: ChatSession, counter: TokenCounter) -> Tuple[str, Dict[str, Any]]:
+    """
+    Historique à placer dans le prompt (sans la question du tour) et son rapport
+    {"tokens", "summary_tokens", "recent_messages", "summarized_messages"}.
+    Les messages récents qui ne tiennent plus dans le budget sont définitivement résumés.
+    """
+    previous = session.messages[:-1] if session.messages and session.messages[-1]["role"] == "user" else session.messages
+    kept = 0
+    used = 0
+    for message in reversed(previous):
+        tokens = counter.count(f"{_ROLES[message['role']]}: {message['content']}") + 1
+        if used + tokens > CHAT_HISTORY_TOKEN_BUDGET:
+            break
+        used += tokens
+        kept += 1
+    _fold(session, len(previous) - kept)
+    summary_tokens = _trim_summary(session, counter)
+
+    sections: List[str] = []
+    if session.summary:
+        sections.append("Résumé des échanges précédents:\n" + "\n".join(session.summary))
+    recent = session.messages[:kept]  # après repli, les messages gardés sont en tête
+    if recent:
+        sections.append("\n".join(f"{_ROLES[m['role']]}: {m['content']}" for m in recent))
+    text = "\n\n".join(sections)
+    return text, {
+        "tokens": counter.count(text),
+        "summary_tokens": summary_tokens,
+        "recent_messages": kept,
+        "summarized_messages": session.summarized,
+    }
+
+
+def stats() -> Dict[str, Any]:
+    with _LOCK:
+        return {**_STATS, "sessions": len(_SESSIONS), "max_sessions": CHAT_SESSIONS_MAX}
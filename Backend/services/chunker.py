@@ -0,0 +1,404 @@
+# services/chunker.py
+"""
+Lecture de documents texte par blocs et découpe incrémentale en morceaux pour l'indexation.
+
+Le découpage suit la structure du texte au lieu de fenêtres de caractères fixes:
+  - titres (Markdown `#`, TITRE / CHAPITRE / SECTION / Article n, lignes en capitales) →
+    un morceau ne chevauche jamais deux sections, le chemin des titres est gardé (`section`);
+  - paragraphes (ligne vide) puis phrases: un morceau ne coupe pas une phrase, sauf phrase
+    plus longue que le morceau entier (coupée entre deux mots);
+  - taille en tokens (CHUNK_MAX_TOKENS, sous la longueur max. du modèle d'embedding), avec un
+    chevauchement de phrases entières (CHUNK_OVERLAP_TOKENS) entre morceaux consécutifs.
+    Les tokens sont comptés avec le tokenizer du modèle d'embedding (CHUNK_TOKENIZER_PATH, sinon
+    celui de l'encodeur chargé par rag_service); l'estimation mots × CHUNK_TOKENS_PER_WORD
+    n'est qu'un repli, signalé dans les logs.
+
+Chaque morceau garde sa position (caractères) dans le texte décodé. Seuls la ligne en cours,
+le paragraphe en cours (borné, vidé phrase par phrase au-delà de _SPILL) et le morceau en
+construction sont en mémoire.
+"""
+import asyncio
+import codecs
+import logging
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.settings import env_float, env_int
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+READ_BLOCK = 64 * 1024
+CHUNK_MAX_TOKENS = max(16, env_int("CHUNK_MAX_TOKENS", 200))  # all-MiniLM-L6-v2 tronque à 256
+CHUNK_OVERLAP_TOKENS = max(0, env_int("CHUNK_OVERLAP_TOKENS", 32))
+CHUNK_TOKENIZER_PATH = os.getenv("CHUNK_TOKENIZER_PATH")  # tokenizer.json du modèle d'embedding (optionnel)
+CHUNK_TOKENS_PER_WORD = max(0.1, env_float("CHUNK_TOKENS_PER_WORD", 1.3))  # estimation sans tokenizer
+
+logger = logging.getLogger(__name__)
+
+_SPILL = 16 * 1024  # paragraphe (ou ligne) au-delà duquel les phrases complètes sont émises
+_PIECE = re.compile(r"\w+|[^\w\s]")
+_WORD = re.compile(r"\S+")
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"»)\]]*\s+(?=[«\"(\[]?[A-ZÀ-ÖØ-Þ])")
+_ABBREVIATIONS = frozenset("m mm mme mlle dr pr me art al cf etc ex p pp vol chap no n°".split())
+_MD_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*$")
+_LEGAL_HEADING = re.compile(
+    r"^(titre|chapitre|section|sous-section|paragraphe|article|art\.)\s+"
+    r"(premier|unique|[ivxlcdm]+|\d+(?:[.\-]\d+)*(?:\s*(?:bis|ter|quater))?)"
+    r"\s*(?:$|[:.\-–—]\s*(.*)$)",
+    re.IGNORECASE,
+)
+_LEGAL_LEVELS = {"titre": 1, "chapitre": 2, "section": 3, "sous-section": 4, "paragraphe": 5, "article": 6, "art.": 6}
+
+
+def detect_encoding(path: str) -> Optional[str]:
+    """Premier encodage qui décode tout le fichier (lecture par blocs, sans tout charger)."""
+    for encoding in ("utf-8", "utf-16", "latin-1"):
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(path, "rb") as fh:
+                while True:
+                    block = fh.read(READ_BLOCK)
+                    if not block:
+                        decoder.decode(b"", final=True)
+                        break
+                    decoder.decode(block)
+        except UnicodeError:  # UnicodeDecodeError, ou UTF-16 sans BOM
+            continue
+        return encoding
+    return None
+
+
+def iter_text(path: str, encoding: str) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder(encoding)()
+    with open(path, "rb") as fh:
+        while True:
+            block = fh.read(READ_BLOCK)
+            text = decoder.decode(block, final=not block)
+            if text:
+                yield text
+            if not block:
+                break
+
+
+# ---------------------------
+# Comptage de tokens
+# ---------------------------
+def estimate_tokens(text: str) -> int:
+    """Mots et signes de ponctuation × CHUNK_TOKENS_PER_WORD (sous-mots du tokenizer)."""
+    return math.ceil(len(_PIECE.findall(text)) * CHUNK_TOKENS_PER_WORD)
+
+
+_COUNTER: Optional[Callable[[str], int]] = None
+_COUNTER_SOURCE = {"name": "estimate"}
+
+
+def token_counter() -> Callable[[str], int]:
+    """
+    Tokenizer du modèle d'embedding: fichier CHUNK_TOKENIZER_PATH, sinon celui de l'encodeur
+    (bloquant: charge le modèle au premier appel). Repli sur l'estimation si aucun n'est
+    disponible; l'estimation n'est pas gardée, le tokenizer est retenté au document suivant.
+    """
+    global _COUNTER
+    if _COUNTER is not None:
+        return _COUNTER
+    try:
+        if CHUNK_TOKENIZER_PATH:
+            from tokenizers import Tokenizer
+
+            tokenizer = Tokenizer.from_file(CHUNK_TOKENIZER_PATH)
+            _COUNTER = lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)  # noqa: E731
+            _COUNTER_SOURCE["name"] = "file"
+        else:
+            from services import rag_service  # import tardif: rag_service importe ce module
+
+            _COUNTER = rag_service.embed_token_counter()
+            _COUNTER_SOURCE["name"] = "encoder"
+        return _COUNTER
+    except Exception as exc:
+        logger.warning(
+            "Tokenizer du modèle d'embedding indisponible (%s): tokens estimés (mots × %s), "
+            "morceaux possiblement tronqués à l'encodage", exc, CHUNK_TOKENS_PER_WORD,
+        )
+        _COUNTER_SOURCE["name"] = "estimate"
+        return estimate_tokens
+
+
+def token_counter_source() -> str:
+    """Comptage utilisé par le dernier Chunker créé: "file", "encoder" ou "estimate"."""
+    return _COUNTER_SOURCE["name"]
+
+
+# ---------------------------
+# Découpage
+# ---------------------------
+@dataclass
+class Chunk:
+    text: str
+    start: int  # position (caractères) du premier caractère dans le texte décodé
+    end: int  # position après le dernier caractère
+    section: Optional[str] = None  # chemin des titres: "TITRE I > Article 3"
+    tokens: int = 0
+
+    def payload(self) -> Dict[str, object]:
+        return {"char_start": self.start, "char_end": self.end, "section": self.section}
+
+
+@dataclass
+class _Unit:
+    text: str
+    start: int
+    end: int
+    tokens: int
+    paragraph: int
+
+
+def _heading(line: str) -> Optional[Tuple[int, str, bool]]:
+    """(niveau, titre, ligne entière ?) si `line` (sans blancs de bord) est un titre."""
+    match = _MD_HEADING.match(line)
+    if match:
+        return len(match.group(1)), match.group(2), True
+    if len(line) <= 300:
+        match = _LEGAL_HEADING.match(line)
+        if match:
+            level = _LEGAL_LEVELS[match.group(1).lower()]
+            rest = (match.group(3) or "").strip()
+            if len(line) <= 100 and not rest.endswith((".", ";", ",")):
+                return level, " ".join(line.split()), True
+            # « Article 5 : Les États membres … »: titre = libellé, la suite est du corps de texte
+            return level, f"{match.group(1).capitalize()} {match.group(2)}", False
+    if len(line) <= 80 and line.upper() == line and not line.endswith((".", ",", ";")):
+        letters = sum(1 for ch in line if ch.isalpha())
+        if letters >= 3 and letters * 2 >= len(line.replace(" ", "")):
+            return 0, " ".join(line.split()), True  # niveau 0: capitales, cf. _set_section
+    return None
+
+
+def _sentences(text: str) -> List[Tuple[int, int]]:
+    """Bornes (début, fin) des phrases de `text`; pas de coupure après une abréviation ou une initiale."""
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        before = text[start:match.start()].rsplit(None, 1)
+        last = before[-1].rstrip(".").lower() if before else ""
+        if last in _ABBREVIATIONS or (len(last) == 1 and last.isalpha()):
+            continue
+        spans.append((start, match.start()))
+        start = match.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+class Chunker:
+    """
+    Découpe incrémentale alimentée bloc par bloc (`feed`), terminée par `finish`.
+    Les deux retournent les morceaux complets produits (objets Chunk).
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = CHUNK_MAX_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self.count = count_tokens or token_counter()
+        self._line = ""  # ligne incomplète
+        self._pos = 0  # position de self._line dans le texte
+        self._mid_line = False  # self._line prolonge une ligne déjà versée au paragraphe
+        self._para = ""  # paragraphe en cours (texte brut, tranche exacte du document)
+        self._para_start = 0
+        self._para_id = 0
+        self._units: List[_Unit] = []  # morceau en construction
+        self._tokens = 0
+        self._headings: List[Tuple[int, str]] = []
+        self._bare_heading = False  # titre rencontré, pas encore de corps de texte
+        self._section: Optional[str] = None
+        self._out: List[Chunk] = []
+
+    def feed(self, text: str) -> List[Chunk]:
+        self._line += text
+        start = 0
+        while True:
+            newline = self._line.find("\n", start)
+            if newline < 0:
+                break
+            self._on_line(self._line[start:newline], self._pos + start)
+            start = newline + 1
+        self._pos += start
+        self._line = self._line[start:]
+        if len(self._line) > _SPILL:
+            # Ligne très longue (texte extrait sans retours à la ligne): pas un titre
+            self._append_para(self._line, self._pos, continuation=self._mid_line)
+            self._pos += len(self._line)
+            self._line = ""
+            self._mid_line = True
+        return self._drain()
+
+    def finish(self) -> List[Chunk]:
+        if self._line:
+            self._on_line(self._line, self._pos)
+            self._pos += len(self._line)
+            self._line = ""
+        self._end_para()
+        self._flush(carry=False)
+        return self._drain()
+
+    def _drain(self) -> List[Chunk]:
+        out, self._out = self._out, []
+        return out
+
+    # -- lignes et paragraphes --
+    def _on_line(self, raw: str, offset: int) -> None:
+        if self._mid_line:
+            self._mid_line = False
+            self._append_para(raw, offset, continuation=True)
+            return
+        stripped = raw.strip()
+        if not stripped:
+            self._end_para()
+            return
+        heading = _heading(stripped)
+        if heading is None:
+            self._append_para(raw, offset)
+            return
+        level, title, whole_line = heading
+        self._end_para()
+        if level == 0 and self._bare_heading and self._headings:
+            # « TITRE I » puis « DISPOSITIONS GÉNÉRALES »: intitulé du même titre
+            last_level, last_title = self._headings[-1]
+            self._headings[-1] = (last_level, f"{last_title} — {title}")
+        else:
+            if not self._bare_heading:  # titres consécutifs: gardés en tête du morceau suivant
+                self._flush(carry=False)
+            self._set_section(level or 1, title)
+        self._section = " > ".join(t for _, t in self._headings)
+        if whole_line:
+            lead = len(raw) - len(raw.lstrip())
+            self._add_sentence(stripped, offset + lead)
+            self._para_id += 1
+            self._bare_heading = True
+        else:
+            self._bare_heading = False
+            self._append_para(raw, offset)
+
+    def _set_section(self, level: int, title: str) -> None:
+        while self._headings and self._headings[-1][0] >= level:
+            self._headings.pop()
+        self._headings.append((level, title))
+
+    def _append_para(self, raw: str, offset: int, continuation: bool = False) -> None:
+        self._bare_heading = False
+        if not self._para:
+            self._para, self._para_start = raw, offset
+        else:
+            self._para += raw if continuation else "\n" + raw
+        if len(self._para) > _SPILL:
+            self._spill()
+
+    def _spill(self) -> None:
+        """Émet les phrases complètes d'un paragraphe trop long; garde la dernière (peut-être incomplète)."""
+        spans = _sentences(self._para)
+        if len(spans) < 2 and len(self._para) < 4 * _SPILL:
+            return
+        keep = spans[-1][0] if len(spans) > 1 else len(self._para)
+        for s, e in spans[:-1] if len(spans) > 1 else spans:
+            self._add_sentence(self._para[s:e], self._para_start + s)
+        self._para = self._para[keep:]
+        self._para_start += keep
+
+    def _end_para(self) -> None:
+        if self._para:
+            for s, e in _sentences(self._para):
+                self._add_sentence(self._para[s:e], self._para_start + s)
+            self._para = ""
+        self._para_id += 1
+
+    # -- morceaux --
+    def _add_sentence(self, raw: str, offset: int) -> None:
+        text = " ".join(raw.split())
+        if not text:
+            return
+        start = offset + len(raw) - len(raw.lstrip())
+        end = offset + len(raw.rstrip())
+        tokens = self.count(text)
+        if tokens <= self.max_tokens:
+            self._add_unit(_Unit(text, start, end, tokens, self._para_id))
+            return
+        # Phrase plus longue qu'un morceau: coupée entre deux mots
+        words: List[str] = []
+        piece_start = piece_end = start
+        piece_tokens = 0
+        for match in _WORD.finditer(raw):
+            word_tokens = self.count(match.group())
+            if words and piece_tokens + word_tokens > self.max_tokens:
+                self._add_unit(_Unit(" ".join(words), piece_start, piece_end, piece_tokens, self._para_id))
+                words, piece_tokens = [], 0
+            if not words:
+                piece_start = offset + match.start()
+            words.append(match.group())
+            piece_tokens += word_tokens
+            piece_end = offset + match.end()
+        if words:
+            self._add_unit(_Unit(" ".join(words), piece_start, piece_end, piece_tokens, self._para_id))
+
+    def _add_unit(self, unit: _Unit) -> None:
+        if self._units and self._tokens + unit.tokens > self.max_tokens:
+            self._flush(carry=True)
+            if self._tokens + unit.tokens > self.max_tokens:
+                self._units, self._tokens = [], 0
+        self._units.append(unit)
+        self._tokens += unit.tokens
+
+    def _flush(self, carry: bool) -> None:
+        units = self._units
+        if not units:
+            return
+        parts = [units[0].text]
+        for prev, unit in zip(units, units[1:]):
+            parts.append((" " if unit.paragraph == prev.paragraph else "\n") + unit.text)
+        self._out.append(Chunk("".join(parts), units[0].start, units[-1].end, self._section, self._tokens))
+
+        kept: List[_Unit] = []
+        kept_tokens = 0
+        if carry:
+            # Chevauchement: dernières phrases entières, sans reprendre tout le morceau
+            for unit in reversed(units[1:]):
+                if kept_tokens + unit.tokens > self.overlap_tokens:
+                    break
+                kept.insert(0, unit)
+                kept_tokens += unit.tokens
+        self._units, self._tokens = kept, kept_tokens
+
+
+def _next_chunks(blocks: Iterator[str], chunker: Chunker) -> Optional[List[Chunk]]:
+    """Lit le bloc suivant et le découpe; None en fin de flux (après les derniers morceaux)."""
+    block = next(blocks, None)
+    if block is None:
+        return None
+    return chunker.feed(block)
+
+
+async def iter_chunks(
+    blocks: Iterator[str],
+    max_tokens: int = CHUNK_MAX_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> AsyncIterator[Chunk]:
+    """
+    Morceaux produits au fil de la lecture des blocs. Lecture (disque) et découpe (CPU)
+    de chaque bloc tournent dans un thread: la boucle asyncio reste libre pendant l'ingestion.
+    """
+    chunker = await asyncio.to_thread(Chunker, max_tokens, overlap_tokens)  # peut charger le tokenizer
+    while True:
+        chunks = await asyncio.to_thread(_next_chunks, blocks, chunker)
+        if chunks is None:
+            break
+        for chunk in chunks:
+            yield chunk
+    for chunk in await asyncio.to_thread(chunker.finish):
+        yield chunk
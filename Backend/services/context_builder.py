@@ -0,0 +1,252 @@
+# services/context_builder.py
+"""
+Assemblage du contexte documentaire du prompt Chat-LAYA sous budget de tokens.
+
+Étapes: (1) suppression des doublons et des passages contenus dans un autre, (2) fusion des
+morceaux adjacents d'une même source (le découpage reprend les dernières phrases du morceau
+précédent: la partie commune n'est gardée qu'une fois), (3) remplissage du budget CONTEXT_TOKEN_BUDGET
+par ordre de pertinence, en passant les passages trop longs pour le reste du budget.
+
+Les tokens sont comptés avec le tokenizer du modèle Cohere (téléchargé une fois, gardé sous
+storage/models/tokenizers/) ou un fichier tokenizer.json local (CONTEXT_TOKENIZER_PATH).
+Tant qu'il n'est pas chargé, une estimation (caractères / CONTEXT_CHARS_PER_TOKEN) est utilisée
+et signalée comme telle dans le rapport; un chargement en échec est retenté au fil des comptages,
+avec un délai doublé à chaque échec (CONTEXT_TOKENIZER_RETRY_S .. CONTEXT_TOKENIZER_RETRY_MAX_S).
+"""
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.settings import env_float, env_int
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+CONTEXT_TOKEN_BUDGET = max(0, env_int("CONTEXT_TOKEN_BUDGET", 1500))
+CONTEXT_TOKENIZER_PATH = os.getenv("CONTEXT_TOKENIZER_PATH")  # tokenizer.json (HF tokenizers) optionnel
+CONTEXT_CHARS_PER_TOKEN = max(1.0, env_float("CONTEXT_CHARS_PER_TOKEN", 3.5))  # estimation (français)
+CONTEXT_MIN_OVERLAP = max(1, env_int("CONTEXT_MIN_OVERLAP", 20))  # chevauchement minimal pour fusionner
+CONTEXT_MAX_OVERLAP = env_int("CONTEXT_MAX_OVERLAP", 400)  # ≥ chevauchement du découpage (CHUNK_OVERLAP_TOKENS)
+CONTEXT_TOKENIZER_RETRY_S = max(1.0, env_float("CONTEXT_TOKENIZER_RETRY_S", 30.0))
+CONTEXT_TOKENIZER_RETRY_MAX_S = max(CONTEXT_TOKENIZER_RETRY_S, env_float("CONTEXT_TOKENIZER_RETRY_MAX_S", 1800.0))
+
+_TOKENIZER_DIR = Path(__file__).resolve().parent.parent / "storage" / "models" / "tokenizers"
+
+
+class TokenCounter:
+    """Compte de tokens avec le tokenizer du modèle; chargement en tâche de fond, estimation en attendant."""
+
+    def __init__(self, model: str):
+        self.model = model
+        self._tokenizer = None
+        self._name = "estimate"
+        self._loading = False
+        self._retry_at = 0.0  # pas de nouvelle tentative de chargement avant (time.monotonic)
+        self._retry_delay = CONTEXT_TOKENIZER_RETRY_S
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._tokenizer is None:
+            self.preload()
+            return math.ceil(len(text) / CONTEXT_CHARS_PER_TOKEN)
+        return len(self._tokenizer.encode(text, add_special_tokens=False).ids)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Préfixe de `text` d'au plus `max_tokens` tokens (coupé sur une frontière de token)."""
+        if max_tokens <= 0:
+            return ""
+        tokenizer = self._tokenizer
+        if tokenizer is None:
+            return text[: int(max_tokens * CONTEXT_CHARS_PER_TOKEN)]  # exact pour l'estimation
+        offsets = tokenizer.encode(text, add_special_tokens=False).offsets
+        if len(offsets) <= max_tokens:
+            return text
+        return text[: offsets[max_tokens - 1][1]]
+
+    def load(self) -> bool:
+        """Charge le tokenizer (bloquant); False si aucun n'est disponible."""
+        try:
+            from tokenizers import Tokenizer
+
+            if CONTEXT_TOKENIZER_PATH:
+                tokenizer, name = Tokenizer.from_file(CONTEXT_TOKENIZER_PATH), "file"
+            else:
+                tokenizer, name = self._cohere_tokenizer(), f"cohere:{self.model}"
+        except Exception:
+            return False
+        self._tokenizer, self._name = tokenizer, name
+        return True
+
+    def _cohere_tokenizer(self):
+        from tokenizers import Tokenizer
+
+        cached = _TOKENIZER_DIR / f"{self.model.replace('/', '__')}.json"
+        if cached.exists():
+            return Tokenizer.from_file(str(cached))
+        api_key = os.getenv("COHERE_API_KEY")
+        if not api_key:
+            raise RuntimeError("COHERE_API_KEY manquante")
+        from cohere.manually_maintained.tokenizers import get_hf_tokenizer
+
+        from services.router_ai import _cohere_client
+
+        tokenizer = get_hf_tokenizer(_cohere_client(api_key), self.model)
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        tokenizer.save(str(cached))
+        return tokenizer
+
+    def preload(self) -> None:
+        """Lance le chargement du tokenizer dans un thread (un seul à la fois, après le délai de reprise)."""
+        with self._lock:
+            if self._loading or self._tokenizer is not None or time.monotonic() < self._retry_at:
+                return
+            self._loading = True
+        threading.Thread(target=self._load_once, name="tokenizer-load", daemon=True).start()
+
+    def _load_once(self) -> None:
+        loaded = False
+        try:
+            loaded = self.load()
+        finally:
+            with self._lock:
+                self._loading = False
+                if not loaded:
+                    self._retry_at = time.monotonic() + self._retry_delay
+                    self._retry_delay = min(self._retry_delay * 2, CONTEXT_TOKENIZER_RETRY_MAX_S)
+
+
+_COUNTERS: Dict[str, TokenCounter] = {}
+_COUNTERS_LOCK = threading.Lock()
+
+
+def token_counter(model: str) -> TokenCounter:
+    with _COUNTERS_LOCK:
+        if model not in _COUNTERS:
+            _COUNTERS[model] = TokenCounter(model)
+        return _COUNTERS[model]
+
+
+@dataclass
+class _Passage:
+    source: Optional[str]
+    text: str
+    rank: int  # meilleur rang (0 = plus pertinent) des morceaux qui le composent
+    hits: List[Dict[str, Any]] = field(default_factory=list)
+    section: Optional[str] = None  # chemin des titres du premier morceau (chunker.Chunk.section)
+
+
+@dataclass
+class BuiltContext:
+    text: str
+    hits: List[Dict[str, Any]]  # morceaux effectivement placés dans le contexte, par pertinence
+    report: Dict[str, Any]
+
+
+def _overlap(left: str, right: str) -> int:
+    """Longueur du plus long suffixe de `left` qui est un préfixe de `right` (≥ CONTEXT_MIN_OVERLAP), sinon 0."""
+    upper = min(len(left), len(right), CONTEXT_MAX_OVERLAP)
+    for size in range(upper, CONTEXT_MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+def _merge_same_source(passages: List[_Passage]) -> int:
+    """Fusionne en place les passages d'une même source qui se chevauchent; retourne le nombre de fusions."""
+    merges = 0
+    changed = True
+    while changed:
+        changed = False
+        for i, a in enumerate(passages):
+            for j, b in enumerate(passages):
+                if i == j or a.source != b.source:
+                    continue
+                size = _overlap(a.text, b.text)
+                if size:
+                    a.text = a.text + b.text[size:]
+                    a.rank = min(a.rank, b.rank)
+                    a.hits.extend(b.hits)
+                    del passages[j]
+                    merges += 1
+                    changed = True
+                    break
+            if changed:
+                break
+    return merges
+
+
+def build(hits: List[Dict[str, Any]], counter: TokenCounter, budget: int = CONTEXT_TOKEN_BUDGET) -> BuiltContext:
+    """`hits` triés par pertinence décroissante (sortie de la recherche / du rerank)."""
+    passages: List[_Passage] = []
+    deduped = 0
+    for rank, hit in enumerate(hits):
+        payload = hit.get("payload") or {}
+        text = str(payload.get("text") or "").strip()
+        if not text:
+            continue
+        source = payload.get("title") or payload.get("source")
+        container = next((p for p in passages if text in p.text), None)
+        if container is not None:
+            container.hits.append(hit)
+            deduped += 1
+            continue
+        contained = [p for p in passages if p.text in text]
+        for p in contained:
+            passages.remove(p)
+            deduped += 1
+        passage = _Passage(source, text, min([rank] + [p.rank for p in contained]), [hit], payload.get("section"))
+        for p in contained:
+            passage.hits.extend(p.hits)
+        passages.append(passage)
+
+    merged = _merge_same_source(passages)
+    passages.sort(key=lambda p: p.rank)
+
+    parts: List[str] = []
+    used_hits: List[Dict[str, Any]] = []
+    used_tokens = 0
+    dropped = 0
+    for passage in passages:
+        header = " — ".join(x for x in (passage.source, passage.section) if x)
+        block = f"Source: {header}\n{passage.text}" if header else passage.text
+        tokens = counter.count(block) + (2 if parts else 0)  # séparateur "\n\n"
+        if used_tokens + tokens > budget:
+            if parts or budget <= 0:
+                dropped += 1
+                continue
+            # Le passage le plus pertinent dépasse à lui seul le budget: on le tronque au budget
+            # (en tokens du tokenizer; le recomptage couvre les fusions de tokens à la coupure)
+            limit = budget
+            block = counter.truncate(block, limit)
+            tokens = counter.count(block)
+            while tokens > budget and limit > 0:
+                limit -= max(1, tokens - budget)
+                block = counter.truncate(block, limit)
+                tokens = counter.count(block)
+        parts.append(block)
+        used_hits.extend(sorted(passage.hits, key=lambda h: hits.index(h)))
+        used_tokens += tokens
+
+    return BuiltContext(
+        text="\n\n".join(parts),
+        hits=used_hits,
+        report={
+            "context": used_tokens,
+            "budget": budget,
+            "passages": len(parts),
+            "dropped": dropped,
+            "merged": merged,
+            "deduplicated": deduped,
+            "tokenizer": counter.name,
+        },
+    )
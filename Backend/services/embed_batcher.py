@@ -0,0 +1,143 @@
+# services/embed_batcher.py
+"""
+Micro-batching des encodages de requêtes.
+
+Les requêtes concurrentes (/chatlaya/ask, /chatlaya/search) déposent leur texte dans une file;
+dès que EMBED_BATCH_MAX textes attendent, ou au plus tard EMBED_BATCH_WAIT_MS après le premier,
+un seul `encode` batché part sur le pool d'encodage et chaque appelant reçoit son vecteur.
+Un forward de N textes coûte bien moins que N forwards de 1, et les threads ne se disputent
+plus le modèle.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from core.settings import env_bool, env_float, env_int
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+EMBED_MICROBATCH = env_bool("EMBED_MICROBATCH", True)
+EMBED_BATCH_MAX = max(1, env_int("EMBED_BATCH_MAX", 32))
+EMBED_BATCH_WAIT_MS = max(0.0, env_float("EMBED_BATCH_WAIT_MS", 5.0))
+
+_WINDOW = 1024  # échantillons gardés pour les percentiles
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 2)
+
+
+class MicroBatcher:
+    """
+    Regroupe les appels `encode(text)` d'une boucle asyncio en lots pour `encode_batch(texts)`,
+    exécuté sur `executor()`.
+    """
+
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], List[List[float]]],
+        executor: Callable[[], Executor],
+        max_batch: int = EMBED_BATCH_MAX,
+        max_wait_ms: float = EMBED_BATCH_WAIT_MS,
+    ):
+        self._encode_batch = encode_batch
+        self._executor = executor
+        self.max_batch = max(1, max_batch)
+        self.max_wait_s = max(0.0, max_wait_ms) / 1000
+        self._pending: List[Tuple[str, "asyncio.Future[List[float]]", float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set["asyncio.Task[None]"] = set()  # lots en cours (référence gardée jusqu'à la fin)
+        self._stats_lock = threading.Lock()
+        self._sizes: Deque[int] = deque(maxlen=_WINDOW)
+        self._waits: Deque[float] = deque(maxlen=_WINDOW)
+        self._encode_ms: Deque[float] = deque(maxlen=_WINDOW)
+        self._counters = {"requests": 0, "batches": 0, "errors": 0}
+
+    async def encode(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future: "asyncio.Future[List[float]]" = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_s, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[: self.max_batch], self._pending[self.max_batch:]
+            task = asyncio.get_running_loop().create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def aclose(self, timeout: float = 5.0) -> None:
+        """
+        Arrêt: les textes en attente partent tout de suite, les lots en cours ont `timeout`
+        secondes pour finir; au-delà ils sont annulés (et leurs appelants avec).
+        """
+        self._flush()
+        if not self._tasks:
+            return
+        _, late = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in late:
+            task.cancel()
+        if late:
+            await asyncio.gather(*late, return_exceptions=True)
+
+    async def _run(self, batch: List[Tuple[str, "asyncio.Future[List[float]]", float]]) -> None:
+        started = time.perf_counter()
+        live = [item for item in batch if not item[1].cancelled()]
+        if not live:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+            vectors = await loop.run_in_executor(self._executor(), self._encode_batch, [t for t, _, _ in live])
+        except asyncio.CancelledError:
+            for _, future, _ in live:
+                future.cancel()
+            raise
+        except Exception as exc:
+            with self._stats_lock:
+                self._counters["errors"] += 1
+            for _, future, _ in live:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        with self._stats_lock:
+            self._counters["requests"] += len(live)
+            self._counters["batches"] += 1
+            self._sizes.append(len(live))
+            self._encode_ms.append((time.perf_counter() - started) * 1000)
+            self._waits.extend((started - enqueued) * 1000 for _, _, enqueued in live)
+        for (_, future, _), vector in zip(live, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            sizes, waits, encode_ms = list(self._sizes), list(self._waits), list(self._encode_ms)
+            snapshot: Dict[str, Any] = dict(self._counters)
+        snapshot.update({
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_s * 1000,
+            "pending": len(self._pending),
+            "in_flight": len(self._tasks),
+            "batch_size_mean": round(sum(sizes) / len(sizes), 2) if sizes else None,
+            "batch_size_max": max(sizes) if sizes else None,
+            "queue_wait_ms_p50": _percentile(waits, 0.5),
+            "queue_wait_ms_p95": _percentile(waits, 0.95),
+            "encode_ms_p50": _percentile(encode_ms, 0.5),
+            "encode_ms_p95": _percentile(encode_ms, 0.95),
+        })
+        return snapshot
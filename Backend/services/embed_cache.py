@@ -0,0 +1,140 @@
+# services/embed_cache.py
+"""
+Cache LRU des embeddings de requêtes.
+
+Les vecteurs sont stockés en tableaux float32 (384 dims → 1,5 Ko) et non en listes Python
+(~12 Ko), sous un budget mémoire (EMBED_CACHE_MAX_MB): les entrées les moins récemment
+utilisées sont évincées au-delà. Optionnellement sauvegardé sur disque (EMBED_CACHE_PATH,
+format .npz) à l'arrêt et rechargé au démarrage.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from core.settings import env_bool, env_float
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+EMBED_CACHE_ENABLED = env_bool("EMBED_CACHE_ENABLED", True)
+EMBED_CACHE_MAX_MB = max(0.0, env_float("EMBED_CACHE_MAX_MB", 16.0))
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH")  # ex: storage/embed_cache.npz (vide = pas de persistance)
+
+_KEY_OVERHEAD = 160  # octets approx. par entrée (clé + nœud de l'OrderedDict + en-tête ndarray)
+
+
+def cache_key(model: str, normalized_text: str) -> str:
+    return hashlib.blake2b(f"{model}\n{normalized_text}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+class EmbeddingLRU:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, int(max_bytes))
+        self._items: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def _cost(vec: np.ndarray) -> int:
+        return vec.nbytes + _KEY_OVERHEAD
+
+    def get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vec = self._items.get(key)
+            if vec is None:
+                self._counters["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self._counters["hits"] += 1
+        return vec.tolist()
+
+    def put(self, key: str, vector: List[float]) -> None:
+        vec = np.asarray(vector, dtype=np.float32)
+        if self._cost(vec) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= self._cost(old)
+            self._items[key] = vec
+            self._bytes += self._cost(vec)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= self._cost(evicted)
+                self._counters["evictions"] += 1
+
+    def save(self, path: str) -> int:
+        """Écrit les entrées (de la plus ancienne à la plus récente) dans un .npz; retourne leur nombre."""
+        with self._lock:
+            keys = list(self._items.keys())
+            matrix = np.stack(list(self._items.values())) if keys else np.zeros((0, 0), dtype=np.float32)
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, keys=np.asarray(keys, dtype="U32"), vectors=matrix)
+        os.replace(tmp, path)
+        return len(keys)
+
+    def load(self, path: str) -> int:
+        if not os.path.exists(path):
+            return 0
+        with np.load(path) as data:
+            keys, matrix = data["keys"], data["vectors"]
+        for key, vec in zip(keys.tolist(), matrix):
+            self.put(key, vec)
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot: Dict[str, Any] = dict(self._counters)
+            snapshot["items"] = len(self._items)
+            snapshot["bytes"] = self._bytes
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = round(snapshot["hits"] / lookups, 4) if lookups else 0.0
+        snapshot["max_bytes"] = self.max_bytes
+        return snapshot
+
+
+_CACHE: Optional[EmbeddingLRU] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> Optional[EmbeddingLRU]:
+    """Cache du processus (rechargé depuis EMBED_CACHE_PATH à la création), ou None si désactivé."""
+    global _CACHE
+    if not EMBED_CACHE_ENABLED:
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                cache = EmbeddingLRU(int(EMBED_CACHE_MAX_MB * 1024 * 1024))
+                if EMBED_CACHE_PATH:
+                    try:
+                        cache.load(EMBED_CACHE_PATH)
+                    except Exception:
+                        # Fichier corrompu ou d'un autre format: on repart d'un cache vide
+                        cache.clear()
+                _CACHE = cache
+    return _CACHE
+
+
+def persist() -> Optional[int]:
+    """Sauvegarde le cache sur disque si EMBED_CACHE_PATH est défini (appelé à l'arrêt)."""
+    if _CACHE is None or not EMBED_CACHE_PATH:
+        return None
+    return _CACHE.save(EMBED_CACHE_PATH)
+
+
+def stats() -> Optional[Dict[str, Any]]:
+    cache = get_cache()
+    return cache.stats() if cache is not None else None
@@ -0,0 +1,173 @@
+# services/embedders.py
+"""
+Backends d'embedding interchangeables (EMBED_BACKEND):
+
+  - "sentence-transformers" (défaut): SentenceTransformer sur PyTorch.
+  - "onnx": même modèle exporté en ONNX, exécuté par ONNX Runtime (sans torch), optionnellement
+    quantifié int8 (EMBED_ONNX_INT8=1). Tokenisation via `tokenizers`, mean pooling masqué
+    puis normalisation L2, comme le pipeline sentence-transformers du modèle.
+
+Tous les backends exposent `encode(texts, normalize_embeddings=True) -> np.ndarray (float32)`.
+"""
+import os
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+from core.settings import env_bool, env_int
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "sentence-transformers").strip().lower()
+EMBED_ONNX_DIR = os.getenv("EMBED_ONNX_DIR")  # défaut: storage/models/<modèle>
+EMBED_ONNX_INT8 = env_bool("EMBED_ONNX_INT8", False)
+EMBED_ONNX_THREADS = env_int("EMBED_ONNX_THREADS", 0)  # 0 = choix d'ONNX Runtime
+EMBED_MAX_SEQ_LEN = env_int("EMBED_MAX_SEQ_LEN", 256)  # max_seq_length de all-MiniLM-L6-v2
+EMBED_BATCH_SIZE = max(1, env_int("EMBED_BATCH_SIZE", 32))
+
+BACKENDS = ("sentence-transformers", "onnx")
+_MODELS_DIR = Path(__file__).resolve().parent.parent / "storage" / "models"
+
+
+def _counting_tokenizer(tokenizer):
+    """Copie d'un tokenizer `tokenizers` sans troncature ni padding, réservée au comptage (thread-safe)."""
+    from tokenizers import Tokenizer
+
+    copy = Tokenizer.from_str(tokenizer.to_str())
+    copy.no_truncation()
+    copy.no_padding()
+    return copy
+
+
+class SentenceTransformerEncoder:
+    name = "sentence-transformers"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model_name)
+        self._counter = None
+
+    def count_tokens(self, text: str) -> int:
+        """Tokens du texte pour ce modèle (sans [CLS]/[SEP], sans troncature)."""
+        if self._counter is None:
+            self._counter = _counting_tokenizer(self._model.tokenizer.backend_tokenizer)
+        return len(self._counter.encode(text, add_special_tokens=False).ids)
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True) -> np.ndarray:
+        vecs = self._model.encode(texts, batch_size=EMBED_BATCH_SIZE, normalize_embeddings=normalize_embeddings)
+        return np.asarray(vecs, dtype=np.float32)
+
+
+class OnnxEncoder:
+    """Transformer ONNX + mean pooling; charge `model.onnx` (ou `model_int8.onnx`) et `tokenizer.json`."""
+
+    name = "onnx"
+
+    def __init__(self, model_name: str, int8: bool = False, model_dir: Optional[str] = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        directory = prepare_onnx(model_name, int8=int8, model_dir=model_dir)
+        self.int8 = int8
+        self._tokenizer = Tokenizer.from_file(str(directory / "tokenizer.json"))
+        self._counter = _counting_tokenizer(self._tokenizer)
+        self._tokenizer.enable_truncation(max_length=EMBED_MAX_SEQ_LEN)
+        self._tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if EMBED_ONNX_THREADS > 0:
+            options.intra_op_num_threads = EMBED_ONNX_THREADS
+        self._session = ort.InferenceSession(
+            str(directory / _onnx_file(int8)), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._inputs = {i.name for i in self._session.get_inputs()}
+
+    def count_tokens(self, text: str) -> int:
+        """Tokens du texte pour ce modèle (sans [CLS]/[SEP], sans troncature)."""
+        return len(self._counter.encode(text, add_special_tokens=False).ids)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(texts)
+        ids = np.asarray([e.ids for e in encodings], dtype=np.int64)
+        mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self._inputs:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = self._session.run(None, feeds)[0]  # (batch, seq, dim)
+        weights = mask[..., None].astype(np.float32)
+        return (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+
+    def encode(self, texts: List[str], normalize_embeddings: bool = True) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        # Tri par longueur (comme sentence-transformers): moins de padding par lot
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        out: List[np.ndarray] = [None] * len(texts)  # type: ignore[list-item]
+        for i in range(0, len(texts), EMBED_BATCH_SIZE):
+            idx = order[i:i + EMBED_BATCH_SIZE]
+            vecs = self._encode_batch([texts[j] for j in idx])
+            for j, vec in zip(idx, vecs):
+                out[j] = vec
+        result = np.stack(out).astype(np.float32)
+        if normalize_embeddings:
+            result /= np.clip(np.linalg.norm(result, axis=1, keepdims=True), 1e-12, None)
+        return result
+
+
+def _onnx_file(int8: bool) -> str:
+    return "model_int8.onnx" if int8 else "model.onnx"
+
+
+def onnx_dir(model_name: str, model_dir: Optional[str] = None) -> Path:
+    return Path(model_dir or EMBED_ONNX_DIR or _MODELS_DIR / model_name.replace("/", "__"))
+
+
+def prepare_onnx(model_name: str, int8: bool = False, model_dir: Optional[str] = None) -> Path:
+    """
+    S'assure que l'export ONNX du modèle est présent localement:
+      - model.onnx + tokenizer.json téléchargés depuis le Hub (export `onnx/` publié avec le modèle);
+      - model_int8.onnx produit par quantification dynamique (poids int8) si demandé.
+    Retourne le dossier du modèle.
+    """
+    directory = onnx_dir(model_name, model_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    for target, remote in (("model.onnx", "onnx/model.onnx"), ("tokenizer.json", "tokenizer.json")):
+        if not (directory / target).exists():
+            from huggingface_hub import hf_hub_download
+
+            downloaded = hf_hub_download(repo_id=model_name, filename=remote)
+            (directory / target).write_bytes(Path(downloaded).read_bytes())
+
+    if int8 and not (directory / _onnx_file(True)).exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            str(directory / "model.onnx"),
+            str(directory / _onnx_file(True)),
+            weight_type=QuantType.QInt8,
+        )
+    return directory
+
+
+def model_tag(model_name: str) -> str:
+    """Identifiant modèle + backend (les vecteurs int8 diffèrent légèrement des fp32)."""
+    backend = EMBED_BACKEND
+    if backend in {"onnx", "onnxruntime"} and EMBED_ONNX_INT8:
+        backend = "onnx-int8"
+    return f"{model_name}@{backend}"
+
+
+def load(model_name: str, backend: Optional[str] = None, int8: Optional[bool] = None):
+    """Instancie le backend demandé (défaut: EMBED_BACKEND)."""
+    backend = (backend or EMBED_BACKEND).strip().lower()
+    if backend in {"onnx", "onnxruntime", "onnx-int8"}:
+        use_int8 = EMBED_ONNX_INT8 if int8 is None else int8
+        return OnnxEncoder(model_name, int8=use_int8 or backend == "onnx-int8")
+    if backend in {"sentence-transformers", "st", "torch"}:
+        return SentenceTransformerEncoder(model_name)
+    raise ValueError(f"EMBED_BACKEND inconnu: {backend!r} (attendu: {', '.join(BACKENDS)})")
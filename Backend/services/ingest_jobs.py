@@ -0,0 +1,336 @@
+# services/ingest_jobs.py
+"""
+File d'ingestion en arrière-plan pour /chatlaya/ingest.
+
+Les fichiers reçus sont déposés sous storage/uploads/<job_id>/ puis traités par un nombre
+borné de workers asyncio (INGEST_WORKERS). L'état des jobs est conservé dans une table
+SQLite locale, qui fait foi: un alimenteur relit périodiquement (INGEST_POLL_S) les jobs en
+attente et les pousse dans la file asyncio (bornée, l'alimenteur attend qu'elle se libère),
+et un worker ne traite un job qu'après l'avoir réclamé atomiquement (queued → running).
+Plusieurs processus partageant INGEST_JOBS_DB se répartissent donc les jobs sans doublon.
+Un job "running" dont le processus a disparu (plus de progression depuis INGEST_JOB_STALE_S)
+est remis en attente; l'ingestion est idempotente, les points déjà indexés sont ignorés.
+"""
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.settings import env_float, env_int
+from services import chunker, rag_service
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+_STORAGE = Path(__file__).resolve().parent.parent / "storage"
+INGEST_UPLOAD_DIR = Path(os.getenv("INGEST_UPLOAD_DIR", str(_STORAGE / "uploads")))
+INGEST_JOBS_DB = os.getenv("INGEST_JOBS_DB", str(_STORAGE / "ingest_jobs.sqlite3"))
+INGEST_WORKERS = max(1, env_int("INGEST_WORKERS", 1))
+INGEST_QUEUE_MAX = max(1, env_int("INGEST_QUEUE_MAX", 100))  # jobs en attente acceptés (au-delà: 429)
+INGEST_POLL_S = max(0.1, env_float("INGEST_POLL_S", 2.0))
+INGEST_JOB_STALE_S = max(1.0, env_float("INGEST_JOB_STALE_S", 300.0))
+
+
+# Rapport d'ingestion (cf. rag_service.ingest_stream) + rapport par fichier
+COUNTERS = ("chunks", "indexed", "unchanged", "duplicates", "deleted")
+# + propriétaire (processus) et dernière progression d'un job "running"
+_COLUMNS = {
+    **{name: "integer not null default 0" for name in COUNTERS},
+    "report": "text not null default '[]'",
+    "owner": "text",
+    "heartbeat": "real",
+}
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobStore:
+    """Table `jobs` SQLite (accès sérialisé par un verrou, connexion partagée entre threads)."""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                create table if not exists jobs (
+                    id text primary key,
+                    status text not null,
+                    files text not null,
+                    created_at real not null,
+                    started_at real,
+                    finished_at real,
+                    errors text not null default '[]'
+                )
+                """
+            )
+            # Compteurs ajoutés au fil des versions: colonnes créées si absentes
+            existing = {row["name"] for row in self._conn.execute("pragma table_info(jobs)")}
+            for column, ddl in _COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"alter table jobs add column {column} {ddl}")
+
+    def create(self, job_id: str, files: List[Dict[str, str]]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "insert into jobs(id, status, files, created_at) values (?, 'queued', ?, ?)",
+                (job_id, json.dumps(files), time.time()),
+            )
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        for name in ("errors", "report"):
+            if name in fields:
+                fields[name] = json.dumps(fields[name])
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"update jobs set {columns} where id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("select * from jobs where id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["files"] = json.loads(job["files"])
+        job["errors"] = json.loads(job["errors"])
+        job["report"] = json.loads(job["report"])
+        return job
+
+    def queued(self, limit: int) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "select id from jobs where status = 'queued' order by created_at limit ?", (limit,)
+            ).fetchall()
+        return [r["id"] for r in rows]
+
+    def count_queued(self) -> int:
+        with self._lock:
+            return self._conn.execute("select count(*) from jobs where status = 'queued'").fetchone()[0]
+
+    def claim(self, job_id: str, owner: str) -> bool:
+        """queued → running pour `owner`; False si un autre worker (ou processus) l'a déjà pris."""
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "update jobs set status = 'running', owner = ?, started_at = ?, heartbeat = ? "
+                "where id = ? and status = 'queued'",
+                (owner, now, now, job_id),
+            )
+        return cursor.rowcount == 1
+
+    def release(self, owner: str) -> int:
+        """Remet en attente les jobs "running" de `owner` (arrêt du processus)."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "update jobs set status = 'queued', owner = null where status = 'running' and owner = ?", (owner,)
+            )
+        return cursor.rowcount
+
+    def requeue_stale(self, older_than: float) -> int:
+        """Remet en attente les jobs "running" sans progression depuis `older_than` (processus disparu)."""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "update jobs set status = 'queued', owner = null "
+                "where status = 'running' and coalesce(heartbeat, started_at, created_at) < ?",
+                (older_than,),
+            )
+        return cursor.rowcount
+
+
+_STORE: Optional[JobStore] = None
+_QUEUE: Optional["asyncio.Queue[str]"] = None
+_WORKERS: List["asyncio.Task[None]"] = []
+_QUEUED: Set[str] = set()  # ids présents dans la file de ce processus (pas de doublon à la relecture)
+_OWNER = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _store() -> JobStore:
+    global _STORE
+    if _STORE is None:
+        _STORE = JobStore(INGEST_JOBS_DB)
+    return _STORE
+
+
+def new_job_dir() -> Tuple[str, Path]:
+    job_id = uuid.uuid4().hex
+    path = INGEST_UPLOAD_DIR / job_id
+    path.mkdir(parents=True, exist_ok=True)
+    return job_id, path
+
+
+async def start() -> None:
+    """Crée la file, lance l'alimenteur (jobs en attente, y compris ceux d'avant le redémarrage) et les workers."""
+    global _QUEUE
+    if _QUEUE is not None:
+        return
+    _QUEUE = asyncio.Queue(maxsize=INGEST_QUEUE_MAX)
+    _WORKERS.append(asyncio.create_task(_feeder(), name="ingest-feeder"))
+    _WORKERS.extend(asyncio.create_task(_worker(), name=f"ingest-worker-{i}") for i in range(INGEST_WORKERS))
+
+
+async def stop() -> None:
+    """Arrête alimenteur et workers; les jobs interrompus repassent en attente."""
+    global _QUEUE
+    for task in _WORKERS:
+        task.cancel()
+    await asyncio.gather(*_WORKERS, return_exceptions=True)
+    _WORKERS.clear()
+    _QUEUED.clear()
+    _QUEUE = None
+    await asyncio.to_thread(_store().release, _OWNER)
+
+
+def _enqueue(job_id: str) -> bool:
+    assert _QUEUE is not None
+    if job_id in _QUEUED or _QUEUE.full():
+        return False
+    _QUEUED.add(job_id)
+    _QUEUE.put_nowait(job_id)
+    return True
+
+
+async def submit(job_id: str, files: List[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    Enregistre et met en file un job. `files` = [{"filename", "path", "domain"?, "type"?}]
+    (étiquettes optionnelles des morceaux, filtrables à la recherche).
+    Lève QueueFull si la file est pleine (le dossier du job est alors supprimé).
+    """
+    if _QUEUE is None:
+        raise RuntimeError("File d'ingestion non démarrée")
+    store = _store()
+    if await asyncio.to_thread(store.count_queued) >= INGEST_QUEUE_MAX:
+        await asyncio.to_thread(shutil.rmtree, INGEST_UPLOAD_DIR / job_id, ignore_errors=True)
+        raise QueueFull("File d'ingestion pleine, réessayez plus tard")
+    await asyncio.to_thread(store.create, job_id, files)
+    _enqueue(job_id)  # file locale pleine: l'alimenteur le reprendra depuis la table
+    return await asyncio.to_thread(get, job_id) or {}
+
+
+def get(job_id: str) -> Optional[Dict[str, Any]]:
+    """État du job: compteurs cumulés, rapport de déduplication par fichier, débit (morceaux/s)."""
+    job = _store().get(job_id)
+    if job is None:
+        return None
+    started = job["started_at"]
+    elapsed = ((job["finished_at"] or time.time()) - started) if started else 0.0
+    job["elapsed_s"] = round(elapsed, 2)
+    job["chunks_per_s"] = round(job["chunks"] / elapsed, 2) if elapsed > 0 else 0.0
+    job["files"] = [f["filename"] for f in job["files"]]
+    job["queue_size"] = _QUEUE.qsize() if _QUEUE is not None else None
+    return job
+
+
+async def _feeder() -> None:
+    """Pousse dans la file les jobs en attente de la table (attend une place si la file est pleine)."""
+    assert _QUEUE is not None
+    queue = _QUEUE
+    store = _store()
+    while True:
+        await asyncio.to_thread(store.requeue_stale, time.time() - INGEST_JOB_STALE_S)
+        for job_id in await asyncio.to_thread(store.queued, INGEST_QUEUE_MAX):
+            if job_id not in _QUEUED:
+                _QUEUED.add(job_id)
+                await queue.put(job_id)
+        await asyncio.sleep(INGEST_POLL_S)
+
+
+async def _worker() -> None:
+    assert _QUEUE is not None
+    queue = _QUEUE
+    while True:
+        job_id = await queue.get()
+        _QUEUED.discard(job_id)
+        try:
+            if await asyncio.to_thread(_store().claim, job_id, _OWNER):
+                await _run(job_id)
+        except Exception as exc:  # pragma: no cover - garde-fou
+            await asyncio.to_thread(
+                _store().update, job_id, status="failed", finished_at=time.time(), errors=[{"error": str(exc)}]
+            )
+        finally:
+            queue.task_done()
+
+
+class _ProgressWriter:
+    """
+    Progression d'un job: `on_progress` (appelé dans la boucle après chaque lot) ne fait que noter
+    les derniers compteurs; une seule tâche les écrit dans SQLite via un thread, la plus récente
+    valeur remplaçant celles qui n'ont pas encore été écrites.
+    """
+
+    def __init__(self, store: JobStore, job_id: str):
+        self._store = store
+        self._job_id = job_id
+        self._pending: Dict[str, Any] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def record(self, **fields: Any) -> None:
+        self._pending.update(fields, heartbeat=time.time())
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self) -> None:
+        while self._pending:
+            fields, self._pending = self._pending, {}
+            await asyncio.to_thread(self._store.update, self._job_id, **fields)
+
+    async def write(self, **fields: Any) -> None:
+        """Écrit `fields` après les progressions en attente (ordre préservé)."""
+        if self._task is not None:
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._pending.clear()
+        await asyncio.to_thread(self._store.update, self._job_id, **fields)
+
+
+async def _run(job_id: str) -> None:
+    store = _store()
+    job = await asyncio.to_thread(store.get, job_id)
+    if job is None:
+        return
+    writer = _ProgressWriter(store, job_id)
+    await writer.write(errors=[], report=[], **{k: 0 for k in COUNTERS})
+
+    done = {k: 0 for k in COUNTERS}
+    report: List[Dict[str, Any]] = []
+    errors: List[Dict[str, str]] = []
+
+    for entry in job["files"]:
+        filename, path = entry["filename"], entry["path"]
+
+        def progress(stats: Dict[str, int]) -> None:
+            writer.record(**{k: done[k] + stats[k] for k in COUNTERS})
+
+        try:
+            encoding = await asyncio.to_thread(chunker.detect_encoding, path)
+            if encoding is None:
+                errors.append({"filename": filename, "error": "Encodage de fichier non supporté"})
+                continue
+            stats = await rag_service.ingest_stream(
+                chunker.iter_chunks(chunker.iter_text(path, encoding)),
+                source=filename,
+                on_progress=progress,
+                domain=entry.get("domain"),
+                doc_type=entry.get("type"),
+            )
+            for key in COUNTERS:
+                done[key] += stats[key]
+            report.append({"filename": filename, **stats})
+        except Exception as exc:  # pragma: no cover - dépendances externes
+            errors.append({"filename": filename, "error": str(exc)})
+        await writer.write(heartbeat=time.time(), errors=errors, report=report, **done)
+
+    failed = bool(errors) and len(errors) == len(job["files"])
+    await writer.write(
+        status="failed" if failed else "done", finished_at=time.time(), errors=errors, report=report, **done
+    )
+    await asyncio.to_thread(shutil.rmtree, INGEST_UPLOAD_DIR / job_id, ignore_errors=True)
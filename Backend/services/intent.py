@@ -1,5 +1,8 @@
 # services/intent.py
 from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from core.settings import env_float, env_int
 
 @dataclass
 class IntentResult:
@@ -23,3 +26,31 @@ def detect_intent(prompt: str) -> IntentResult:
     # Longueur → complexité
     complexity = 5 if len(p) > 1200 else (4 if len(p) > 600 else 3)
     return IntentResult("gen_long", complexity, None)
+
+
+# Politique de récupération par intention (comme PARAMS_BY_INTENT de router_ai):
+#   top_k: passages documentaires (0: ni embedding ni recherche, ex. traduire / résumer un texte fourni);
+#   min_score: similarité cosinus en dessous de laquelle un passage est écarté (hits BM25 seuls gardés).
+RETRIEVAL_BY_INTENT: Dict[str, Dict[str, Any]] = {
+    "translate": {"top_k": env_int("TOPK_TRANSLATE", 0), "min_score": env_float("MIN_SCORE_TRANSLATE", 0.0)},
+    "summarize": {"top_k": env_int("TOPK_SUMMARIZE", 0), "min_score": env_float("MIN_SCORE_SUMMARIZE", 0.0)},
+    "qa":        {"top_k": env_int("TOPK_QA", 6),        "min_score": env_float("MIN_SCORE_QA", 0.25)},
+    "gen_long":  {"top_k": env_int("TOPK_GEN_LONG", 4),  "min_score": env_float("MIN_SCORE_GEN_LONG", 0.2)},
+    "default":   {"top_k": env_int("TOPK_DEFAULT", 4),   "min_score": env_float("MIN_SCORE_DEFAULT", 0.0)},
+}
+
+def retrieval_policy(result: IntentResult, top_k: Optional[int] = None, min_score: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Politique appliquée à une requête: celle de l'intention, top_k / min_score explicites de la
+    requête prioritaires. Retourne {"intent", "top_k", "min_score", "retrieve", "source"}.
+    """
+    name = result.intent if result.intent in RETRIEVAL_BY_INTENT else "default"
+    base = RETRIEVAL_BY_INTENT[name]
+    resolved_top_k = max(0, int(top_k if top_k is not None else base["top_k"]))
+    return {
+        "intent": name,
+        "top_k": resolved_top_k,
+        "min_score": float(min_score if min_score is not None else base["min_score"]),
+        "retrieve": resolved_top_k > 0,
+        "source": "request" if top_k is not None or min_score is not None else "intent",
+    }
@@ -0,0 +1,171 @@
+# services/lexical_index.py
+"""
+Index lexical BM25 en mémoire sur le texte des morceaux indexés.
+
+Complète la recherche vectorielle (MiniLM) sur ce qu'elle rate: identifiants exacts
+(« directive n°02/2009/CM/UEMOA », « article 221 », « 18 % »). Les termes sont repliés
+(minuscules, sans accents); les identifiants composés (02/2009/cm/uemoa, 221-3, 4.5)
+sont indexés entiers en plus de leurs parties.
+"""
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from core.settings import env_float
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+BM25_K1 = env_float("BM25_K1", 1.2)
+BM25_B = env_float("BM25_B", 0.75)
+
+_WORD = re.compile(r"\w+")
+_COMPOUND = re.compile(r"\w+(?:[./\-]\w+)+")
+_STOPWORDS = frozenset(
+    "a au aux avec ce ces dans de des du elle en et il ils je la le les leur lui ma mais me meme mes moi mon "
+    "ne nos notre nous on ou par pas pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos votre "
+    "vous c d j l m n s t y est sont ete etre avoir the of and to in is for".split()
+)
+
+
+def _fold(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def tokenize(text: str) -> List[str]:
+    folded = _fold(text)
+    terms = [w for w in _WORD.findall(folded) if w not in _STOPWORDS]
+    terms.extend(_COMPOUND.findall(folded))
+    return terms
+
+
+class LexicalIndex:
+    """
+    Listes inversées terme → {doc: tf}; ajout/suppression incrémentaux par identifiant de point.
+    Chaque document peut porter des métadonnées (source, domaine, type) filtrables à la recherche.
+    """
+
+    def __init__(self, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._terms: Dict[str, Tuple[str, ...]] = {}  # termes distincts par doc (suppression ciblée)
+        self._meta: Dict[str, Dict[str, str]] = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, doc_id: str, text: str, meta: Optional[Mapping[str, Optional[str]]] = None) -> None:
+        counts = Counter(tokenize(text))
+        with self._lock:
+            if doc_id in self._lengths:
+                self._remove(doc_id)
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+            length = sum(counts.values())
+            self._terms[doc_id] = tuple(counts)
+            if meta:
+                self._meta[doc_id] = {k: v for k, v in meta.items() if v is not None}
+            self._lengths[doc_id] = length
+            self._total_length += length
+
+    def add_many(self, docs: Iterable[Tuple[str, str, Optional[Mapping[str, Optional[str]]]]]) -> None:
+        for doc_id, text, meta in docs:
+            self.add(doc_id, text, meta)
+
+    def update_meta(self, doc_id: str, meta: Mapping[str, Optional[str]]) -> None:
+        with self._lock:
+            if doc_id in self._lengths:
+                current = self._meta.setdefault(doc_id, {})
+                current.update({k: v for k, v in meta.items() if v is not None})
+
+    def remove(self, doc_ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in doc_ids:
+                if doc_id in self._lengths:
+                    self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        for term in self._terms.pop(doc_id):
+            docs = self._postings[term]
+            del docs[doc_id]
+            if not docs:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+        self._meta.pop(doc_id, None)
+
+    def swap(self, other: "LexicalIndex") -> None:
+        """Remplace le contenu par celui de `other` (reconstruction complète sans fenêtre vide)."""
+        with self._lock:
+            self._postings, self._lengths, self._terms = other._postings, other._lengths, other._terms
+            self._meta = other._meta
+            self._total_length = other._total_length
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._lengths.clear()
+            self._terms.clear()
+            self._meta.clear()
+            self._total_length = 0
+
+    def _matches(self, doc_id: str, where: Mapping[str, Iterable[str]]) -> bool:
+        meta = self._meta.get(doc_id, {})
+        return all(meta.get(field) in values for field, values in where.items())
+
+    def search(
+        self,
+        query: str,
+        limit: int = 8,
+        allowed: Optional[Iterable[str]] = None,
+        where: Optional[Mapping[str, Iterable[str]]] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Top `limit` (doc_id, score BM25); `allowed` restreint les documents candidats,
+        `where` ({champ: valeurs admises}) filtre sur les métadonnées.
+        """
+        terms = Counter(tokenize(query))
+        allowed_set = set(allowed) if allowed is not None else None
+        where_sets = {field: set(values) for field, values in where.items()} if where else None
+        with self._lock:
+            n_docs = len(self._lengths)
+            if not n_docs or not terms:
+                return []
+            avg_len = self._total_length / n_docs
+            scores: Dict[str, float] = {}
+            for term, qtf in terms.items():
+                docs = self._postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    if allowed_set is not None and doc_id not in allowed_set:
+                        continue
+                    if where_sets is not None and not self._matches(doc_id, where_sets):
+                        continue
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_len)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + qtf * idf * tf * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def rrf_fuse(rankings: Dict[str, List[str]], k: int = 60, weights: Optional[Dict[str, float]] = None) -> List[Tuple[str, float, Dict[str, int]]]:
+    """
+    Reciprocal Rank Fusion: score(d) = Σ w_r / (k + rang_r(d)), rangs à partir de 1.
+    Retourne [(doc_id, score, {retriever: rang})] trié par score décroissant.
+    """
+    scores: Dict[str, float] = {}
+    ranks: Dict[str, Dict[str, int]] = {}
+    for name, ids in rankings.items():
+        weight = (weights or {}).get(name, 1.0)
+        for rank, doc_id in enumerate(ids, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank)
+            ranks.setdefault(doc_id, {})[name] = rank
+    ordered = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return [(doc_id, score, ranks[doc_id]) for doc_id, score in ordered]
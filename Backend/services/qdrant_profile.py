@@ -0,0 +1,191 @@
+# services/qdrant_profile.py
+"""
+Profil déclaratif de la collection Qdrant: paramètres HNSW, quantification scalaire int8
+(avec rescoring sur les vecteurs float32), payload sur disque, transport gRPC.
+
+Le profil est appliqué à la création de la collection (rag_service, scripts/init_qdrant) et,
+si QDRANT_MIGRATE=1, aux collections existantes dont la configuration diffère (update_collection:
+Qdrant reconstruit l'index / les vecteurs quantifiés en arrière-plan, sans interruption).
+Un champ à None n'est ni imposé ni migré (valeur par défaut du serveur).
+
+Profils (QDRANT_PROFILE), chaque champ pouvant être surchargé par variable d'environnement:
+  - "default":  réglages du serveur (comportement historique);
+  - "balanced": int8 en RAM + rescoring, payload sur disque;
+  - "compact":  graphe plus léger (m=8), vecteurs float32 sur disque, seul l'int8 reste en RAM;
+  - "accurate": graphe dense (m=32, ef_construct=256), sans quantification.
+"""
+import os
+from dataclasses import asdict, dataclass, replace
+from typing import Any, Dict, Optional
+
+from qdrant_client.models import (
+    CollectionParamsDiff,
+    Disabled,
+    Distance,
+    HnswConfigDiff,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+    VectorParamsDiff,
+)
+
+from core.settings import env_bool, env_float, env_int
+
+
+@dataclass(frozen=True)
+class CollectionProfile:
+    name: str
+    hnsw_m: Optional[int] = None
+    hnsw_ef_construct: Optional[int] = None
+    quantization: Optional[str] = None  # "int8" | "none" | None (non géré)
+    quantile: float = 0.99
+    quantized_always_ram: bool = True
+    vectors_on_disk: Optional[bool] = None  # float32 sur disque (mmap), utiles au rescoring seulement
+    on_disk_payload: Optional[bool] = None
+    search_ef: Optional[int] = None  # hnsw_ef par défaut des recherches (None: ef_construct du serveur)
+    rescore: bool = True
+    oversampling: float = 2.0  # candidats int8 relus en float32 = limit × oversampling
+
+    # -- création --
+    def vectors_config(self, size: int) -> VectorParams:
+        return VectorParams(size=size, distance=Distance.COSINE, on_disk=self.vectors_on_disk)
+
+    def hnsw_config(self) -> Optional[HnswConfigDiff]:
+        if self.hnsw_m is None and self.hnsw_ef_construct is None:
+            return None
+        return HnswConfigDiff(m=self.hnsw_m, ef_construct=self.hnsw_ef_construct)
+
+    def quantization_config(self) -> Optional[ScalarQuantization]:
+        if self.quantization != "int8":
+            return None
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, quantile=self.quantile, always_ram=self.quantized_always_ram
+            )
+        )
+
+    def create_kwargs(self, size: int) -> Dict[str, Any]:
+        """Arguments de create_collection (hors nom)."""
+        return {
+            "vectors_config": self.vectors_config(size),
+            "hnsw_config": self.hnsw_config(),
+            "quantization_config": self.quantization_config(),
+            "on_disk_payload": self.on_disk_payload,
+        }
+
+    # -- migration --
+    def migration(self, info: Any) -> Dict[str, Any]:
+        """
+        Arguments de update_collection pour aligner une collection existante (`get_collection`)
+        sur le profil; {} si elle est déjà conforme.
+        """
+        config = info.config
+        changes: Dict[str, Any] = {}
+
+        hnsw = config.hnsw_config
+        if (self.hnsw_m is not None and hnsw.m != self.hnsw_m) or (
+            self.hnsw_ef_construct is not None and hnsw.ef_construct != self.hnsw_ef_construct
+        ):
+            changes["hnsw_config"] = self.hnsw_config()
+
+        current = config.quantization_config
+        if self.quantization == "int8":
+            scalar = getattr(current, "scalar", None)
+            if scalar is None or scalar.quantile != self.quantile or bool(scalar.always_ram) != self.quantized_always_ram:
+                changes["quantization_config"] = self.quantization_config()
+        elif self.quantization == "none" and current is not None:
+            changes["quantization_config"] = Disabled.DISABLED
+
+        if self.on_disk_payload is not None and bool(config.params.on_disk_payload) != self.on_disk_payload:
+            changes["collection_params"] = CollectionParamsDiff(on_disk_payload=self.on_disk_payload)
+
+        vectors = config.params.vectors
+        if isinstance(vectors, dict):
+            vectors = vectors.get("") or next(iter(vectors.values()))
+        if self.vectors_on_disk is not None and bool(vectors.on_disk) != self.vectors_on_disk:
+            changes["vectors_config"] = {"": VectorParamsDiff(on_disk=self.vectors_on_disk)}
+        return changes
+
+    # -- recherche --
+    def search_params(self, hnsw_ef: Optional[int] = None, exact: bool = False) -> Optional[SearchParams]:
+        """Paramètres par requête: `hnsw_ef` (précision/latence) et `exact` (parcours complet, référence)."""
+        ef = hnsw_ef or self.search_ef
+        quantization = None
+        if self.quantization == "int8":
+            quantization = QuantizationSearchParams(rescore=self.rescore, oversampling=self.oversampling)
+        if ef is None and not exact and quantization is None:
+            return None
+        return SearchParams(hnsw_ef=ef, exact=exact, quantization=quantization)
+
+    def describe(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+PROFILES: Dict[str, CollectionProfile] = {
+    "default": CollectionProfile("default"),
+    "balanced": CollectionProfile(
+        "balanced", hnsw_m=16, hnsw_ef_construct=128, quantization="int8", on_disk_payload=True, search_ef=64
+    ),
+    "compact": CollectionProfile(
+        "compact", hnsw_m=8, hnsw_ef_construct=64, quantization="int8", vectors_on_disk=True,
+        on_disk_payload=True, search_ef=64, oversampling=3.0,
+    ),
+    "accurate": CollectionProfile(
+        "accurate", hnsw_m=32, hnsw_ef_construct=256, quantization="none", on_disk_payload=False, search_ef=128
+    ),
+}
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+QDRANT_PROFILE = os.getenv("QDRANT_PROFILE", "default").strip().lower()
+QDRANT_MIGRATE = env_bool("QDRANT_MIGRATE", True)  # aligne une collection existante sur le profil
+QDRANT_PREFER_GRPC = env_bool("QDRANT_PREFER_GRPC", False)  # vecteurs en protobuf au lieu de JSON
+QDRANT_GRPC_PORT = env_int("QDRANT_GRPC_PORT", 6334)
+
+
+def _env_optional_int(name: str) -> Optional[int]:
+    raw = os.getenv(name)
+    return int(raw) if raw not in (None, "") else None
+
+
+def _env_optional_bool(name: str) -> Optional[bool]:
+    raw = os.getenv(name)
+    return env_bool(name, False) if raw not in (None, "") else None
+
+
+def profile(name: Optional[str] = None) -> CollectionProfile:
+    """Profil nommé (défaut QDRANT_PROFILE) + surcharges QDRANT_HNSW_M, QDRANT_QUANTIZATION, etc."""
+    key = (name or QDRANT_PROFILE).strip().lower()
+    if key not in PROFILES:
+        raise ValueError(f"QDRANT_PROFILE inconnu: {key!r} (attendu: {', '.join(PROFILES)})")
+    base = PROFILES[key]
+    if name is not None:
+        return base
+    overrides: Dict[str, Any] = {
+        "hnsw_m": _env_optional_int("QDRANT_HNSW_M"),
+        "hnsw_ef_construct": _env_optional_int("QDRANT_HNSW_EF_CONSTRUCT"),
+        "quantization": (os.getenv("QDRANT_QUANTIZATION") or "").strip().lower() or None,
+        "vectors_on_disk": _env_optional_bool("QDRANT_VECTORS_ON_DISK"),
+        "on_disk_payload": _env_optional_bool("QDRANT_ON_DISK_PAYLOAD"),
+        "search_ef": _env_optional_int("QDRANT_HNSW_EF"),
+    }
+    if os.getenv("QDRANT_OVERSAMPLING"):
+        overrides["oversampling"] = env_float("QDRANT_OVERSAMPLING", base.oversampling)
+    if os.getenv("QDRANT_RESCORE"):
+        overrides["rescore"] = env_bool("QDRANT_RESCORE", base.rescore)
+    resolved = replace(base, **{k: v for k, v in overrides.items() if v is not None})
+    if resolved.quantization not in (None, "int8", "none"):
+        raise ValueError(f"QDRANT_QUANTIZATION inconnue: {resolved.quantization!r} (attendu: int8, none)")
+    return resolved
+
+
+def client_kwargs() -> Dict[str, Any]:
+    """Transport des clients Qdrant (gRPC optionnel)."""
+    kwargs: Dict[str, Any] = {"prefer_grpc": QDRANT_PREFER_GRPC}
+    if QDRANT_PREFER_GRPC:
+        kwargs["grpc_port"] = QDRANT_GRPC_PORT
+    return kwargs
@@ -1,16 +1,39 @@
 # services/rag.py
+import asyncio
 import hashlib
 import json
 import os
 import re
-from typing import List, Tuple, Optional
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterable, Awaitable, AsyncIterator, Callable, Dict, Iterable, List, Tuple, Optional, Union
 
-import psycopg  # psycopg v3
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct  # API "models"
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.http.exceptions import UnexpectedResponse
+from qdrant_client.models import (  # API "models"
+    Distance,
+    FieldCondition,
+    Filter,
+    MatchAny,
+    MatchValue,
+    PayloadSchemaType,
+    PointIdsList,
+    PointStruct,
+    SetPayload,
+    SetPayloadOperation,
+)
 # Si tu utilises qdrant_client>=1.7 avec http.models, remplace la ligne ci-dessus par:
 # from qdrant_client.http import models as qm
 
+from core.settings import env_bool, env_float, env_int
+from deps.db import get_async_pool, get_pool
+from services import embed_cache, embedders, qdrant_profile, vector_store
+from services.chunker import Chunk
+from services.embed_batcher import EMBED_MICROBATCH, MicroBatcher
+from services.lexical_index import LexicalIndex, rrf_fuse
+
 # ---------------------------
 # Configuration (ENV)
 # ---------------------------
@@ -20,30 +43,87 @@ QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")  # optionnel
 QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "innova_docs")
 DATABASE_URL = os.getenv("DATABASE_URL")
 EMB_MODEL_NAME = os.getenv("EMB_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBED_WORKERS = env_int("EMBED_WORKERS", 2)  # threads dédiés à l'encodage (hors boucle async)
+INGEST_EMBED_BATCH = max(1, env_int("INGEST_EMBED_BATCH", 64))  # morceaux encodés par appel au modèle
+INGEST_UPSERT_BATCH = max(1, env_int("INGEST_UPSERT_BATCH", 128))  # points par requête upsert Qdrant
+INGEST_EMBED_WORKERS = env_int("INGEST_EMBED_WORKERS", 1)  # pool séparé: l'ingestion ne prive pas les requêtes
+RAG_WARMUP = env_bool("RAG_WARMUP", False)  # préchargement du modèle + collection au démarrage
+RAG_WARMUP_RETRY_S = max(0.1, env_float("RAG_WARMUP_RETRY_S", 2.0))  # délai initial entre deux essais, doublé
+RAG_WARMUP_RETRY_MAX_S = max(RAG_WARMUP_RETRY_S, env_float("RAG_WARMUP_RETRY_MAX_S", 60.0))
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "vector").strip().lower()  # vector | hybrid | lexical
+RAG_RRF_K = max(1, env_int("RAG_RRF_K", 60))  # constante k de la fusion RRF
+RAG_HYBRID_CANDIDATES = max(1, env_int("RAG_HYBRID_CANDIDATES", 40))  # candidats par moteur avant fusion
+LEXICAL_REFRESH_S = env_float("LEXICAL_REFRESH_S", 60.0)  # revalidation de l'index BM25 contre Qdrant
+RETRIEVAL_MODES = ("vector", "hybrid", "lexical")
+FILTER_FIELDS = ("source", "domain", "type")  # champs de payload indexés (keyword) et filtrables
 
 # ---------------------------
 # Singletons légers
 # ---------------------------
 _SENTS_MODEL = None  # cache du modèle d'embedding
-_QDRANT_CLIENT = None  # cache du client Qdrant
+_QDRANT_CLIENT = None  # cache du client Qdrant (ou de l'index local, VECTOR_BACKEND=local)
+_AQDRANT_CLIENT = None  # cache du client Qdrant async
+_EMBED_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_INGEST_EXECUTOR: Optional[ThreadPoolExecutor] = None
+_ENCODER_LOCK = threading.Lock()
+_BATCHER: Optional[MicroBatcher] = None
+_PROFILE: Optional[qdrant_profile.CollectionProfile] = None  # QDRANT_PROFILE + surcharges, résolu une fois
 
 
 def _qdrant() -> QdrantClient:
     global _QDRANT_CLIENT
     if _QDRANT_CLIENT is None:
-        _QDRANT_CLIENT = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY)
+        if vector_store.backend() == "local":
+            _QDRANT_CLIENT = vector_store.local_store()
+        else:
+            _QDRANT_CLIENT = QdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, **qdrant_profile.client_kwargs())
     return _QDRANT_CLIENT
 
 
+def _aqdrant() -> AsyncQdrantClient:
+    global _AQDRANT_CLIENT
+    if _AQDRANT_CLIENT is None:
+        if vector_store.backend() == "local":
+            _AQDRANT_CLIENT = vector_store.AsyncLocalVectorStore(vector_store.local_store())
+        else:
+            _AQDRANT_CLIENT = AsyncQdrantClient(url=QDRANT_URL, api_key=QDRANT_API_KEY, **qdrant_profile.client_kwargs())
+    return _AQDRANT_CLIENT
+
+
+def _embed_executor() -> ThreadPoolExecutor:
+    """Pool dédié à l'encodage: le calcul CPU ne monopolise ni la boucle ni le threadpool HTTP."""
+    global _EMBED_EXECUTOR
+    if _EMBED_EXECUTOR is None:
+        _EMBED_EXECUTOR = ThreadPoolExecutor(max_workers=max(1, EMBED_WORKERS), thread_name_prefix="embed")
+    return _EMBED_EXECUTOR
+
+
+def _ingest_executor() -> ThreadPoolExecutor:
+    """Pool d'encodage réservé à l'ingestion (borné, distinct de celui des requêtes)."""
+    global _INGEST_EXECUTOR
+    if _INGEST_EXECUTOR is None:
+        _INGEST_EXECUTOR = ThreadPoolExecutor(max_workers=max(1, INGEST_EMBED_WORKERS), thread_name_prefix="ingest-embed")
+    return _INGEST_EXECUTOR
+
+
 def _encoder():
-    """Lazy-load du modèle sentence-transformers."""
+    """
+    Lazy-load du modèle d'embedding (un seul chargement même sous concurrence).
+    Backend choisi par EMBED_BACKEND: sentence-transformers (défaut) ou onnx (cf. services/embedders.py).
+    """
     global _SENTS_MODEL
     if _SENTS_MODEL is None:
-        from sentence_transformers import SentenceTransformer
-        _SENTS_MODEL = SentenceTransformer(EMB_MODEL_NAME)
+        with _ENCODER_LOCK:
+            if _SENTS_MODEL is None:
+                _SENTS_MODEL = embedders.load(EMB_MODEL_NAME)
     return _SENTS_MODEL
 
 
+def embed_token_counter() -> Callable[[str], int]:
+    """Comptage de tokens avec le tokenizer du modèle d'embedding (charge le modèle si besoin)."""
+    return _encoder().count_tokens
+
+
 # ---------------------------
 # Utils normalisation / hash
 # ---------------------------
@@ -51,7 +131,7 @@ def normalize_q(q: str) -> str:
     s = (q or "").strip().lower()
     s = re.sub(r"[^\w\s]", " ", s)
     s = re.sub(r"\s+", " ", s)
-    return s
+    return s.strip()
 
 
 def q_hash(q: str) -> str:
@@ -62,105 +142,967 @@ def q_hash(q: str) -> str:
 # Postgres cache (facultatif)
 # ---------------------------
 def pg_conn():
+    """Connexion empruntée au pool partagé (rendue au pool en sortie du `with`)."""
     if not DATABASE_URL:
         raise RuntimeError("DATABASE_URL manquant")
-    return psycopg.connect(DATABASE_URL)
+    return get_pool().connection()
 
 
-def cache_get(question: str) -> Optional[Tuple[str, list]]:
-    """Retourne (answer, sources) si présent dans answers_cache, sinon None."""
+_CACHE_SELECT = "select answer, coalesce(sources,'[]'::jsonb) from answers_cache where q_hash=%s"
+_CACHE_INSERT = """
+    insert into answers_cache(q_hash, question_norm, answer, sources, generation)
+    values(%s,%s,%s,%s,%s)
+    on conflict (q_hash) do nothing
+"""
+
+
+def cache_get(question: str, key: Optional[str] = None) -> Optional[Tuple[str, list]]:
+    """
+    Retourne (answer, sources) si présent dans answers_cache, sinon None.
+    `key` remplace q_hash(question) quand la clé dépend aussi des paramètres de génération.
+    """
     with pg_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            "select answer, coalesce(sources,'[]'::jsonb) from answers_cache where q_hash=%s",
-            (q_hash(question),),
-        )
+        cur.execute(_CACHE_SELECT, (key or q_hash(question),))
         row = cur.fetchone()
         if row:
             return row[0], row[1]
     return None
 
 
-def cache_put(question: str, answer: str, sources: list):
-    """Insère en cache, ignore si collision (q_hash PK/unique)."""
+def cache_put(question: str, answer: str, sources: list, key: Optional[str] = None, generation: int = 0):
+    """Insère en cache (génération du corpus de la réponse), ignore si collision (q_hash PK/unique)."""
     with pg_conn() as conn, conn.cursor() as cur:
         cur.execute(
-            """
-            insert into answers_cache(q_hash, question_norm, answer, sources)
-            values(%s,%s,%s,%s)
-            on conflict (q_hash) do nothing
-            """,
-            (q_hash(question), normalize_q(question), answer, json.dumps(sources)),
+            _CACHE_INSERT,
+            (key or q_hash(question), normalize_q(question), answer, json.dumps(sources), generation),
+        )
+
+
+async def cache_get_async(question: str, key: Optional[str] = None) -> Optional[Tuple[str, list]]:
+    """Variante async de cache_get (pool AsyncConnectionPool)."""
+    if not DATABASE_URL:
+        raise RuntimeError("DATABASE_URL manquant")
+    pool = await get_async_pool()
+    async with pool.connection() as conn, conn.cursor() as cur:
+        await cur.execute(_CACHE_SELECT, (key or q_hash(question),))
+        row = await cur.fetchone()
+        if row:
+            return row[0], row[1]
+    return None
+
+
+async def cache_put_async(question: str, answer: str, sources: list, key: Optional[str] = None, generation: int = 0):
+    """Variante async de cache_put."""
+    if not DATABASE_URL:
+        raise RuntimeError("DATABASE_URL manquant")
+    pool = await get_async_pool()
+    async with pool.connection() as conn, conn.cursor() as cur:
+        await cur.execute(
+            _CACHE_INSERT,
+            (key or q_hash(question), normalize_q(question), answer, json.dumps(sources), generation),
         )
 
 
+def cache_clear() -> int:
+    """Vide answers_cache. Retourne le nombre de lignes supprimées."""
+    with pg_conn() as conn, conn.cursor() as cur:
+        cur.execute("delete from answers_cache")
+        return cur.rowcount or 0
+
+
+def cache_purge(before: int, batch: int) -> int:
+    """
+    Supprime au plus `batch` lignes de answers_cache d'une génération antérieure à `before`
+    (réponses devenues inaccessibles). Retourne le nombre de lignes supprimées.
+    """
+    with pg_conn() as conn, conn.cursor() as cur:
+        cur.execute(_CACHE_PURGE, (before, batch))
+        return cur.rowcount or 0
+
+
+# Génération du corpus: compteur partagé par toutes les instances, incrémenté à chaque
+# changement du corpus et intégré aux clés du cache de réponses (cf. answer_cache).
+# Schéma créé / migré une fois au démarrage (init_cache_schema), jamais sur le chemin des requêtes.
+_CACHE_SCHEMA = (
+    "create table if not exists corpus_generation (id smallint primary key, generation bigint not null)",
+    "alter table answers_cache add column if not exists generation bigint not null default 0",
+    "create index if not exists answers_cache_generation_idx on answers_cache (generation)",
+)
+_CACHE_PURGE = """
+    delete from answers_cache
+    where q_hash in (select q_hash from answers_cache where generation < %s limit %s)
+"""
+_GENERATION_SELECT = "select generation from corpus_generation where id = 1"
+_GENERATION_BUMP = """
+    insert into corpus_generation(id, generation) values (1, 1)
+    on conflict (id) do update set generation = corpus_generation.generation + 1
+    returning generation
+"""
+
+
+def init_cache_schema() -> None:
+    """Crée la table corpus_generation et la colonne answers_cache.generation (idempotent, au démarrage)."""
+    with pg_conn() as conn, conn.cursor() as cur:
+        for statement in _CACHE_SCHEMA:
+            cur.execute(statement)
+
+
+def corpus_generation() -> int:
+    """Génération courante du corpus (0 tant qu'aucun changement n'a été enregistré)."""
+    with pg_conn() as conn, conn.cursor() as cur:
+        cur.execute(_GENERATION_SELECT)
+        row = cur.fetchone()
+        return int(row[0]) if row else 0
+
+
+async def corpus_generation_async() -> int:
+    """Variante async de corpus_generation."""
+    if not DATABASE_URL:
+        raise RuntimeError("DATABASE_URL manquant")
+    pool = await get_async_pool()
+    async with pool.connection() as conn, conn.cursor() as cur:
+        await cur.execute(_GENERATION_SELECT)
+        row = await cur.fetchone()
+        return int(row[0]) if row else 0
+
+
+def bump_corpus_generation() -> int:
+    """Incrémente la génération du corpus (atomique) et la retourne."""
+    with pg_conn() as conn, conn.cursor() as cur:
+        cur.execute(_GENERATION_BUMP)
+        return int(cur.fetchone()[0])
+
+
+# ---------------------------
+# Notification de changement du corpus
+# ---------------------------
+_CORPUS_LISTENERS: List[Callable[[], None]] = []
+
+
+def on_corpus_change(callback: Callable[[], None]) -> None:
+    """Enregistre un callback appelé après chaque écriture dans la collection."""
+    if callback not in _CORPUS_LISTENERS:
+        _CORPUS_LISTENERS.append(callback)
+
+
+async def _notify_corpus_changed_async() -> None:
+    """Notification depuis la boucle asyncio: les callbacks (Postgres, etc.) tournent dans un thread."""
+    await asyncio.to_thread(_notify_corpus_changed)
+
+
+def _notify_corpus_changed() -> None:
+    for callback in list(_CORPUS_LISTENERS):
+        try:
+            callback()
+        except Exception:
+            # Un cache qui échoue à s'invalider ne doit pas faire échouer l'ingestion
+            pass
+
+
 # ---------------------------
 # Qdrant helpers
 # ---------------------------
-def _ensure_collection(client: QdrantClient):
-    """Crée la collection si absente."""
-    cols = client.get_collections().collections
-    names = {c.name for c in cols}
-    if QDRANT_COLLECTION not in names:
-        client.recreate_collection(
-            collection_name=QDRANT_COLLECTION,
-            vectors_config=VectorParams(size=EMB_DIM, distance=Distance.COSINE),
+class CollectionSchemaError(RuntimeError):
+    """La collection Qdrant existe mais ne correspond pas au modèle d'embedding (dimension, distance)."""
+
+
+_COLLECTION_SCHEMA: Optional[Dict[str, Any]] = None  # {"size", "distance", "profile", "migrated"} vérifié une fois par processus
+
+
+def _profile() -> qdrant_profile.CollectionProfile:
+    global _PROFILE
+    if _PROFILE is None:
+        _PROFILE = qdrant_profile.profile()
+    return _PROFILE
+
+
+def _check_schema(info: Any) -> Dict[str, Any]:
+    vectors = info.config.params.vectors
+    if isinstance(vectors, dict):  # vecteurs nommés: on utilise le vecteur par défaut
+        vectors = vectors.get("") or next(iter(vectors.values()))
+    size, distance = int(vectors.size), vectors.distance
+    if size != EMB_DIM or distance != Distance.COSINE:
+        raise CollectionSchemaError(
+            f"Collection Qdrant '{QDRANT_COLLECTION}' incompatible: vecteurs {size} dims / {distance}, "
+            f"attendu EMB_DIM={EMB_DIM} / {Distance.COSINE} (modèle {EMB_MODEL_NAME})"
         )
+    return {"size": size, "distance": str(distance)}
+
+
+def _is_not_found(exc: Exception) -> bool:
+    """Erreur « collection introuvable » (REST 404, ou ValueError du mode local)."""
+    if isinstance(exc, UnexpectedResponse):
+        return exc.status_code == 404
+    return isinstance(exc, ValueError) and "not found" in str(exc).lower()
+
+
+def _forget_collection() -> None:
+    global _COLLECTION_SCHEMA
+    _COLLECTION_SCHEMA = None
+
+
+def _missing_payload_indexes(info: Any) -> List[str]:
+    """Champs de FILTER_FIELDS sans index de payload (créés une fois, Qdrant indexe l'existant)."""
+    existing = getattr(info, "payload_schema", None) or {}
+    return [name for name in FILTER_FIELDS if name not in existing]
+
+
+def _ensure_collection(client: QdrantClient):
+    """
+    Crée la collection si absente (profil QDRANT_PROFILE) et vérifie son schéma; une collection
+    existante est alignée sur le profil si QDRANT_MIGRATE. Le résultat est gardé pour le processus
+    (plus d'aller-retour Qdrant par requête). Les index de payload de FILTER_FIELDS sont créés
+    s'ils manquent. Lève CollectionSchemaError si le schéma diffère.
+    """
+    global _COLLECTION_SCHEMA
+    if _COLLECTION_SCHEMA is not None:
+        return
+    try:
+        info = client.get_collection(QDRANT_COLLECTION)
+    except Exception as exc:
+        if not _is_not_found(exc):
+            raise
+        try:
+            client.create_collection(collection_name=QDRANT_COLLECTION, **_profile().create_kwargs(EMB_DIM))
+        except Exception:
+            pass  # créée entre-temps par un autre processus: relue ci-dessous
+        info = client.get_collection(QDRANT_COLLECTION)
+    schema = _check_schema(info)
+    changes = _profile().migration(info) if qdrant_profile.QDRANT_MIGRATE else {}
+    if changes:
+        client.update_collection(collection_name=QDRANT_COLLECTION, **changes)
+    indexed = _missing_payload_indexes(info)
+    for field_name in indexed:
+        client.create_payload_index(QDRANT_COLLECTION, field_name=field_name, field_schema=PayloadSchemaType.KEYWORD)
+    _COLLECTION_SCHEMA = {**schema, "profile": _profile().name, "migrated": sorted(changes), "indexes_created": indexed}
+
+
+async def _ensure_collection_async(client: AsyncQdrantClient):
+    """Variante async de _ensure_collection."""
+    global _COLLECTION_SCHEMA
+    if _COLLECTION_SCHEMA is not None:
+        return
+    try:
+        info = await client.get_collection(QDRANT_COLLECTION)
+    except Exception as exc:
+        if not _is_not_found(exc):
+            raise
+        try:
+            await client.create_collection(collection_name=QDRANT_COLLECTION, **_profile().create_kwargs(EMB_DIM))
+        except Exception:
+            pass  # créée entre-temps par un autre processus: relue ci-dessous
+        info = await client.get_collection(QDRANT_COLLECTION)
+    schema = _check_schema(info)
+    changes = _profile().migration(info) if qdrant_profile.QDRANT_MIGRATE else {}
+    if changes:
+        await client.update_collection(collection_name=QDRANT_COLLECTION, **changes)
+    indexed = _missing_payload_indexes(info)
+    for field_name in indexed:
+        await client.create_payload_index(QDRANT_COLLECTION, field_name=field_name, field_schema=PayloadSchemaType.KEYWORD)
+    _COLLECTION_SCHEMA = {**schema, "profile": _profile().name, "migrated": sorted(changes), "indexes_created": indexed}
+
+
+def _call(client: QdrantClient, op: Callable[[], Any]) -> Any:
+    """
+    Exécute `op` sur la collection vérifiée. Si Qdrant répond « collection introuvable »
+    (supprimée depuis), le cache est oublié, la collection revalidée/recréée et `op` rejoué une fois.
+    """
+    _ensure_collection(client)
+    try:
+        return op()
+    except Exception as exc:
+        if not _is_not_found(exc):
+            raise
+        _forget_collection()
+        _ensure_collection(client)
+        return op()
+
+
+async def _acall(client: AsyncQdrantClient, op: Callable[[], Awaitable[Any]]) -> Any:
+    """Variante async de _call (`op` renvoie une coroutine neuve à chaque appel)."""
+    await _ensure_collection_async(client)
+    try:
+        return await op()
+    except Exception as exc:
+        if not _is_not_found(exc):
+            raise
+        _forget_collection()
+        await _ensure_collection_async(client)
+        return await op()
+
+
+async def verify_collection_async() -> Dict[str, Any]:
+    """
+    Vérification au démarrage: crée la collection si besoin et lève CollectionSchemaError
+    si sa dimension/distance ne correspond pas à EMB_DIM.
+    """
+    await _ensure_collection_async(_aqdrant())
+    return dict(_COLLECTION_SCHEMA or {})
 
 
 def embed(texts: List[str]) -> List[List[float]]:
     """
     Renvoie les embeddings normalisés (cosine ready).
-    Utilise un modèle CPU-friendly par défaut (all-MiniLM-L6-v2, dim=384).
+    Utilise un modèle CPU-friendly par défaut (all-MiniLM-L6-v2, dim=384), sur le backend EMBED_BACKEND.
     """
     model = _encoder()
     # normalize_embeddings=True renvoie déjà des vecteurs L2-normalisés
     return model.encode(texts, normalize_embeddings=True).tolist()
 
 
+async def embed_async(texts: List[str], executor: Optional[ThreadPoolExecutor] = None) -> List[List[float]]:
+    """embed() exécuté sur le pool d'encodage dédié (ou `executor`)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or _embed_executor(), embed, texts)
+
+
+def _batcher() -> MicroBatcher:
+    global _BATCHER
+    if _BATCHER is None:
+        _BATCHER = MicroBatcher(embed, _embed_executor)
+    return _BATCHER
+
+
+async def close_batcher_async() -> None:
+    """Arrêt de l'application: termine (ou annule) les encodages batchés en cours."""
+    if _BATCHER is not None:
+        await _BATCHER.aclose()
+
+
+def _query_cache_key(text: str) -> str:
+    return embed_cache.cache_key(embedders.model_tag(EMB_MODEL_NAME), normalize_q(text))
+
+
+def embed_query(text: str) -> List[float]:
+    """Embedding d'une requête utilisateur, servi par le cache LRU quand la question normalisée y est."""
+    cache = embed_cache.get_cache()
+    key = _query_cache_key(text) if cache is not None else ""
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    vector = embed([text])[0]
+    if cache is not None:
+        cache.put(key, vector)
+    return vector
+
+
+async def embed_query_async(text: str) -> List[float]:
+    """
+    Variante async d'embed_query. Sur un défaut de cache, les appels concurrents sont
+    regroupés par le micro-batcher (EMBED_BATCH_MAX / EMBED_BATCH_WAIT_MS) en un seul encode.
+    """
+    cache = embed_cache.get_cache()
+    key = _query_cache_key(text) if cache is not None else ""
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    if EMBED_MICROBATCH:
+        vector = await _batcher().encode(text)
+    else:
+        vector = (await embed_async([text]))[0]
+    if cache is not None:
+        cache.put(key, vector)
+    return vector
+
+
+def embed_stats() -> Dict[str, Any]:
+    """Métriques d'encodage des requêtes (cache LRU, taille des lots, attente en file)."""
+    return {
+        "backend": getattr(_SENTS_MODEL, "name", None),
+        "model": embedders.model_tag(EMB_MODEL_NAME),
+        "query_cache": embed_cache.stats(),
+        "microbatch": _batcher().stats() if EMBED_MICROBATCH else None,
+    }
+
+
+# ---------------------------
+# Préchargement (démarrage)
+# ---------------------------
+_WARMUP: Dict[str, Any] = {
+    "state": "idle", "error": None, "attempts": 0, "model_ms": None, "encode_ms": None, "collection_ms": None,
+}
+
+
+def _load_and_encode() -> None:
+    t0 = time.perf_counter()
+    _encoder()
+    _WARMUP["model_ms"] = int((time.perf_counter() - t0) * 1000)
+    t0 = time.perf_counter()
+    embed(["Chat-LAYA warm-up"])  # premier encode: allocation des buffers, JIT des noyaux
+    _WARMUP["encode_ms"] = int((time.perf_counter() - t0) * 1000)
+
+
+async def warmup_async() -> Dict[str, Any]:
+    """
+    Charge le modèle d'embedding, fait un encode à blanc (pool d'encodage) puis s'assure
+    une fois de l'existence de la collection Qdrant. Ne lève pas: un échec (Qdrant injoignable
+    au boot...) est consigné dans readiness() et l'étape est réessayée avec un délai croissant
+    (RAG_WARMUP_RETRY_S, doublé jusqu'à RAG_WARMUP_RETRY_MAX_S). Seul un schéma incompatible
+    arrête les essais.
+    """
+    delay = RAG_WARMUP_RETRY_S
+    while True:
+        _WARMUP.update(state="running", attempts=_WARMUP["attempts"] + 1)
+        try:
+            if _SENTS_MODEL is None:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(_embed_executor(), _load_and_encode)
+            t0 = time.perf_counter()
+            await _ensure_collection_async(_aqdrant())
+            _WARMUP["collection_ms"] = int((time.perf_counter() - t0) * 1000)
+        except CollectionSchemaError as exc:
+            _WARMUP.update(state="failed", error=str(exc))
+            return readiness()
+        except Exception as exc:  # pragma: no cover - dépendances externes
+            _WARMUP.update(state="retrying", error=str(exc))
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RAG_WARMUP_RETRY_MAX_S)
+            continue
+        _WARMUP.update(state="ready", error=None)
+        return readiness()
+
+
+def readiness() -> Dict[str, Any]:
+    """
+    État de préchargement. Sans RAG_WARMUP le modèle reste chargé à la demande
+    et le service est considéré prêt. Avec RAG_WARMUP, « prêt » ne dépend que du modèle
+    local: une indisponibilité de Qdrant (collection non vérifiée, `state` "retrying")
+    est signalée mais ne retire pas l'instance du trafic.
+    """
+    status = dict(_WARMUP)
+    status["enabled"] = RAG_WARMUP
+    status["model_loaded"] = _SENTS_MODEL is not None
+    status["embed_backend"] = getattr(_SENTS_MODEL, "name", None)
+    status["collection"] = dict(_COLLECTION_SCHEMA) if _COLLECTION_SCHEMA is not None else None
+    status["vector_backend"] = vector_store.VECTOR_BACKEND
+    status["ready"] = (not RAG_WARMUP) or status["model_loaded"]
+    return status
+
+
 # ---------------------------
 # Recherche & Ingestion
 # ---------------------------
-def search(query: str, limit: int = 8):
+def _hit(point: Any) -> Dict[str, Any]:
+    return {
+        "id": str(point.id),
+        "score": float(point.score),
+        "payload": point.payload or {}
+    }
+
+
+def retrieval_mode(mode: Optional[str]) -> str:
+    """Mode de récupération validé (défaut: RAG_RETRIEVAL_MODE)."""
+    resolved = (mode or RAG_RETRIEVAL_MODE).strip().lower()
+    if resolved not in RETRIEVAL_MODES:
+        raise ValueError(f"Mode de recherche inconnu: {mode!r} (attendu: {', '.join(RETRIEVAL_MODES)})")
+    return resolved
+
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Filtres de recherche validés: {champ: [valeurs]} pour les champs de FILTER_FIELDS
+    (une valeur seule ou une liste; plusieurs valeurs = OU, plusieurs champs = ET).
+    """
+    normalized: Dict[str, List[str]] = {}
+    for name, value in (filters or {}).items():
+        if name not in FILTER_FIELDS:
+            raise ValueError(f"Filtre inconnu: {name!r} (attendu: {', '.join(FILTER_FIELDS)})")
+        values = [value] if isinstance(value, str) else list(value or [])
+        values = [str(v).strip() for v in values if str(v).strip()]
+        if values:
+            normalized[name] = sorted(set(values))
+    return normalized
+
+
+def _qdrant_filter(filters: Dict[str, List[str]]) -> Optional[Filter]:
+    if not filters:
+        return None
+    return Filter(must=[
+        FieldCondition(key=name, match=MatchValue(value=values[0]) if len(values) == 1 else MatchAny(any=values))
+        for name, values in filters.items()
+    ])
+
+
+def search(
+    query: str,
+    limit: int = 8,
+    vector: Optional[List[float]] = None,
+    mode: Optional[str] = None,
+    rrf_k: Optional[int] = None,
+    hnsw_ef: Optional[int] = None,
+    exact: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+):
     """
-    Recherche sémantique simple dans Qdrant.
-    Retourne une liste de hits: [{id, score, payload}, ...]
+    Recherche dans Qdrant (ou l'index local, VECTOR_BACKEND=local).
+    `vector` permet de réutiliser un embedding déjà calculé pour `query`.
+    `mode`: "vector" (cosinus seul), "hybrid" (vecteur + BM25 fusionnés par RRF) ou "lexical" (BM25 seul).
+    `hnsw_ef` / `exact`: précision de la recherche vectorielle pour cette requête (défaut: profil
+    QDRANT_PROFILE; exact=True parcourt tous les vecteurs, pour mesurer le rappel de l'index).
+    `filters`: restriction par source / domaine / type (cf. normalize_filters), appliquée par
+    Qdrant via les index de payload et par l'index BM25 sur ses métadonnées.
+    Retourne une liste de hits: [{id, score, payload}, ...] (+ "ranks" par moteur hors mode vecteur)
     """
+    mode = retrieval_mode(mode)
+    where = normalize_filters(filters)
     client = _qdrant()
-    _ensure_collection(client)
+    depth = limit if mode == "vector" else max(limit, RAG_HYBRID_CANDIDATES)
 
-    vec = embed([query])[0]
-    res = client.search(collection_name=QDRANT_COLLECTION, query_vector=vec, limit=limit)
-    hits = [
-        {
-            "id": str(p.id),
-            "score": float(p.score),
-            "payload": p.payload or {}
-        }
-        for p in res
-    ]
-    return hits
+    dense: List[Dict[str, Any]] = []
+    if mode != "lexical":
+        vec = vector if vector is not None else embed_query(query)
+        params = _profile().search_params(hnsw_ef, exact)
+        res = _call(client, lambda: client.search(
+            collection_name=QDRANT_COLLECTION, query_vector=vec, limit=depth, search_params=params,
+            query_filter=_qdrant_filter(where),
+        ))
+        dense = [_hit(p) for p in res]
+    if mode == "vector":
+        return dense
+
+    lexical = _lexical_search(query, depth, where)
+    fused, missing = _fuse(dense, lexical, limit, rrf_k)
+    if missing:
+        _fill_payloads(fused, _call(client, lambda: client.retrieve(QDRANT_COLLECTION, ids=missing, with_payload=True)))
+    return fused
 
 
-def upsert_chunks(chunks: List[str], source: str):
+async def search_async(
+    query: str,
+    limit: int = 8,
+    vector: Optional[List[float]] = None,
+    mode: Optional[str] = None,
+    rrf_k: Optional[int] = None,
+    hnsw_ef: Optional[int] = None,
+    exact: bool = False,
+    filters: Optional[Dict[str, Any]] = None,
+):
     """
-    Upsert d'une liste de morceaux de texte avec leur source dans Qdrant.
-    Retourne le nombre de points écrits.
+    Variante async de search(): encodage micro-batché, requête via AsyncQdrantClient;
+    en mode hybride, la recherche BM25 (thread) tourne pendant la requête vectorielle.
     """
-    if not chunks:
-        return 0
+    mode = retrieval_mode(mode)
+    where = normalize_filters(filters)
+    client = _aqdrant()
+    depth = limit if mode == "vector" else max(limit, RAG_HYBRID_CANDIDATES)
 
-    client = _qdrant()
-    _ensure_collection(client)
+    lexical_task = None
+    if mode != "vector":
+        loop = asyncio.get_running_loop()
+        lexical_task = loop.run_in_executor(None, _lexical_search, query, depth, where)
+
+    dense: List[Dict[str, Any]] = []
+    if mode != "lexical":
+        vec = vector if vector is not None else await embed_query_async(query)
+        params = _profile().search_params(hnsw_ef, exact)
+        res = await _acall(client, lambda: client.search(
+            collection_name=QDRANT_COLLECTION, query_vector=vec, limit=depth, search_params=params,
+            query_filter=_qdrant_filter(where),
+        ))
+        dense = [_hit(p) for p in res]
+    if lexical_task is None:
+        return dense
+
+    fused, missing = _fuse(dense, await lexical_task, limit, rrf_k)
+    if missing:
+        _fill_payloads(fused, await _acall(client, lambda: client.retrieve(QDRANT_COLLECTION, ids=missing, with_payload=True)))
+    return fused
+
+
+def _fuse(
+    dense: List[Dict[str, Any]],
+    lexical: List[Tuple[str, float]],
+    limit: int,
+    rrf_k: Optional[int],
+) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """Fusion RRF des deux classements; retourne (hits, ids dont le payload reste à lire)."""
+    by_id = {h["id"]: h for h in dense}
+    bm25 = dict(lexical)
+    rankings = {"lexical": [doc_id for doc_id, _ in lexical]}
+    if dense:
+        rankings["vector"] = [h["id"] for h in dense]
+    hits: List[Dict[str, Any]] = []
+    for doc_id, score, ranks in rrf_fuse(rankings, k=rrf_k or RAG_RRF_K)[:limit]:
+        hit: Dict[str, Any] = {"id": doc_id, "score": round(score, 6), "payload": {}, "ranks": ranks}
+        if doc_id in by_id:
+            hit["payload"] = by_id[doc_id]["payload"]
+            hit["vector_score"] = by_id[doc_id]["score"]
+        if doc_id in bm25:
+            hit["bm25"] = round(bm25[doc_id], 4)
+        hits.append(hit)
+    return hits, [h["id"] for h in hits if h["id"] not in by_id]
+
+
+def _fill_payloads(hits: List[Dict[str, Any]], points: List[Any]) -> None:
+    payloads = {str(p.id): p.payload or {} for p in points}
+    for hit in hits:
+        if not hit["payload"]:
+            hit["payload"] = payloads.get(hit["id"], {})
+
+
+# ---------------------------
+# Index lexical (BM25)
+# ---------------------------
+_LEXICAL = LexicalIndex()
+_LEXICAL_LOCK = threading.Lock()
+_LEXICAL_STATE: Dict[str, Any] = {"built": False, "checked_at": 0.0, "builds": 0, "build_ms": None}
+
+
+def _lexical_search(query: str, limit: int, where: Optional[Dict[str, List[str]]] = None) -> List[Tuple[str, float]]:
+    _refresh_lexical()
+    return _LEXICAL.search(query, limit, where=where or None)
+
+
+def _lexical_doc(point: Any) -> Tuple[str, str, Dict[str, Any]]:
+    payload = point.payload or {}
+    return str(point.id), str(payload.get("text") or ""), {name: payload.get(name) for name in FILTER_FIELDS}
+
+
+def _refresh_lexical() -> None:
+    """
+    Construit l'index BM25 au premier usage (scroll des textes, sans vecteurs), puis le revalide
+    au plus toutes les LEXICAL_REFRESH_S secondes: reconstruction si le nombre de points Qdrant
+    diffère (ingestion faite par un autre processus). Les ingestions locales le tiennent à jour
+    incrémentalement.
+    """
+    if _LEXICAL_STATE["built"] and time.monotonic() - _LEXICAL_STATE["checked_at"] < LEXICAL_REFRESH_S:
+        return
+    with _LEXICAL_LOCK:
+        if _LEXICAL_STATE["built"] and time.monotonic() - _LEXICAL_STATE["checked_at"] < LEXICAL_REFRESH_S:
+            return
+        client = _qdrant()
+        count = _call(client, lambda: client.count(QDRANT_COLLECTION, exact=True)).count
+        if not _LEXICAL_STATE["built"] or count != len(_LEXICAL):
+            t0 = time.perf_counter()
+            fresh = LexicalIndex()
+            offset = None
+            while True:
+                points, offset = client.scroll(
+                    QDRANT_COLLECTION, limit=_MANIFEST_PAGE, offset=offset, with_payload=["text", *FILTER_FIELDS],
+                    with_vectors=False,
+                )
+                fresh.add_many(_lexical_doc(p) for p in points)
+                if offset is None:
+                    break
+            _LEXICAL.swap(fresh)
+            _LEXICAL_STATE.update(built=True, builds=_LEXICAL_STATE["builds"] + 1,
+                                  build_ms=int((time.perf_counter() - t0) * 1000))
+        _LEXICAL_STATE["checked_at"] = time.monotonic()
+
+
+def _lexical_written(points: List[PointStruct]) -> None:
+    if _LEXICAL_STATE["built"]:
+        _LEXICAL.add_many(_lexical_doc(p) for p in points)
+
+
+def _lexical_deleted(ids: List[str]) -> None:
+    if _LEXICAL_STATE["built"]:
+        _LEXICAL.remove(ids)
+
+
+def lexical_stats() -> Dict[str, Any]:
+    return {
+        "built": _LEXICAL_STATE["built"],
+        "documents": len(_LEXICAL),
+        "builds": _LEXICAL_STATE["builds"],
+        "build_ms": _LEXICAL_STATE["build_ms"],
+        "default_mode": RAG_RETRIEVAL_MODE,
+    }
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# Espace de noms des identifiants de points (UUIDv5 → même source + même contenu, même id)
+_POINT_NAMESPACE = uuid.UUID("5b0c8a52-3f3e-4c1e-9a57-6f0d4f2b8c11")
+_MANIFEST_PAGE = 1024
 
-    vecs = embed(chunks)
-    points = [
+
+def point_id(source: str, content_hash: str) -> str:
+    return str(uuid.uuid5(_POINT_NAMESPACE, f"{source}\n{content_hash}"))
+
+
+# Champs mis à jour sans ré-encodage sur un morceau inchangé: position (cf. chunker.Chunk.payload)
+# et étiquettes de la source (domaine, type)
+_MUTABLE_FIELDS = ("char_start", "char_end", "section", "domain", "type")
+
+
+def _labels(domain: Optional[str], doc_type: Optional[str]) -> Dict[str, str]:
+    labels = {"domain": domain, "type": doc_type}
+    return {k: v.strip() for k, v in labels.items() if v and v.strip()}
+
+
+def _unpack(chunk: Union[str, Chunk], labels: Dict[str, str]) -> Tuple[str, Dict[str, Any]]:
+    """(texte, champs modifiables) d'un morceau; les chaînes nues n'ont pas de position."""
+    if isinstance(chunk, Chunk):
+        return chunk.text, {**chunk.payload(), **labels}
+    return chunk, dict(labels)
+
+
+def _points(
+    chunks: List[str],
+    hashes: List[str],
+    vecs: List[List[float]],
+    source: str,
+    fields: Optional[List[Dict[str, Any]]] = None,
+) -> List[PointStruct]:
+    return [
         PointStruct(
-            id=None,  # laisse Qdrant générer
+            id=point_id(source, h),
             vector=v,
-            payload={"text": c, "source": source, "type": "doc"},
+            payload={"text": c, "source": source, "type": "doc", "chunk_hash": h, **extra},
         )
-        for v, c in zip(vecs, chunks)
+        for c, h, v, extra in zip(chunks, hashes, vecs, fields or [{}] * len(chunks))
     ]
-    # wait=True pour s'assurer que l'indexation est terminée avant de répondre
-    client.upsert(collection_name=QDRANT_COLLECTION, points=points, wait=True)
-    return len(points)
+
+
+def _stale(indexed: Dict[str, Any], fields: Dict[str, Any]) -> bool:
+    """Morceau inchangé dont la position (texte inséré/supprimé avant lui) ou les étiquettes ont changé."""
+    return any(indexed.get(k) != v for k, v in fields.items())
+
+
+def _update_ops(stale: List[Tuple[str, Dict[str, Any]]]) -> List[SetPayloadOperation]:
+    return [SetPayloadOperation(set_payload=SetPayload(payload=fields, points=[pid])) for pid, fields in stale]
+
+
+def _lexical_relabeled(stale: List[Tuple[str, Dict[str, Any]]]) -> None:
+    if _LEXICAL_STATE["built"]:
+        for pid, fields in stale:
+            _LEXICAL.update_meta(pid, {k: v for k, v in fields.items() if k in FILTER_FIELDS})
+
+
+def _source_filter(source: str) -> Filter:
+    return Filter(must=[FieldCondition(key="source", match=MatchValue(value=source))])
+
+
+def source_manifest(source: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Manifeste d'une source: {point_id: {chunk_hash, char_start, char_end, section, domain, type}} des points
+    actuellement indexés. Relu depuis Qdrant (payload seul, sans vecteurs): il ne peut pas
+    diverger de la collection.
+    """
+    client = _qdrant()
+    manifest: Dict[str, Dict[str, Any]] = {}
+    offset = None
+    while True:
+        points, offset = _call(client, lambda: client.scroll(
+            QDRANT_COLLECTION,
+            scroll_filter=_source_filter(source),
+            limit=_MANIFEST_PAGE,
+            offset=offset,
+            with_payload=["chunk_hash", *_MUTABLE_FIELDS],
+            with_vectors=False,
+        ))
+        manifest.update({str(p.id): p.payload or {} for p in points})
+        if offset is None:
+            return manifest
+
+
+async def source_manifest_async(source: str) -> Dict[str, Dict[str, Any]]:
+    client = _aqdrant()
+    manifest: Dict[str, Dict[str, Any]] = {}
+    offset = None
+    while True:
+        points, offset = await _acall(client, lambda: client.scroll(
+            QDRANT_COLLECTION,
+            scroll_filter=_source_filter(source),
+            limit=_MANIFEST_PAGE,
+            offset=offset,
+            with_payload=["chunk_hash", *_MUTABLE_FIELDS],
+            with_vectors=False,
+        ))
+        manifest.update({str(p.id): p.payload or {} for p in points})
+        if offset is None:
+            return manifest
+
+
+def _empty_report() -> Dict[str, int]:
+    return {"chunks": 0, "indexed": 0, "unchanged": 0, "duplicates": 0, "deleted": 0}
+
+
+def upsert_chunks(
+    chunks: List[Union[str, Chunk]],
+    source: str,
+    domain: Optional[str] = None,
+    doc_type: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Ré-ingestion incrémentale d'une source dans Qdrant, à partir de son manifeste:
+    seuls les morceaux nouveaux ou modifiés sont encodés et écrits, les morceaux
+    disparus de la source sont supprimés, la position des morceaux déplacés est mise à jour.
+    `domain` / `doc_type` étiquettent les morceaux (payload "domain" / "type", filtrables).
+    Retourne le rapport {"chunks", "indexed", "unchanged", "duplicates", "deleted"}.
+    """
+    report = _empty_report()
+    if not chunks:
+        return report
+
+    client = _qdrant()
+    manifest = source_manifest(source)
+    kept: set[str] = set()
+    labels = _labels(domain, doc_type)
+    fresh: List[Tuple[str, str, Dict[str, Any]]] = []
+    stale: List[Tuple[str, Dict[str, Any]]] = []
+    for chunk in chunks:
+        report["chunks"] += 1
+        text, fields = _unpack(chunk, labels)
+        h = chunk_hash(text)
+        pid = point_id(source, h)
+        if pid in kept:
+            report["duplicates"] += 1
+        elif pid in manifest:
+            report["unchanged"] += 1
+            if _stale(manifest[pid], fields):
+                stale.append((pid, fields))
+        else:
+            fresh.append((text, h, fields))
+        kept.add(pid)
+
+    for i in range(0, len(fresh), INGEST_EMBED_BATCH):
+        batch = fresh[i:i + INGEST_EMBED_BATCH]
+        texts = [c for c, _, _ in batch]
+        points = _points(texts, [h for _, h, _ in batch], embed(texts), source, [f for _, _, f in batch])
+        client.upsert(collection_name=QDRANT_COLLECTION, points=points, wait=True)
+        _lexical_written(points)
+        report["indexed"] += len(points)
+
+    for i in range(0, len(stale), INGEST_UPSERT_BATCH):
+        client.batch_update_points(QDRANT_COLLECTION, _update_ops(stale[i:i + INGEST_UPSERT_BATCH]), wait=True)
+    _lexical_relabeled(stale)
+
+    removed = [pid for pid in manifest if pid not in kept]
+    if removed:
+        client.delete(QDRANT_COLLECTION, points_selector=PointIdsList(points=removed), wait=True)
+        _lexical_deleted(removed)
+        report["deleted"] = len(removed)
+
+    if report["indexed"] or report["deleted"]:
+        _notify_corpus_changed()
+    return report
+
+
+class _IngestWriter:
+    """
+    Écriture par lots bornés vers Qdrant: chaque lot part en wait=False dès que le suivant
+    est prêt; le dernier est envoyé en wait=True. Les mises à jour d'une collection étant
+    appliquées dans l'ordre, ce dernier accusé sert de barrière de cohérence.
+    Un lot n'entre dans l'index lexical, et n'est compté dans `written`, qu'une fois accepté
+    par Qdrant (jamais tant qu'il est retenu ici ou si son envoi échoue).
+    """
+
+    def __init__(self, client: AsyncQdrantClient):
+        self._client = client
+        self._held: List[PointStruct] = []
+        self.written = 0  # points acceptés par Qdrant
+
+    async def _send(self, wait: bool) -> None:
+        points, self._held = self._held, []
+        await self._client.upsert(collection_name=QDRANT_COLLECTION, points=points, wait=wait)
+        _lexical_written(points)
+        self.written += len(points)
+
+    async def add(self, points: List[PointStruct]) -> None:
+        for i in range(0, len(points), INGEST_UPSERT_BATCH):
+            if self._held:
+                await self._send(wait=False)
+            self._held = points[i:i + INGEST_UPSERT_BATCH]
+
+    async def close(self) -> None:
+        if self._held:
+            await self._send(wait=True)
+
+
+async def ingest_stream(
+    chunks: Union[Iterable[Union[str, Chunk]], AsyncIterable[Union[str, Chunk]]],
+    source: str,
+    on_progress: Optional[Callable[[Dict[str, int]], None]] = None,
+    domain: Optional[str] = None,
+    doc_type: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Ingestion incrémentale en flux d'une source complète.
+
+    Le manifeste de la source (points déjà indexés) est lu avant de consommer les morceaux:
+    les morceaux inchangés ou répétés sont ignorés sans ré-encodage, les nouveaux sont encodés
+    par lots de INGEST_EMBED_BATCH sur le pool d'ingestion et écrits par lots de
+    INGEST_UPSERT_BATCH. Une fois le flux entièrement lu, les points qui n'y figurent plus
+    sont supprimés (jamais sur un flux interrompu par une erreur). Les morceaux `Chunk` portent
+    leur position (char_start, char_end, section) dans le payload, `domain` / `doc_type` les
+    étiquettent; position et étiquettes des morceaux inchangés sont mises à jour sans ré-encodage.
+    `on_progress` reçoit le rapport partiel après chaque lot.
+    Retourne {"chunks", "indexed", "unchanged", "duplicates", "deleted"}.
+    """
+    client = _aqdrant()
+    manifest = await source_manifest_async(source)
+    writer = _IngestWriter(client)
+    report = _empty_report()
+    kept: set[str] = set()
+    labels = _labels(domain, doc_type)
+    batch: List[Tuple[str, str, Dict[str, Any]]] = []
+    stale: List[Tuple[str, Dict[str, Any]]] = []
+
+    async def flush() -> None:
+        texts = [c for c, _, _ in batch]
+        vecs = await embed_async(texts, executor=_ingest_executor())
+        points = _points(texts, [h for _, h, _ in batch], vecs, source, [f for _, _, f in batch])
+        await writer.add(points)
+        report["indexed"] = writer.written  # lots acceptés par Qdrant, pas ceux encore retenus
+        batch.clear()
+        if on_progress is not None:
+            on_progress(dict(report))
+
+    completed = False
+    try:
+        async for chunk in _aiter(chunks):
+            report["chunks"] += 1
+            text, fields = _unpack(chunk, labels)
+            h = chunk_hash(text)
+            pid = point_id(source, h)
+            if pid in kept:
+                report["duplicates"] += 1
+                continue
+            kept.add(pid)
+            if pid in manifest:
+                report["unchanged"] += 1
+                if _stale(manifest[pid], fields):
+                    stale.append((pid, fields))
+                continue
+            batch.append((text, h, fields))
+            if len(batch) >= INGEST_EMBED_BATCH:
+                await flush()
+        if batch:
+            await flush()
+        completed = True
+    finally:
+        # Même sur erreur: le lot retenu part en wait=True, barrière pour les lots déjà envoyés
+        await writer.close()
+        if not completed and writer.written:
+            await _notify_corpus_changed_async()  # flux interrompu, mais des points ont été écrits
+    report["indexed"] = writer.written
+    for i in range(0, len(stale), INGEST_UPSERT_BATCH):
+        await client.batch_update_points(QDRANT_COLLECTION, _update_ops(stale[i:i + INGEST_UPSERT_BATCH]), wait=True)
+    _lexical_relabeled(stale)
+
+    removed = [pid for pid in manifest if pid not in kept]
+    if removed:
+        await client.delete(QDRANT_COLLECTION, points_selector=PointIdsList(points=removed), wait=True)
+        _lexical_deleted(removed)
+        report["deleted"] = len(removed)
+    if on_progress is not None:
+        on_progress(dict(report))
+
+    if report["indexed"] or report["deleted"]:
+        await _notify_corpus_changed_async()
+    return report
+
+
+async def _aiter(items: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    if hasattr(items, "__aiter__"):
+        async for item in items:  # type: ignore[union-attr]
+            yield item
+    else:
+        for item in items:  # type: ignore[union-attr]
+            yield item
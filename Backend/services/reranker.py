@@ -0,0 +1,180 @@
+# services/reranker.py
+"""
+Reclassement (rerank) des passages récupérés avant construction du prompt.
+
+La recherche sur-échantillonne (RERANK_CANDIDATES passages), un modèle de pertinence
+requête/passage les reclasse, puis seuls les top_k meilleurs entrent dans le prompt.
+Backends (RERANK_BACKEND): "cohere" (Cohere Rerank), "cross-encoder" (modèle local
+sentence-transformers) ou "none".
+
+Budget de latence: le rerank doit se terminer avant RERANK_DEADLINE_MS comptés depuis le
+début de la requête. Il est sauté si le temps restant est inférieur à sa latence médiane
+récente, et abandonné (ordre de la recherche conservé) s'il dépasse l'échéance.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from core.settings import env_float, env_int
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+RERANK_BACKEND = os.getenv("RERANK_BACKEND", "none").strip().lower()  # none | cohere | cross-encoder
+RERANK_COHERE_MODEL = os.getenv("RERANK_COHERE_MODEL", "rerank-multilingual-v3.0")
+RERANK_CROSS_ENCODER = os.getenv("RERANK_CROSS_ENCODER", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_CANDIDATES = max(1, env_int("RERANK_CANDIDATES", 20))  # passages récupérés avant rerank
+RERANK_DEADLINE_MS = env_float("RERANK_DEADLINE_MS", 1500.0)  # depuis le début de la requête
+RERANK_PROBE_S = env_float("RERANK_PROBE_S", 30.0)  # nouvel essai malgré la prédiction au-delà de ce délai
+RERANK_MAX_CHARS = env_int("RERANK_MAX_CHARS", 2000)  # texte de passage envoyé au modèle
+
+BACKENDS = ("none", "cohere", "cross-encoder")
+
+_CROSS_ENCODER = None
+_CROSS_ENCODER_LOCK = threading.Lock()
+_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+_LATENCIES: Deque[float] = deque(maxlen=256)
+_STATS_LOCK = threading.Lock()
+_STATS: Dict[str, Any] = {"applied": 0, "skipped_budget": 0, "timeouts": 0, "errors": 0, "last_error": None}
+_LAST_ATTEMPT = 0.0
+
+
+def enabled(override: Optional[bool] = None) -> bool:
+    """Rerank actif pour cette requête (`override` issu d'AskBody, sinon RERANK_BACKEND)."""
+    if override is False:
+        return False
+    return RERANK_BACKEND in {"cohere", "cross-encoder"}
+
+
+def candidates(top_k: int) -> int:
+    """Nombre de passages à récupérer quand le rerank est actif."""
+    return max(top_k, RERANK_CANDIDATES)
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+    return _EXECUTOR
+
+
+def _cross_encoder():
+    global _CROSS_ENCODER
+    if _CROSS_ENCODER is None:
+        with _CROSS_ENCODER_LOCK:
+            if _CROSS_ENCODER is None:
+                from sentence_transformers import CrossEncoder
+                _CROSS_ENCODER = CrossEncoder(RERANK_CROSS_ENCODER)
+    return _CROSS_ENCODER
+
+
+def _passage(hit: Dict[str, Any]) -> str:
+    payload = hit.get("payload") or {}
+    return str(payload.get("text") or "")[:RERANK_MAX_CHARS]
+
+
+async def _scores_cohere(query: str, passages: List[str]) -> List[float]:
+    from services.router_ai import _cohere_async_client
+
+    api_key = os.getenv("COHERE_API_KEY")
+    if not api_key:
+        raise RuntimeError("COHERE_API_KEY manquante")
+    resp = await _cohere_async_client(api_key).rerank(
+        model=RERANK_COHERE_MODEL, query=query, documents=passages, top_n=len(passages)
+    )
+    scores = [0.0] * len(passages)
+    for result in resp.results:
+        scores[result.index] = float(result.relevance_score)
+    return scores
+
+
+async def _scores_cross_encoder(query: str, passages: List[str]) -> List[float]:
+    def predict() -> List[float]:
+        return [float(s) for s in _cross_encoder().predict([(query, p) for p in passages])]
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor(), predict)
+
+
+def _median_ms() -> Optional[float]:
+    with _STATS_LOCK:
+        ordered = sorted(_LATENCIES)
+    return ordered[len(ordered) // 2] if ordered else None
+
+
+def _count(name: str, error: Optional[Exception] = None) -> None:
+    with _STATS_LOCK:
+        _STATS[name] += 1
+        if error is not None:
+            _STATS["last_error"] = str(error)[:300]
+
+
+async def rerank(
+    query: str,
+    hits: List[Dict[str, Any]],
+    top_k: int,
+    started_at: float,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Reclasse `hits` pour `query` et garde les `top_k` meilleurs (champ "rerank_score" ajouté).
+    `started_at` (time.time()) date le début de la requête pour le budget RERANK_DEADLINE_MS.
+    Retourne (hits, info) où info = {"backend", "applied", "reason"?, "ms"?, "candidates"}.
+    En cas de saut, de dépassement ou d'erreur, l'ordre de la recherche est conservé.
+    """
+    global _LAST_ATTEMPT
+    info: Dict[str, Any] = {"backend": RERANK_BACKEND, "applied": False, "candidates": len(hits)}
+    if len(hits) <= 1:
+        info["reason"] = "too_few_candidates"
+        return hits[:top_k], info
+
+    remaining_ms = RERANK_DEADLINE_MS - (time.time() - started_at) * 1000
+    median = _median_ms()
+    probe = time.monotonic() - _LAST_ATTEMPT > RERANK_PROBE_S
+    if remaining_ms <= 0 or (median is not None and median > remaining_ms and not probe):
+        _count("skipped_budget")
+        info["reason"] = "deadline"
+        return hits[:top_k], info
+
+    _LAST_ATTEMPT = time.monotonic()
+    passages = [_passage(h) for h in hits]
+    scorer = _scores_cohere if RERANK_BACKEND == "cohere" else _scores_cross_encoder
+    t0 = time.perf_counter()
+    try:
+        scores = await asyncio.wait_for(scorer(query, passages), timeout=remaining_ms / 1000)
+    except asyncio.TimeoutError:
+        with _STATS_LOCK:
+            _LATENCIES.append((time.perf_counter() - t0) * 1000)
+        _count("timeouts")
+        info["reason"] = "timeout"
+        return hits[:top_k], info
+    except Exception as exc:  # pragma: no cover - dépendances externes
+        _count("errors", exc)
+        info["reason"] = "error"
+        return hits[:top_k], info
+
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    with _STATS_LOCK:
+        _LATENCIES.append(elapsed_ms)
+    _count("applied")
+
+    order = sorted(range(len(hits)), key=lambda i: scores[i], reverse=True)[:top_k]
+    reranked = [{**hits[i], "rerank_score": round(scores[i], 4), "retrieval_rank": i + 1} for i in order]
+    info.update(applied=True, ms=int(elapsed_ms))
+    return reranked, info
+
+
+def stats() -> Dict[str, Any]:
+    with _STATS_LOCK:
+        snapshot = dict(_STATS)
+        ordered = sorted(_LATENCIES)
+    snapshot["backend"] = RERANK_BACKEND
+    snapshot["candidates"] = RERANK_CANDIDATES
+    snapshot["deadline_ms"] = RERANK_DEADLINE_MS
+    snapshot["latency_ms_p50"] = round(ordered[len(ordered) // 2], 1) if ordered else None
+    snapshot["latency_ms_p95"] = round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1) if ordered else None
+    return snapshot
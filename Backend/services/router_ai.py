@@ -1,7 +1,11 @@
 # services/router_ai.py
+import asyncio
 import os
+import random
+import threading
 import time
-from typing import Dict, Any, Optional
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Any, Optional
 from .intent import IntentResult
 
 # On ne retient que Cohere. La présence d'une clé Mistral n'influence plus le choix.
@@ -34,9 +38,118 @@ def _params_for(intent_name: str, override_temp: Optional[float], override_max:
     m = override_max  if override_max  is not None else base["max_tokens"]
     return t, m
 
-# ---- Cohere ----
+# ---- Cohere: clients partagés, retries, métriques ----
+COHERE_TIMEOUT_S = _f("COHERE_TIMEOUT_S", 60.0)
+COHERE_MAX_RETRIES = _i("COHERE_MAX_RETRIES", 2)
+COHERE_BACKOFF_S = _f("COHERE_BACKOFF_S", 0.5)        # délai initial, doublé à chaque tentative
+COHERE_BACKOFF_MAX_S = _f("COHERE_BACKOFF_MAX_S", 8.0)
+COHERE_MAX_CONNECTIONS = _i("COHERE_MAX_CONNECTIONS", 20)
+_RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+_CLIENT = None
+_ACLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+def _http_limits():
+    import httpx
+    return httpx.Limits(max_connections=COHERE_MAX_CONNECTIONS, max_keepalive_connections=COHERE_MAX_CONNECTIONS, keepalive_expiry=60.0)
+
+def _cohere_client(api_key: str):
+    """Client Cohere sync unique (pool httpx keep-alive), créé au premier appel."""
+    global _CLIENT
+    if _CLIENT is None:
+        import cohere, httpx
+        with _CLIENT_LOCK:
+            if _CLIENT is None:
+                _CLIENT = cohere.Client(
+                    api_key,
+                    timeout=COHERE_TIMEOUT_S,
+                    httpx_client=httpx.Client(timeout=COHERE_TIMEOUT_S, limits=_http_limits()),
+                )
+    return _CLIENT
+
+def _cohere_async_client(api_key: str):
+    """Client Cohere async unique (pool httpx keep-alive), créé au premier appel."""
+    global _ACLIENT
+    if _ACLIENT is None:
+        import cohere, httpx
+        _ACLIENT = cohere.AsyncClient(
+            api_key,
+            timeout=COHERE_TIMEOUT_S,
+            httpx_client=httpx.AsyncClient(timeout=COHERE_TIMEOUT_S, limits=_http_limits()),
+        )
+    return _ACLIENT
+
+def _retryable(exc: Exception) -> bool:
+    import httpx
+    status = getattr(exc, "status_code", None)
+    if status is not None:
+        return status in _RETRY_STATUS
+    return isinstance(exc, httpx.TransportError)
+
+def _backoff(attempt: int) -> float:
+    delay = min(COHERE_BACKOFF_S * (2 ** attempt), COHERE_BACKOFF_MAX_S)
+    return delay * (1 - 0.25 * random.random())
+
+_LATENCIES: Deque[int] = deque(maxlen=512)  # latences des derniers appels réussis (ms)
+_METRICS_LOCK = threading.Lock()
+_METRICS: Dict[str, Any] = {"calls": 0, "errors": 0, "retries": 0, "input_tokens": 0, "output_tokens": 0, "errors_by_status": {}, "last_error": None}
+
+def _record_call(latency_ms: int, error: Optional[Exception] = None, tokens: Optional[Dict[str, Optional[int]]] = None) -> None:
+    with _METRICS_LOCK:
+        _METRICS["calls"] += 1
+        if error is not None:
+            _METRICS["errors"] += 1
+            key = str(getattr(error, "status_code", None) or type(error).__name__)
+            _METRICS["errors_by_status"][key] = _METRICS["errors_by_status"].get(key, 0) + 1
+            _METRICS["last_error"] = str(error)[:300]
+            return
+        _LATENCIES.append(latency_ms)
+        for name in ("input_tokens", "output_tokens"):
+            _METRICS[name] += (tokens or {}).get(name) or 0
+
+def _record_retry() -> None:
+    with _METRICS_LOCK:
+        _METRICS["retries"] += 1
+
+def cohere_stats() -> Dict[str, Any]:
+    """Compteurs des appels Cohere (succès, erreurs, retries, latences récentes)."""
+    with _METRICS_LOCK:
+        snapshot = {**_METRICS, "errors_by_status": dict(_METRICS["errors_by_status"])}
+        ordered = sorted(_LATENCIES)
+    if ordered:
+        snapshot["latency_ms"] = {
+            "p50": ordered[len(ordered) // 2],
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            "max": ordered[-1],
+            "window": len(ordered),
+        }
+    else:
+        snapshot["latency_ms"] = None
+    return snapshot
+
+def _usage(meta: Any) -> Optional[Dict[str, Optional[int]]]:
+    """Compte de tokens (entrée/sortie) depuis `meta` d'une réponse Cohere, si présent."""
+    counts = getattr(meta, "billed_units", None) or getattr(meta, "tokens", None)
+    if counts is None:
+        return None
+    def _n(value: Any) -> Optional[int]:
+        return int(value) if value is not None else None
+    return {"input_tokens": _n(getattr(counts, "input_tokens", None)), "output_tokens": _n(getattr(counts, "output_tokens", None))}
+
+def _ok(model: str, resp: Any, t0: float) -> Dict[str, Any]:
+    latency_ms = int((time.time() - t0) * 1000)
+    tokens = _usage(getattr(resp, "meta", None))
+    _record_call(latency_ms, tokens=tokens)
+    text = (getattr(resp, "text", "") or "").strip() or "(réponse vide)"
+    return {"provider": "cohere", "model": model, "text": text, "latency_ms": latency_ms, "tokens": tokens}
+
+def _failed(model: str, exc: Exception, t0: float) -> Dict[str, Any]:
+    latency_ms = int((time.time() - t0) * 1000)
+    _record_call(latency_ms, error=exc)
+    return {"provider": "error", "model": model, "text": f"Erreur Cohere: {exc}", "latency_ms": latency_ms}
+
 def _cohere_complete(prompt: str, temperature: float, max_tokens: int, model_name: Optional[str] = None) -> Dict[str, Any]:
-    import cohere
     api_key = os.getenv("COHERE_API_KEY")
     if not api_key:
         # On renvoie une erreur contrôlée (le caller peut la formater)
@@ -44,27 +157,135 @@ def _cohere_complete(prompt: str, temperature: float, max_tokens: int, model_nam
 
     model = model_name or os.getenv("COHERE_MODEL", "command-r")
     t0 = time.time()
-    try:
-        client = cohere.Client(api_key)
-        # Le SDK Cohere accepte soit `message=str`, soit `messages=[...]` selon version.
-        # Ici on utilise `message=` pour rester compatible avec le code existant.
-        resp = client.chat(
-            model=model,
-            message=prompt,
-            temperature=temperature,
-            max_tokens=max_tokens
-        )
-        text = (getattr(resp, "text", "") or "").strip() or "(réponse vide)"
-        return {
-            "provider": "cohere",
-            "model": model,
-            "text": text,
-            "latency_ms": int((time.time() - t0) * 1000)
-        }
-    except Exception as e:
-        return {"provider": "error", "model": model, "text": f"Erreur Cohere: {e}", "latency_ms": 0}
+    attempt = 0
+    while True:
+        try:
+            client = _cohere_client(api_key)
+            # Le SDK Cohere accepte soit `message=str`, soit `messages=[...]` selon version.
+            # Ici on utilise `message=` pour rester compatible avec le code existant.
+            resp = client.chat(
+                model=model,
+                message=prompt,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            return _ok(model, resp, t0)
+        except Exception as e:
+            if attempt < COHERE_MAX_RETRIES and _retryable(e):
+                _record_retry()
+                time.sleep(_backoff(attempt))
+                attempt += 1
+                continue
+            return _failed(model, e, t0)
+
+async def _cohere_complete_async(prompt: str, temperature: float, max_tokens: int, model_name: Optional[str] = None) -> Dict[str, Any]:
+    """Variante async de _cohere_complete (cohere.AsyncClient, ne bloque pas la boucle)."""
+    api_key = os.getenv("COHERE_API_KEY")
+    if not api_key:
+        return {"provider": "error", "model": "-", "text": "COHERE_API_KEY manquante", "latency_ms": 0}
+
+    model = model_name or os.getenv("COHERE_MODEL", "command-r")
+    t0 = time.time()
+    attempt = 0
+    while True:
+        try:
+            client = _cohere_async_client(api_key)
+            resp = await client.chat(
+                model=model,
+                message=prompt,
+                temperature=temperature,
+                max_tokens=max_tokens
+            )
+            return _ok(model, resp, t0)
+        except Exception as e:
+            if attempt < COHERE_MAX_RETRIES and _retryable(e):
+                _record_retry()
+                await asyncio.sleep(_backoff(attempt))
+                attempt += 1
+                continue
+            return _failed(model, e, t0)
+
+async def _cohere_stream_async(prompt: str, temperature: float, max_tokens: int, model_name: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Complétion Cohere en streaming (chat_stream). Produit des événements:
+      {"type": "delta", "text"} puis {"type": "end", provider, model, latency_ms, ttft_ms, tokens, finish_reason}
+      ou {"type": "error", "text", "latency_ms"} en cas d'échec.
+    Les retries ne sont tentés que tant qu'aucun token n'a été émis.
+    """
+    api_key = os.getenv("COHERE_API_KEY")
+    if not api_key:
+        yield {"type": "error", "text": "COHERE_API_KEY manquante", "latency_ms": 0}
+        return
+
+    model = model_name or os.getenv("COHERE_MODEL", "command-r")
+    t0 = time.time()
+    ttft_ms: Optional[int] = None
+    tokens: Optional[Dict[str, Optional[int]]] = None
+    finish_reason: Optional[str] = None
+    attempt = 0
+    while True:
+        try:
+            client = _cohere_async_client(api_key)
+            async for event in client.chat_stream(
+                model=model,
+                message=prompt,
+                temperature=temperature,
+                max_tokens=max_tokens
+            ):
+                kind = getattr(event, "event_type", None)
+                if kind == "text-generation":
+                    text = getattr(event, "text", "") or ""
+                    if not text:
+                        continue
+                    if ttft_ms is None:
+                        ttft_ms = int((time.time() - t0) * 1000)
+                    yield {"type": "delta", "text": text}
+                elif kind == "stream-end":
+                    finish_reason = getattr(event, "finish_reason", None)
+                    tokens = _usage(getattr(getattr(event, "response", None), "meta", None))
+            break
+        except Exception as e:
+            if ttft_ms is None and attempt < COHERE_MAX_RETRIES and _retryable(e):
+                _record_retry()
+                await asyncio.sleep(_backoff(attempt))
+                attempt += 1
+                continue
+            latency_ms = int((time.time() - t0) * 1000)
+            _record_call(latency_ms, error=e)
+            yield {"type": "error", "text": f"Erreur Cohere: {e}", "latency_ms": latency_ms}
+            return
+
+    latency_ms = int((time.time() - t0) * 1000)
+    _record_call(latency_ms, tokens=tokens)
+    yield {
+        "type": "end",
+        "provider": "cohere",
+        "model": model,
+        "latency_ms": latency_ms,
+        "ttft_ms": ttft_ms,
+        "tokens": tokens,
+        "finish_reason": finish_reason,
+    }
 
 # ---- Sélection + exécution (Cohere-only) ----
+def _resolve(
+    intent: IntentResult,
+    override_temperature: Optional[float],
+    override_max_tokens: Optional[int],
+    kwargs: Dict[str, Any],
+) -> tuple[float, int, str]:
+    temperature, max_tokens = _params_for(intent.intent, override_temperature, override_max_tokens)
+
+    # Support optionnel d’un modèle imposé depuis l’UI sans crasher si absent
+    model_name = None
+    try:
+        model_name = kwargs.get("force_model") or os.getenv("COHERE_MODEL", "command-r")
+    except Exception:
+        model_name = os.getenv("COHERE_MODEL", "command-r")
+    return temperature, max_tokens, model_name
+
+_NO_PROVIDER = {"provider": "none", "model": "none", "text": "Aucun provider IA configuré (Cohere manquant).", "latency_ms": 0}
+
 def choose_and_complete(
     intent: IntentResult,
     prompt: str,
@@ -78,17 +299,44 @@ def choose_and_complete(
     - Ignore force_provider (on force Cohere).
     - Supporte un "force_model" éventuel via kwargs sans planter.
     """
-    temperature, max_tokens = _params_for(intent.intent, override_temperature, override_max_tokens)
-
-    # Support optionnel d’un modèle imposé depuis l’UI sans crasher si absent
-    model_name = None
-    try:
-        model_name = kwargs.get("force_model") or os.getenv("COHERE_MODEL", "command-r")
-    except Exception:
-        model_name = os.getenv("COHERE_MODEL", "command-r")
+    temperature, max_tokens, model_name = _resolve(intent, override_temperature, override_max_tokens, kwargs)
 
     # Toujours Cohere
     if not USE_COHERE:
-        return {"provider": "none", "model": "none", "text": "Aucun provider IA configuré (Cohere manquant).", "latency_ms": 0}
+        return dict(_NO_PROVIDER)
 
     return _cohere_complete(prompt, temperature, max_tokens, model_name=model_name)
+
+async def choose_and_complete_async(
+    intent: IntentResult,
+    prompt: str,
+    override_temperature: Optional[float] = None,
+    override_max_tokens: Optional[int] = None,
+    force_provider: Optional[str] = None,
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """Variante async de choose_and_complete (mêmes règles de sélection)."""
+    temperature, max_tokens, model_name = _resolve(intent, override_temperature, override_max_tokens, kwargs)
+
+    if not USE_COHERE:
+        return dict(_NO_PROVIDER)
+
+    return await _cohere_complete_async(prompt, temperature, max_tokens, model_name=model_name)
+
+async def choose_and_stream_async(
+    intent: IntentResult,
+    prompt: str,
+    override_temperature: Optional[float] = None,
+    override_max_tokens: Optional[int] = None,
+    force_provider: Optional[str] = None,
+    **kwargs: Any,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Variante streaming de choose_and_complete_async (voir _cohere_stream_async pour les événements)."""
+    temperature, max_tokens, model_name = _resolve(intent, override_temperature, override_max_tokens, kwargs)
+
+    if not USE_COHERE:
+        yield {"type": "error", "text": _NO_PROVIDER["text"], "latency_ms": 0}
+        return
+
+    async for event in _cohere_stream_async(prompt, temperature, max_tokens, model_name=model_name):
+        yield event
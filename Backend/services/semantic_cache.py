@@ -0,0 +1,184 @@
+# services/semantic_cache.py
+"""
+Cache sémantique: retrouve une réponse déjà produite pour une question paraphrasée.
+
+Les embeddings des questions répondues sont gardés dans une matrice NumPy en mémoire
+(vecteurs L2-normalisés → produit scalaire = cosinus). Au-delà du seuil de similarité,
+la réponse est relue dans le cache de réponses (mémoire puis table answers_cache)
+et l'appel Cohere est évité.
+
+Désactivé par défaut (SEMANTIC_CACHE_ENABLED=1 pour l'activer): deux questions proches peuvent
+différer par une entité décisive (pays, année, article), et la réponse de l'une serait servie
+pour l'autre. Seuls les voisins de même signature (paramètres, filtres, génération du corpus)
+sont comparés.
+"""
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from core.settings import env_bool, env_float, env_int
+from services import answer_cache, rag_service
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+SEMANTIC_CACHE_ENABLED = env_bool("SEMANTIC_CACHE_ENABLED", False)
+SEMANTIC_CACHE_THRESHOLD = env_float("SEMANTIC_CACHE_THRESHOLD", 0.92)
+SEMANTIC_CACHE_MAX_ITEMS = env_int("SEMANTIC_CACHE_MAX_ITEMS", 2048)
+
+# Bornes basses des tranches de l'histogramme des similarités (meilleur voisin par requête)
+_BUCKETS = (0.0, 0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95)
+
+
+class SemanticIndex:
+    """Tampon circulaire de vecteurs (float32) associés à une clé de cache et une signature."""
+
+    def __init__(self, dim: int, max_items: int):
+        self.max_items = max(1, max_items)
+        self._vecs = np.zeros((self.max_items, dim), dtype=np.float32)
+        self._keys: List[Optional[str]] = [None] * self.max_items
+        self._questions: List[str] = [""] * self.max_items
+        self._sigs = np.empty(self.max_items, dtype=object)
+        self._size = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def add(self, vector: List[float], key: str, signature: str, question: str) -> None:
+        vec = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            slot = self._next
+            self._vecs[slot] = vec
+            self._keys[slot] = key
+            self._questions[slot] = question
+            self._sigs[slot] = signature
+            self._next = (slot + 1) % self.max_items
+            self._size = min(self._size + 1, self.max_items)
+
+    def nearest(self, vector: List[float], signature: str) -> Optional[Dict[str, Any]]:
+        """Meilleur voisin de même signature: {"similarity", "key", "question"} ou None."""
+        vec = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            if self._size == 0:
+                return None
+            mask = self._sigs[: self._size] == signature
+            if not mask.any():
+                return None
+            sims = self._vecs[: self._size] @ vec
+            sims = np.where(mask, sims, -np.inf)
+            best = int(np.argmax(sims))
+            return {
+                "similarity": float(sims[best]),
+                "key": self._keys[best],
+                "question": self._questions[best],
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys = [None] * self.max_items
+            self._questions = [""] * self.max_items
+            self._sigs = np.empty(self.max_items, dtype=object)
+            self._size = 0
+            self._next = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+
+_INDEX = SemanticIndex(rag_service.EMB_DIM, SEMANTIC_CACHE_MAX_ITEMS)
+_STATS_LOCK = threading.Lock()
+_STATS: Dict[str, Any] = {"hits": 0, "misses": 0, "stale": 0, "similarity_sum": 0.0, "compared": 0}
+_HISTOGRAM = [0] * len(_BUCKETS)
+
+
+def _record(similarity: Optional[float], outcome: str) -> None:
+    with _STATS_LOCK:
+        _STATS[outcome] += 1
+        if similarity is None:
+            return
+        _STATS["compared"] += 1
+        _STATS["similarity_sum"] += similarity
+        for i in range(len(_BUCKETS) - 1, -1, -1):
+            if similarity >= _BUCKETS[i]:
+                _HISTOGRAM[i] += 1
+                break
+
+
+def _match(vector: List[float], signature: str) -> Optional[Dict[str, Any]]:
+    """Meilleur voisin au-dessus du seuil, ou None (compte le miss)."""
+    match = _INDEX.nearest(vector, signature)
+    similarity = match["similarity"] if match else None
+    if match is None or similarity < SEMANTIC_CACHE_THRESHOLD:
+        _record(similarity, "misses")
+        return None
+    return match
+
+
+def _hit(match: Dict[str, Any], entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if entry is None:
+        # Réponse expirée ou invalidée entre-temps
+        _record(match["similarity"], "stale")
+        return None
+
+    _record(match["similarity"], "hits")
+    return {
+        "answer": entry["answer"],
+        "sources": entry["sources"],
+        "similarity": round(match["similarity"], 4),
+        "matched_question": match["question"],
+    }
+
+
+def lookup(question: str, vector: List[float], signature: str) -> Optional[Dict[str, Any]]:
+    """
+    Cherche une question proche (cosinus >= seuil) déjà répondue avec les mêmes paramètres.
+    Retourne {"answer", "sources", "similarity", "matched_question"} ou None.
+    """
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    match = _match(vector, signature)
+    if match is None:
+        return None
+    return _hit(match, answer_cache.fetch(match["question"], match["key"]))
+
+
+async def lookup_async(question: str, vector: List[float], signature: str) -> Optional[Dict[str, Any]]:
+    """Variante async de lookup (relecture de la réponse via le pool Postgres async)."""
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    match = _match(vector, signature)
+    if match is None:
+        return None
+    return _hit(match, await answer_cache.fetch_async(match["question"], match["key"]))
+
+
+def remember(question: str, vector: List[float], key: str, signature: str) -> None:
+    if SEMANTIC_CACHE_ENABLED:
+        _INDEX.add(vector, key, signature, question)
+
+
+def invalidate() -> None:
+    _INDEX.clear()
+
+
+def stats() -> Dict[str, Any]:
+    with _STATS_LOCK:
+        snapshot = dict(_STATS)
+        histogram = list(_HISTOGRAM)
+    lookups = snapshot["hits"] + snapshot["misses"] + snapshot["stale"]
+    compared = snapshot.pop("compared")
+    similarity_sum = snapshot.pop("similarity_sum")
+    bounds = list(_BUCKETS) + [1.0]
+    snapshot["hit_rate"] = round(snapshot["hits"] / lookups, 4) if lookups else 0.0
+    snapshot["mean_similarity"] = round(similarity_sum / compared, 4) if compared else None
+    snapshot["similarity_histogram"] = {
+        f"{bounds[i]:.2f}-{bounds[i + 1]:.2f}": histogram[i] for i in range(len(_BUCKETS))
+    }
+    snapshot["threshold"] = SEMANTIC_CACHE_THRESHOLD
+    snapshot["items"] = len(_INDEX)
+    snapshot["max_items"] = _INDEX.max_items
+    snapshot["enabled"] = SEMANTIC_CACHE_ENABLED
+    return snapshot
+
+
+rag_service.on_corpus_change(invalidate)
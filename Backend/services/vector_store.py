@@ -0,0 +1,608 @@
+# services/vector_store.py
+"""
+Magasin de vecteurs de rag_service: serveur Qdrant (défaut) ou index local embarqué.
+
+L'interface (VectorStore) est le sous-ensemble du client Qdrant utilisé par rag_service:
+recherche, lecture, scroll, écriture, suppression, mise à jour de payload. Le code de
+recherche et d'ingestion est donc identique pour les deux backends.
+
+VECTOR_BACKEND=local remplace le serveur par un index en processus, persisté sous
+storage/vectors/<collection>/:
+  - vectors.f32 (ou vectors.i8 + scales.f32): matrice des vecteurs L2-normalisés en mémoire
+    mappée (np.memmap), agrandie par doublement; en int8, un facteur d'échelle par vecteur;
+  - points.sqlite3: identifiant, ligne de la matrice et payload JSON de chaque point, et la
+    configuration de la collection.
+La recherche parcourt la matrice par blocs de VECTOR_LOCAL_BLOCK lignes (produit scalaire
+NumPy puis argpartition): exacte en float32, sans index à construire. Les filtres portent sur
+des codes entiers gardés en mémoire pour les champs indexés (create_payload_index), lus dans
+SQLite pour les autres. Les réglages HNSW / quantification du profil Qdrant sont conservés
+(migration) mais sans effet sur l'index local.
+
+Usage visé: petits corpus, développement et CI sans serveur. Un seul processus doit écrire
+dans un répertoire donné (pas de verrou inter-processus).
+"""
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Sequence, Tuple, Union
+
+import numpy as np
+from qdrant_client.models import (
+    CollectionStatus,
+    CountResult,
+    Distance,
+    FieldCondition,
+    Filter,
+    MatchAny,
+    MatchValue,
+    PayloadSchemaType,
+    PointIdsList,
+    PointStruct,
+    Record,
+    ScalarQuantization,
+    ScoredPoint,
+    SetPayloadOperation,
+    UpdateResult,
+    UpdateStatus,
+    VectorParams,
+)
+
+from core.settings import env_int
+
+# ---------------------------
+# Configuration (ENV)
+# ---------------------------
+_STORAGE = Path(__file__).resolve().parent.parent / "storage"
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").strip().lower()  # qdrant | local
+VECTOR_LOCAL_DIR = Path(os.getenv("VECTOR_LOCAL_DIR", str(_STORAGE / "vectors")))
+VECTOR_LOCAL_DTYPE = os.getenv("VECTOR_LOCAL_DTYPE", "float32").strip().lower()  # float32 | int8 (4× moins de disque/RAM, plus lent)
+VECTOR_LOCAL_BLOCK = max(1024, env_int("VECTOR_LOCAL_BLOCK", 65536))  # lignes par bloc de produit scalaire
+BACKENDS = ("qdrant", "local")
+
+_INITIAL_ROWS = 1024
+_SQL_BATCH = 500  # identifiants par requête "in (...)"
+
+
+def backend() -> str:
+    """Backend validé (VECTOR_BACKEND)."""
+    if VECTOR_BACKEND not in BACKENDS:
+        raise ValueError(f"VECTOR_BACKEND inconnu: {VECTOR_BACKEND!r} (attendu: {', '.join(BACKENDS)})")
+    return VECTOR_BACKEND
+
+
+class VectorStore(Protocol):
+    """Sous-ensemble de QdrantClient utilisé par rag_service (les variantes async ont les mêmes méthodes)."""
+
+    def get_collection(self, collection_name: str) -> Any: ...
+    def create_collection(self, collection_name: str, vectors_config: VectorParams, **kwargs: Any) -> bool: ...
+    def update_collection(self, collection_name: str, **kwargs: Any) -> bool: ...
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema: Any = None, **kwargs: Any) -> Any: ...
+    def search(self, collection_name: str, query_vector: Sequence[float], limit: int = 10, **kwargs: Any) -> List[ScoredPoint]: ...
+    def retrieve(self, collection_name: str, ids: Sequence[Union[int, str]], with_payload: Any = True, **kwargs: Any) -> List[Record]: ...
+    def count(self, collection_name: str, count_filter: Optional[Filter] = None, exact: bool = True) -> CountResult: ...
+    def scroll(self, collection_name: str, scroll_filter: Optional[Filter] = None, limit: int = 10,
+               offset: Any = None, with_payload: Any = True, with_vectors: Any = False) -> Tuple[List[Record], Any]: ...
+    def upsert(self, collection_name: str, points: List[PointStruct], wait: bool = True) -> UpdateResult: ...
+    def delete(self, collection_name: str, points_selector: Any, wait: bool = True) -> UpdateResult: ...
+    def batch_update_points(self, collection_name: str, update_operations: List[Any], wait: bool = True) -> List[UpdateResult]: ...
+
+
+def _not_found(name: str) -> ValueError:
+    # Même message que le mode local du client Qdrant: reconnu par rag_service._is_not_found
+    return ValueError(f"Collection {name} not found")
+
+
+def _done() -> UpdateResult:
+    return UpdateResult(operation_id=0, status=UpdateStatus.COMPLETED)
+
+
+def _select(payload: Dict[str, Any], with_payload: Any) -> Optional[Dict[str, Any]]:
+    if with_payload is True:
+        return payload
+    if not with_payload:
+        return None
+    return {k: payload[k] for k in with_payload if k in payload}
+
+
+def _conditions(flt: Filter) -> Tuple[List[FieldCondition], List[FieldCondition]]:
+    def as_list(value: Any) -> List[Any]:
+        return [] if value is None else list(value) if isinstance(value, list) else [value]
+
+    if flt.should or flt.min_should:
+        raise NotImplementedError("Index local: filtres 'should' non supportés")
+    must, must_not = as_list(flt.must), as_list(flt.must_not)
+    for cond in must + must_not:
+        if not isinstance(cond, FieldCondition) or not isinstance(cond.match, (MatchValue, MatchAny)):
+            raise NotImplementedError(f"Index local: condition non supportée ({type(cond).__name__})")
+    return must, must_not
+
+
+def _values(cond: FieldCondition) -> List[Any]:
+    return [cond.match.value] if isinstance(cond.match, MatchValue) else list(cond.match.any)
+
+
+class _Collection:
+    """Une collection locale: matrice mappée + table SQLite des points (accès sérialisé par un verrou)."""
+
+    def __init__(self, path: Path, block: int):
+        self.path = path
+        self.block = block
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(path / "points.sqlite3"), check_same_thread=False)
+        meta = dict(self._db.execute("select key, value from meta").fetchall())
+        self.config: Dict[str, Any] = json.loads(meta["config"])
+        self.dtype = meta["dtype"]
+        self.indexed: List[str] = json.loads(meta.get("indexes", "[]"))
+        self.dim = int(self.config["vectors"]["size"])
+        self.normalize = self.config["vectors"]["distance"] == Distance.COSINE
+
+        self._ids: Dict[str, int] = {}
+        self._rows: Dict[int, str] = {}
+        for pid, row in self._db.execute("select id, row from points"):
+            self._ids[pid], self._rows[row] = row, pid
+        self._open_matrix()
+        self._size = max(self._rows, default=-1) + 1  # lignes parcourues par la recherche
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        self._alive[list(self._rows)] = True
+        self._free = [row for row in range(self._size) if row not in self._rows]
+        self._codes: Dict[str, np.ndarray] = {}
+        self._vocab: Dict[str, Dict[Any, int]] = {}
+        for field_name in self.indexed:
+            self._build_codes(field_name)
+
+    # -- création / fichiers --
+    @classmethod
+    def create(cls, path: Path, config: Dict[str, Any], dtype: str, block: int) -> "_Collection":
+        if dtype not in ("float32", "int8"):
+            raise ValueError(f"VECTOR_LOCAL_DTYPE inconnu: {dtype!r} (attendu: float32, int8)")
+        if config["vectors"]["distance"] not in (Distance.COSINE, Distance.DOT):
+            raise ValueError(f"Index local: distance {config['vectors']['distance']} non supportée (Cosine, Dot)")
+        path.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(path / "points.sqlite3"))
+        with db:
+            db.execute("create table if not exists meta (key text primary key, value text not null)")
+            db.execute(
+                "create table if not exists points (id text primary key, row integer not null unique, payload text not null)"
+            )
+            db.executemany(
+                "insert or replace into meta(key, value) values (?, ?)",
+                [("config", json.dumps(config)), ("dtype", dtype), ("indexes", "[]")],
+            )
+        db.close()
+        dim = int(config["vectors"]["size"])
+        _resize(path / _vectors_file(dtype), _INITIAL_ROWS * dim * np.dtype(dtype).itemsize)
+        if dtype == "int8":
+            _resize(path / "scales.f32", _INITIAL_ROWS * 4)
+        return cls(path, block)
+
+    def _open_matrix(self) -> None:
+        vectors = self.path / _vectors_file(self.dtype)
+        self._capacity = os.path.getsize(vectors) // (self.dim * np.dtype(self.dtype).itemsize)
+        self._vecs = np.memmap(vectors, dtype=self.dtype, mode="r+", shape=(self._capacity, self.dim))
+        self._scales = (
+            np.memmap(self.path / "scales.f32", dtype=np.float32, mode="r+", shape=(self._capacity,))
+            if self.dtype == "int8" else None
+        )
+
+    def _grow(self, rows: int) -> None:
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, self._capacity * 2)
+        self._vecs.flush()
+        _resize(self.path / _vectors_file(self.dtype), capacity * self.dim * np.dtype(self.dtype).itemsize)
+        if self._scales is not None:
+            self._scales.flush()
+            _resize(self.path / "scales.f32", capacity * 4)
+        # Les recherches en cours gardent l'ancienne projection (toujours valide)
+        self._open_matrix()
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+        for field_name, codes in self._codes.items():
+            self._codes[field_name] = np.concatenate([codes, np.full(capacity - len(codes), -1, dtype=np.int32)])
+
+    def close(self) -> None:
+        with self._lock:
+            self._vecs.flush()
+            if self._scales is not None:
+                self._scales.flush()
+            self._db.close()
+
+    # -- configuration --
+    def set_meta(self, key: str, value: Any) -> None:
+        with self._db:
+            self._db.execute("insert or replace into meta(key, value) values (?, ?)", (key, json.dumps(value)))
+
+    def index(self, field_name: str) -> None:
+        with self._lock:
+            if field_name in self.indexed:
+                return
+            self.indexed.append(field_name)
+            self._build_codes(field_name)
+            self.set_meta("indexes", self.indexed)
+
+    def _build_codes(self, field_name: str) -> None:
+        self._codes[field_name] = np.full(self._capacity, -1, dtype=np.int32)
+        self._vocab[field_name] = {}
+        rows = self._db.execute(
+            "select row, json_extract(payload, ?) from points", (f'$."{field_name}"',)
+        ).fetchall()
+        for row, value in rows:
+            self._set_code(field_name, row, value)
+
+    def _set_code(self, field_name: str, row: int, value: Any) -> None:
+        if value is None or isinstance(value, (list, dict)):  # seules les valeurs scalaires sont indexées
+            self._codes[field_name][row] = -1
+            return
+        vocab = self._vocab[field_name]
+        self._codes[field_name][row] = vocab.setdefault(value, len(vocab))
+
+    # -- filtres --
+    def mask(self, flt: Optional[Filter]) -> np.ndarray:
+        """Lignes vivantes (parmi les `_size` premières) qui satisfont le filtre."""
+        with self._lock:
+            mask = self._alive[:self._size].copy()
+            if flt is None:
+                return mask
+            must, must_not = _conditions(flt)
+            for cond, keep in [(c, True) for c in must] + [(c, False) for c in must_not]:
+                hit = self._match(cond)
+                mask &= hit if keep else ~hit
+            return mask
+
+    def _match(self, cond: FieldCondition) -> np.ndarray:
+        values = _values(cond)
+        if cond.key in self._codes:
+            vocab = self._vocab[cond.key]
+            codes = [vocab[v] for v in values if v in vocab]
+            return np.isin(self._codes[cond.key][:self._size], codes)
+        # Champ non indexé: lecture du payload dans SQLite
+        hit = np.zeros(self._size, dtype=bool)
+        rows = self._db.execute("select row, json_extract(payload, ?) from points", (f'$."{cond.key}"',))
+        wanted = set(values)
+        for row, value in rows:
+            if not isinstance(value, (list, dict)) and value in wanted:
+                hit[row] = True
+        return hit
+
+    # -- lecture --
+    def search(self, vector: Sequence[float], limit: int, flt: Optional[Filter]) -> List[Tuple[str, float]]:
+        query = np.asarray(vector, dtype=np.float32)
+        if self.normalize:
+            query = query / (np.linalg.norm(query) or 1.0)
+        mask = self.mask(flt)
+        with self._lock:
+            vecs, scales, rows_to_ids = self._vecs, self._scales, self._rows
+        found_rows: List[np.ndarray] = []
+        found_scores: List[np.ndarray] = []
+        for start in range(0, len(mask), self.block):
+            rows = np.flatnonzero(mask[start:start + self.block]) + start
+            if not len(rows):
+                continue
+            dense = len(rows) == min(self.block, len(mask) - start)
+            block = vecs[start:start + len(rows)] if dense else vecs[rows]
+            scores = block.astype(np.float32, copy=False) @ query
+            if scales is not None:
+                scores *= scales[start:start + len(rows)] if dense else scales[rows]
+            if len(rows) > limit:
+                top = np.argpartition(-scores, limit - 1)[:limit]
+                rows, scores = rows[top], scores[top]
+            found_rows.append(rows)
+            found_scores.append(scores)
+        if not found_rows:
+            return []
+        rows = np.concatenate(found_rows)
+        scores = np.concatenate(found_scores)
+        order = np.argsort(-scores, kind="stable")[:limit]
+        return [(rows_to_ids[int(rows[i])], float(scores[i])) for i in order]
+
+    def payloads(self, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for i in range(0, len(ids), _SQL_BATCH):
+                part = list(ids[i:i + _SQL_BATCH])
+                marks = ",".join("?" * len(part))
+                for pid, payload in self._db.execute(f"select id, payload from points where id in ({marks})", part):
+                    out[pid] = json.loads(payload)
+        return out
+
+    def scroll(self, flt: Optional[Filter], limit: int, offset: Any) -> Tuple[List[str], Optional[int]]:
+        rows = np.flatnonzero(self.mask(flt))
+        if offset is not None:
+            rows = rows[rows >= int(offset)]
+        with self._lock:
+            page = [self._rows[int(row)] for row in rows[:limit]]
+        return page, int(rows[limit]) if len(rows) > limit else None
+
+    def count(self, flt: Optional[Filter]) -> int:
+        return int(self.mask(flt).sum())
+
+    # -- écriture --
+    def write(self, ids: List[str], vectors: np.ndarray, payloads: List[Dict[str, Any]]) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        if self.normalize:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.where(norms > 0, norms, 1.0)
+        with self._lock:
+            rows: List[int] = []
+            for pid in ids:
+                row = self._ids.get(pid)
+                if row is None:
+                    row = self._free.pop() if self._free else self._size
+                    self._size = max(self._size, row + 1)
+                    self._ids[pid], self._rows[row] = row, pid
+                rows.append(row)
+            self._grow(self._size)
+            if self._scales is None:
+                self._vecs[rows] = vectors
+            else:
+                scales = np.abs(vectors).max(axis=1) / 127.0
+                scales[scales == 0] = 1.0
+                self._vecs[rows] = np.round(vectors / scales[:, None]).astype(np.int8)
+                self._scales[rows] = scales
+                self._scales.flush()
+            self._vecs.flush()  # vecteurs sur disque avant de rendre les points visibles
+            with self._db:
+                self._db.executemany(
+                    "insert or replace into points(id, row, payload) values (?, ?, ?)",
+                    [(pid, row, json.dumps(p, ensure_ascii=False)) for pid, row, p in zip(ids, rows, payloads)],
+                )
+            self._alive[rows] = True
+            for row, payload in zip(rows, payloads):
+                for field_name in self._codes:
+                    self._set_code(field_name, row, payload.get(field_name))
+
+    def set_payload(self, ids: List[str], values: Dict[str, Any]) -> None:
+        with self._lock:
+            current = self.payloads(ids)
+            with self._db:
+                self._db.executemany(
+                    "update points set payload = ? where id = ?",
+                    [(json.dumps({**payload, **values}, ensure_ascii=False), pid) for pid, payload in current.items()],
+                )
+            for pid in current:
+                for field_name in self._codes:
+                    if field_name in values:
+                        self._set_code(field_name, self._ids[pid], values[field_name])
+
+    def remove(self, ids: List[str]) -> None:
+        with self._lock:
+            rows = [self._ids.pop(pid) for pid in ids if pid in self._ids]
+            with self._db:
+                self._db.executemany("delete from points where row = ?", [(row,) for row in rows])
+            for row in rows:
+                del self._rows[row]
+                self._alive[row] = False
+                for codes in self._codes.values():
+                    codes[row] = -1
+            self._free.extend(rows)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+def _vectors_file(dtype: str) -> str:
+    return "vectors.i8" if dtype == "int8" else "vectors.f32"
+
+
+def _resize(path: Path, size: int) -> None:
+    with open(path, "ab") as fh:
+        fh.truncate(size)
+
+
+def _dump(model: Any) -> Any:
+    return model.model_dump(mode="json", exclude_none=True) if model is not None else None
+
+
+class LocalVectorStore:
+    """Index local embarqué, compatible avec le sous-ensemble VectorStore du client Qdrant."""
+
+    def __init__(self, root: Path = VECTOR_LOCAL_DIR, dtype: str = VECTOR_LOCAL_DTYPE, block: int = VECTOR_LOCAL_BLOCK):
+        self.root = Path(root)
+        self.dtype = dtype
+        self.block = block
+        self._collections: Dict[str, _Collection] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str) -> _Collection:
+        with self._lock:
+            col = self._collections.get(name)
+            if col is None:
+                if not (self.root / name / "points.sqlite3").exists():
+                    raise _not_found(name)
+                col = self._collections[name] = _Collection(self.root / name, self.block)
+            return col
+
+    # -- collections --
+    def collection_exists(self, collection_name: str) -> bool:
+        return collection_name in self._collections or (self.root / collection_name / "points.sqlite3").exists()
+
+    def create_collection(
+        self,
+        collection_name: str,
+        vectors_config: VectorParams,
+        hnsw_config: Any = None,
+        quantization_config: Any = None,
+        on_disk_payload: Optional[bool] = None,
+        **_: Any,
+    ) -> bool:
+        with self._lock:
+            if collection_name in self._collections or (self.root / collection_name / "points.sqlite3").exists():
+                raise ValueError(f"Collection {collection_name} already exists")
+            config = {
+                "vectors": _dump(vectors_config),
+                "hnsw": {"m": 16, "ef_construct": 100, **(_dump(hnsw_config) or {})},
+                "quantization": _dump(quantization_config),
+                "on_disk_payload": bool(on_disk_payload),
+            }
+            self._collections[collection_name] = _Collection.create(
+                self.root / collection_name, config, self.dtype, self.block
+            )
+        return True
+
+    def delete_collection(self, collection_name: str) -> bool:
+        with self._lock:
+            col = self._collections.pop(collection_name, None)
+            if col is not None:
+                col.close()
+            path = self.root / collection_name
+            if not path.exists():
+                return False
+            shutil.rmtree(path)
+        return True
+
+    def get_collection(self, collection_name: str) -> Any:
+        col = self._get(collection_name)
+        config = col.config
+        return SimpleNamespace(
+            status=CollectionStatus.GREEN,
+            points_count=len(col),
+            config=SimpleNamespace(
+                params=SimpleNamespace(
+                    vectors=VectorParams(**config["vectors"]), on_disk_payload=config["on_disk_payload"]
+                ),
+                hnsw_config=SimpleNamespace(**config["hnsw"]),
+                quantization_config=ScalarQuantization(**config["quantization"]) if config["quantization"] else None,
+            ),
+            payload_schema={name: PayloadSchemaType.KEYWORD for name in col.indexed},
+            storage={"backend": "local", "dtype": col.dtype, "path": str(col.path)},
+        )
+
+    def update_collection(self, collection_name: str, **changes: Any) -> bool:
+        """Réglages du profil Qdrant mémorisés (migration idempotente), sans effet sur la recherche locale."""
+        col = self._get(collection_name)
+        config = col.config
+        if changes.get("hnsw_config") is not None:
+            config["hnsw"].update(_dump(changes["hnsw_config"]))
+        if "quantization_config" in changes:
+            quantization = changes["quantization_config"]
+            config["quantization"] = quantization.model_dump(mode="json", exclude_none=True) \
+                if isinstance(quantization, ScalarQuantization) else None
+        params = changes.get("collection_params")
+        if params is not None and params.on_disk_payload is not None:
+            config["on_disk_payload"] = params.on_disk_payload
+        for diff in (changes.get("vectors_config") or {}).values():
+            if diff.on_disk is not None:
+                config["vectors"]["on_disk"] = diff.on_disk
+        col.set_meta("config", config)
+        return True
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema: Any = None, **_: Any) -> UpdateResult:
+        self._get(collection_name).index(field_name)
+        return _done()
+
+    # -- lecture --
+    def search(
+        self,
+        collection_name: str,
+        query_vector: Sequence[float],
+        limit: int = 10,
+        query_filter: Optional[Filter] = None,
+        search_params: Any = None,
+        with_payload: Any = True,
+        **_: Any,
+    ) -> List[ScoredPoint]:
+        col = self._get(collection_name)
+        found = col.search(query_vector, limit, query_filter)
+        payloads = col.payloads([pid for pid, _ in found]) if with_payload else {}
+        return [
+            ScoredPoint(id=pid, version=0, score=score, payload=_select(payloads.get(pid, {}), with_payload))
+            for pid, score in found
+        ]
+
+    def retrieve(self, collection_name: str, ids: Sequence[Union[int, str]], with_payload: Any = True, **_: Any) -> List[Record]:
+        payloads = self._get(collection_name).payloads([str(i) for i in ids])
+        return [Record(id=pid, payload=_select(p, with_payload)) for pid, p in payloads.items()]
+
+    def count(self, collection_name: str, count_filter: Optional[Filter] = None, exact: bool = True, **_: Any) -> CountResult:
+        return CountResult(count=self._get(collection_name).count(count_filter))
+
+    def scroll(
+        self,
+        collection_name: str,
+        scroll_filter: Optional[Filter] = None,
+        limit: int = 10,
+        offset: Any = None,
+        with_payload: Any = True,
+        with_vectors: Any = False,
+        **_: Any,
+    ) -> Tuple[List[Record], Optional[int]]:
+        col = self._get(collection_name)
+        ids, next_offset = col.scroll(scroll_filter, limit, offset)
+        payloads = col.payloads(ids) if with_payload else {}
+        return [Record(id=pid, payload=_select(payloads.get(pid, {}), with_payload)) for pid in ids], next_offset
+
+    # -- écriture --
+    def upsert(self, collection_name: str, points: List[PointStruct], wait: bool = True, **_: Any) -> UpdateResult:
+        if points:
+            self._get(collection_name).write(
+                [str(p.id) for p in points], np.asarray([p.vector for p in points], dtype=np.float32),
+                [p.payload or {} for p in points],
+            )
+        return _done()
+
+    def upload_collection(
+        self,
+        collection_name: str,
+        vectors: Any,
+        payload: Optional[Iterable[Dict[str, Any]]] = None,
+        ids: Optional[Iterable[Union[int, str]]] = None,
+        wait: bool = True,
+        **_: Any,
+    ) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ids = [str(i) for i in ids] if ids is not None else [str(i) for i in range(len(vectors))]
+        payloads = list(payload) if payload is not None else [{} for _ in ids]
+        self._get(collection_name).write(ids, vectors, payloads)
+
+    def delete(self, collection_name: str, points_selector: Any, wait: bool = True, **_: Any) -> UpdateResult:
+        ids = points_selector.points if isinstance(points_selector, PointIdsList) else points_selector
+        if not isinstance(ids, list):
+            raise NotImplementedError("Index local: suppression par identifiants uniquement")
+        self._get(collection_name).remove([str(i) for i in ids])
+        return _done()
+
+    def batch_update_points(self, collection_name: str, update_operations: List[Any], wait: bool = True, **_: Any) -> List[UpdateResult]:
+        col = self._get(collection_name)
+        for op in update_operations:
+            if not isinstance(op, SetPayloadOperation) or op.set_payload.points is None:
+                raise NotImplementedError("Index local: seules les mises à jour SetPayload par identifiants sont supportées")
+            col.set_payload([str(i) for i in op.set_payload.points], op.set_payload.payload)
+        return [_done() for _ in update_operations]
+
+    def close(self) -> None:
+        with self._lock:
+            for col in self._collections.values():
+                col.close()
+            self._collections.clear()
+
+
+class AsyncLocalVectorStore:
+    """Variante async de LocalVectorStore (même instance): chaque appel passe par un thread."""
+
+    def __init__(self, store: LocalVectorStore):
+        self._store = store
+
+    def __getattr__(self, name: str) -> Any:
+        method = getattr(self._store, name)
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+
+_LOCAL: Optional[LocalVectorStore] = None
+_LOCAL_LOCK = threading.Lock()
+
+
+def local_store() -> LocalVectorStore:
+    """Index local du processus (partagé par les clients sync et async de rag_service)."""
+    global _LOCAL
+    with _LOCAL_LOCK:
+        if _LOCAL is None:
+            _LOCAL = LocalVectorStore()
+        return _LOCAL